@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线基准测试套件
+
+基于录制的搜索结果页和文章页面，测量搜索结果解析、rerank 算法以及
+fetch_url 转换流水线各阶段的吞吐量和 p50/p99 延迟。网络请求全部发往
+本地替身服务器（见 fixture_server.py），不访问外部网络。
+
+使用方式：
+    python benchmarks/bench.py
+    python benchmarks/bench.py --only parse rerank -i 50
+    python benchmarks/bench.py --sizes 10k 1m --latency 20 --json
+"""
+
+import sys
+import io
+import os
+import json
+import math
+import subprocess
+import time
+import tempfile
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import crawl as crawl_module  # noqa: E402
+import fetch_url as fetch_module  # noqa: E402
+import http_client  # noqa: E402
+import search_engines  # noqa: E402
+from fixture_server import (ARTICLE_SIZES, REAL_PAGES, build_real_page, load_fixture, parse_size,  # noqa: E402
+                            serp_fixtures, start_server)
+
+BENCH_QUERY = 'Python 异步编程'
+SUITES = ['parse', 'rerank', 'search', 'fetch', 'batch']
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(stage: str, samples: List[float], units: float = 0.0, unit: str = '') -> Dict:
+    """
+    汇总一个阶段的耗时样本
+
+    Args:
+        stage: 阶段名称
+        samples: 每次执行的耗时（秒）
+        units: 每次执行处理的数据量（字节或条数），用于计算吞吐量
+        unit: 数据量单位，'B' 表示字节，其它值表示条数
+
+    Returns:
+        包含 p50/p99/平均耗时（毫秒）和吞吐量的字典
+    """
+    mean = sum(samples) / len(samples) if samples else 0.0
+    row = {
+        'stage': stage,
+        'runs': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'mean_ms': round(mean * 1000, 3),
+    }
+    if units and mean > 0:
+        if unit == 'B':
+            row['throughput'] = f'{units / mean / 1024 / 1024:.2f} MB/s'
+        else:
+            row['throughput'] = f'{units / mean:.1f} {unit}/s'
+    return row
+
+
+def measure(func: Callable, iterations: int) -> List[float]:
+    """重复执行函数并返回每次的耗时（秒）"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_parse(iterations: int) -> List[Dict]:
+    """
+    测量百度 / Bing 搜索结果页的解析性能
+
+    手工构造的结果页记为 parse_<引擎>，fixtures/captured 中录制的真实结果页
+    记为 parse_<引擎>.<文件名>，最后一列为解析出的结果数。
+    """
+    rows = []
+    for engine, parser in [
+        ('baidu', search_engines.parse_baidu_results),
+        ('bing', search_engines.parse_bing_results),
+    ]:
+        for fixture in serp_fixtures(engine):
+            html = load_fixture(fixture)
+            samples = measure(lambda: parser(html, 50), iterations)
+            name = f'parse_{engine}'
+            if fixture.startswith('captured/'):
+                name += '.' + Path(fixture).stem[len(engine) + 1:]
+            row = summarize(name, samples, len(html.encode('utf-8')), 'B')
+            row['results'] = len(parser(html, 50))
+            rows.append(row)
+    return rows
+
+
+def load_serp_results() -> List[Dict]:
+    """解析录制的搜索结果页，得到 rerank 的输入"""
+    results = search_engines.parse_baidu_results(load_fixture('baidu_serp.html'), 50)
+    results += search_engines.parse_bing_results(load_fixture('bing_serp.html'), 50)
+    return results
+
+
+def bench_rerank(iterations: int, sizes: List[int] = (20, 50, 100), top_k: int = 5) -> List[Dict]:
+    """测量 rerank_results 在不同输入规模下的性能，以及只取前 top_k 条时的性能"""
+    base = load_serp_results()
+    rows = []
+    for n in sizes:
+        # 复制录制结果并改写 URL，得到指定规模的输入
+        results = []
+        for i in range(n):
+            item = base[i % len(base)].copy()
+            item.url = f"{item.url}#{i}"
+            results.append(item)
+
+        samples = measure(
+            lambda: search_engines.rerank_results(list(results), BENCH_QUERY),
+            iterations)
+        rows.append(summarize(f'rerank_n{n}', samples, n, 'results'))
+
+        samples = measure(
+            lambda: search_engines.rerank_results(list(results), BENCH_QUERY, top_k=top_k),
+            iterations)
+        rows.append(summarize(f'rerank_n{n}_top{top_k}', samples, n, 'results'))
+    return rows
+
+
+def bench_search(iterations: int, base_url: str) -> List[Dict]:
+    """通过替身服务器测量 search_all 端到端性能（请求 + 解析）"""
+    search_engines.BAIDU_SEARCH_URL = f'{base_url}/baidu/s'
+    search_engines.BING_SEARCH_URL = f'{base_url}/bing/search'
+    samples = measure(lambda: search_engines.search_all(BENCH_QUERY, ['baidu', 'bing'], 10), iterations)
+    return [summarize('search_all', samples, 20, 'results')]
+
+
+def bench_fetch(iterations: int, base_url: str, sizes: List[str]) -> List[Dict]:
+    """
+    测量 fetch_url 转换流水线各阶段的性能
+
+    使用 fetch_url 的分阶段计时（timings=True），分别汇总首字节、下载、解码、
+    元数据提取、正文提取和 Markdown 转换等阶段。大页面会减少重复次数。
+    除按 sizes 放大的合成文章外，还测量 REAL_PAGES 中的真实网站页面（fetch_<名称>），
+    最后一行的 markdown_chars 列为输出字符数，用于检查正文提取是否完整。
+    """
+    cases = [(size, f'{base_url}/article/{size}', parse_size(size)) for size in sizes]
+    cases += [(name, f'{base_url}/real/{name}', len(build_real_page(name))) for name in REAL_PAGES]
+    rows = []
+    for case, url, raw_size in cases:
+        runs = max(1, min(iterations, int(iterations * 1024 * 1024 / raw_size)))
+        stage_samples: Dict[str, List[float]] = {}
+        transfer = {}
+        result = {}
+
+        for _ in range(runs):
+            result = fetch_module.fetch_url(url, timeout=60, max_length=sys.maxsize, timings=True)
+            if not result['success']:
+                raise RuntimeError(f"拉取失败: {url}: {result['error']}")
+            for stage, ms in result['timings'].items():
+                stage_samples.setdefault(stage, []).append(ms / 1000.0)
+            transfer = result['transfer']
+
+        for stage, samples in stage_samples.items():
+            rows.append(summarize(f'fetch_{case}.{stage}', samples, raw_size, 'B'))
+        rows[-1]['encoding'] = transfer.get('content_encoding')
+        rows[-1]['wire_bytes'] = transfer.get('wire_bytes')
+        rows[-1]['markdown_chars'] = result['content_length']
+    return rows
+
+
+def bench_portal(iterations: int, base_url: str) -> List[Dict]:
+    """
+    测量门户首页（大部分字节是导航、页脚、图标、评论区和 data: 图片）的转换流水线
+
+    最后一行的 pruned 列为裁剪掉的样板内容字节数，markdown_chars 列为输出字符数。
+    """
+    stage_samples: Dict[str, List[float]] = {}
+    result = {}
+    for _ in range(iterations):
+        result = fetch_module.fetch_url(f'{base_url}/portal', timeout=60, max_length=sys.maxsize, timings=True)
+        if not result['success']:
+            raise RuntimeError(f"拉取失败: {base_url}/portal: {result['error']}")
+        for stage, ms in result['timings'].items():
+            stage_samples.setdefault(stage, []).append(ms / 1000.0)
+
+    raw_size = len(load_fixture('portal.html').encode('utf-8'))
+    rows = [summarize(f'fetch_portal.{stage}', samples, raw_size, 'B') for stage, samples in stage_samples.items()]
+    rows[-1]['pruned'] = result['pruned']['removed_bytes']
+    rows[-1]['markdown_chars'] = result['content_length']
+    return rows
+
+
+def bench_batch(iterations: int, latency_ms: float, batch_size: int = 24, workers: int = 8,
+                size: str = '10k') -> List[Dict]:
+    """
+    对比批量拉取同一主机的多个页面时，HTTP/1.1 连接池与 HTTP/2 多路复用的性能
+
+    HTTP/1.1 使用 fixture_server，HTTP/2 使用 h2_server（明文 h2c），两者路由、
+    压缩和注入延迟相同。未安装 httpx / h2 时只测量 HTTP/1.1。
+    """
+    from fixture_server import start_server as start_http1_server
+
+    transports = [('http1', start_http1_server, False)]
+    if http_client.HTTP2_AVAILABLE:
+        from h2_server import start_server as start_http2_server
+        transports.append(('http2', start_http2_server, True))
+    else:
+        print('# 未安装 httpx / h2，跳过 HTTP/2 对比', file=sys.stderr)
+
+    rows = []
+    runs = max(1, iterations // 4)
+    for name, start, http2 in transports:
+        server, base_url = start(latency_ms=latency_ms)
+        if http2:
+            # 明文 HTTP/2 需要 prior knowledge，每次运行使用新客户端以计入建连开销
+            client_factory = lambda: http_client.create_http2_client(http1=False)  # noqa: E731
+        urls = [f'{base_url}/article/{size}?page={i}' for i in range(batch_size)]
+
+        samples = []
+        connections = 0
+        for _ in range(runs):
+            if http2:
+                if http_client._http2_client is not None:
+                    http_client._http2_client.close()
+                http_client.set_http2_client(client_factory())
+            else:
+                http_client._session = http_client.create_session()
+            batch_start = time.perf_counter()
+            results = [r for _, r in fetch_module.fetch_urls(urls, timeout=60, workers=workers,
+                                                             timings=True, http2=http2, processes=1)]
+            samples.append(time.perf_counter() - batch_start)
+            connections = sum(1 for r in results if r['success'] and r['timings'].get('connect'))
+
+        row = summarize(f'batch_{name}_{batch_size}x{size}', samples, batch_size, 'pages')
+        row['connections'] = connections
+        rows.append(row)
+
+        if http2:
+            server.call_soon_threadsafe(server.stop)
+        else:
+            server.shutdown()
+    return rows
+
+
+def bench_convert_pool(iterations: int, latency_ms: float, batch_size: int = 16, workers: int = 8,
+                       size: str = '100k') -> List[Dict]:
+    """
+    对比批量拉取时在拉取线程中转换（processes=1）与在进程池中转换（可用 CPU 核数）的性能
+
+    进程池按需启动，计时包括进程启动；pooled 列为经进程池转换的页面数。
+    """
+    from fixture_server import start_server as start_http1_server
+
+    cpus = fetch_module.available_cpus()
+    if cpus < 2:
+        print('# 只有 1 个可用 CPU 核，进程池转换与线程内转换相同，跳过对比', file=sys.stderr)
+        return []
+
+    server, base_url = start_http1_server(latency_ms=latency_ms)
+    urls = [f'{base_url}/article/{size}?page={i}' for i in range(batch_size)]
+    rows = []
+    runs = max(1, iterations // 4)
+    try:
+        for processes in (1, cpus):
+            samples = []
+            pooled = 0
+            for _ in range(runs):
+                batch_start = time.perf_counter()
+                results = [r for _, r in fetch_module.fetch_urls(urls, timeout=60, workers=workers, timings=True,
+                                                                 processes=processes)]
+                samples.append(time.perf_counter() - batch_start)
+                pooled = sum(1 for r in results if r['success'] and 'process_pool' in r['timings'])
+            row = summarize(f'convert_p{processes}_{batch_size}x{size}', samples, batch_size, 'pages')
+            row['pooled'] = pooled
+            rows.append(row)
+    finally:
+        server.shutdown()
+    return rows
+
+
+def bench_crawl(iterations: int, latency_ms: float, workers: int = 8) -> List[Dict]:
+    """
+    对比用 crawl.py 在一个进程内抓取替身站点，与逐个运行 fetch_url.py 进程拉取相同页面的耗时
+
+    后者是以前在脚本中循环调用 fetch_url.py 的做法：每个页面都要启动解释器、重新建立连接。
+    两者都不读写本地页面库、不使用转换进程池。
+    """
+    from fixture_server import SITE_PAGES, start_server as start_http1_server
+
+    server, base_url = start_http1_server(latency_ms=latency_ms)
+    rows = []
+    try:
+        samples = []
+        pages = 0
+        for _ in range(max(1, iterations // 4)):
+            crawl_start = time.perf_counter()
+            records = list(crawl_module.crawl([f'{base_url}/site/page/0'], max_pages=SITE_PAGES, max_depth=SITE_PAGES,
+                                              per_host=workers, delay=0.0, workers=workers, processes=1))
+            samples.append(time.perf_counter() - crawl_start)
+            pages = sum(1 for r in records if r['success'])
+        rows.append(summarize(f'crawl_site_{pages}', samples, pages, 'pages'))
+
+        script = Path(__file__).resolve().parent.parent / 'scripts' / 'fetch_url.py'
+        process_start = time.perf_counter()
+        for i in range(SITE_PAGES):
+            subprocess.run([sys.executable, str(script), f'{base_url}/site/page/{i}', '--json', '--no-store'],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        rows.append(summarize(f'crawl_processes_{SITE_PAGES}', [time.perf_counter() - process_start],
+                              SITE_PAGES, 'pages'))
+    finally:
+        server.shutdown()
+    return rows
+
+
+def format_table(rows: List[Dict]) -> str:
+    """将结果格式化为文本表格"""
+    headers = ['stage', 'runs', 'p50_ms', 'p99_ms', 'mean_ms', 'throughput', 'encoding', 'wire_bytes',
+               'connections', 'pooled', 'pruned', 'markdown_chars', 'results']
+    table = [headers] + [[str(row.get(h, '')) for h in headers] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(headers))]
+    lines = []
+    for i, line in enumerate(table):
+        lines.append('  '.join(cell.ljust(widths[j]) for j, cell in enumerate(line)))
+        if i == 0:
+            lines.append('  '.join('-' * w for w in widths))
+    return '\n'.join(lines)
+
+
+def run(suites: List[str], iterations: int, sizes: List[str], latency_ms: float,
+        base_url: Optional[str] = None) -> List[Dict]:
+    """
+    运行选定的基准测试
+
+    Args:
+        suites: 要运行的测试集合
+        iterations: 每个阶段的重复次数
+        sizes: fetch 测试使用的文章大小
+        latency_ms: 替身服务器的响应延迟（毫秒）
+        base_url: 已有替身服务器的地址；为空时自动启动
+
+    Returns:
+        所有阶段的汇总结果
+    """
+    # 使用临时缓存目录，避免基准测试污染用户的引擎健康状态等缓存
+    os.environ.setdefault(http_client.CACHE_DIR_ENV, tempfile.mkdtemp(prefix='lwf-bench-'))
+
+    # 替身服务器不需要限速，避免把令牌桶等待计入测量结果
+    http_client.set_scheduler(http_client.HostScheduler(limits={}, default=(1e9, 1e9, 64)))
+
+    server = None
+    if base_url is None and ('search' in suites or 'fetch' in suites):
+        server, base_url = start_server(latency_ms=latency_ms)
+
+    rows = []
+    try:
+        if 'parse' in suites:
+            rows += bench_parse(iterations)
+        if 'rerank' in suites:
+            rows += bench_rerank(iterations)
+        if 'search' in suites:
+            rows += bench_search(iterations, base_url)
+        if 'fetch' in suites:
+            rows += bench_fetch(iterations, base_url, sizes)
+            rows += bench_portal(iterations, base_url)
+        if 'batch' in suites:
+            rows += bench_batch(iterations, latency_ms)
+            rows += bench_convert_pool(iterations, latency_ms)
+            rows += bench_crawl(iterations, latency_ms)
+    finally:
+        if server is not None:
+            server.shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线基准测试套件 - 解析、Rerank 与转换流水线')
+    parser.add_argument('--only', nargs='+', choices=SUITES, default=SUITES,
+                        help='只运行指定的测试集合（默认全部）')
+    parser.add_argument('-i', '--iterations', type=int, default=20,
+                        help='每个阶段的重复次数（默认: 20，大页面自动减少）')
+    parser.add_argument('--sizes', nargs='+', default=ARTICLE_SIZES,
+                        help='fetch 测试的文章大小（默认: 10k 100k 1m 10m）')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='替身服务器响应延迟（毫秒，默认: 0）')
+    parser.add_argument('--base-url', help='使用已启动的替身服务器，而不是自动启动')
+    parser.add_argument('-j', '--json', action='store_true', help='以 JSON 格式输出')
+
+    args = parser.parse_args()
+
+    rows = run(args.only, args.iterations, args.sizes, args.latency, args.base_url)
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print(format_table(rows))
+
+
+if __name__ == '__main__':
+    main()
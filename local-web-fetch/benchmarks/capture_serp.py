@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+录制真实的搜索结果页
+
+用 search_engines.py 的请求（相同的 URL 和请求头）查询百度 / Bing，把返回的 HTML
+保存到 fixtures/captured/<引擎>_<说明>.html。bench.py 的 parse 测试会在手工构造的
+结果页之外，逐个测量这些录制的结果页；解析结果为 0 条时说明页面结构已变化
+（或返回了验证页），需要检查解析器。
+
+需要访问外部网络。
+
+使用方式：
+    python benchmarks/capture_serp.py "python asyncio 教程"
+    python benchmarks/capture_serp.py "machine learning" -e bing --name ml
+"""
+
+import sys
+import io
+import re
+import argparse
+from pathlib import Path
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import search_engines  # noqa: E402
+from fixture_server import CAPTURED_DIR  # noqa: E402
+
+ENGINES = {
+    'baidu': (search_engines.search_baidu, 'parse_baidu_results'),
+    'bing': (search_engines.search_bing, 'parse_bing_results'),
+}
+
+
+def capture(engine: str, query: str, num_results: int = 10) -> str:
+    """
+    查询一次搜索引擎，返回原始结果页 HTML
+
+    暂时替换模块中的解析函数，在解析前取得响应正文，请求部分与 search_engines.py 完全相同。
+
+    Raises:
+        RuntimeError: 请求失败，没有得到结果页
+    """
+    search, parser_name = ENGINES[engine]
+    parser = getattr(search_engines, parser_name)
+    pages = []
+
+    def recording_parser(html, limit):
+        pages.append(html)
+        return parser(html, limit)
+
+    setattr(search_engines, parser_name, recording_parser)
+    try:
+        search(query, num_results)
+    finally:
+        setattr(search_engines, parser_name, parser)
+    if not pages:
+        raise RuntimeError(f'{engine} 请求失败，未得到结果页')
+    return pages[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='录制真实的搜索结果页，供基准测试使用')
+    parser.add_argument('query', help='搜索关键词')
+    parser.add_argument('-e', '--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES),
+                        help='搜索引擎（默认: 全部）')
+    parser.add_argument('-n', '--num', type=int, default=10, help='请求的结果数量（默认: 10）')
+    parser.add_argument('--name', help='文件名中的说明部分（默认: 由关键词生成）')
+
+    args = parser.parse_args()
+
+    name = args.name or re.sub(r'\W+', '-', args.query).strip('-').lower() or 'query'
+    CAPTURED_DIR.mkdir(parents=True, exist_ok=True)
+    failed = False
+    for engine in args.engines:
+        try:
+            html = capture(engine, args.query, args.num)
+        except RuntimeError as e:
+            print(f'错误: {e}', file=sys.stderr)
+            failed = True
+            continue
+        path = CAPTURED_DIR / f'{engine}_{name}.html'
+        path.write_text(html, encoding='utf-8')
+        count = len(getattr(search_engines, ENGINES[engine][1])(html, args.num))
+        print(f'{path}（{len(html.encode("utf-8"))} 字节，解析出 {count} 条结果）')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
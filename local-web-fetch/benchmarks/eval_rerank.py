@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rerank 相关性评估
+
+在录制的百度 / Bing 搜索结果页上，按人工标注的相关性等级（fixtures/serp_qrels.json，
+2 = 高度相关，1 = 部分相关，未列出 = 不相关）评估各评分器在不同 --min-score 阈值和
+不同请求结果数（-n）下的排序质量，用于选择评分器并调整阈值：目标是用更小的 -n
+得到同样好的前几条结果。
+
+指标（各查询取平均）：
+    kept       rerank 后保留的结果数
+    p@5        前 5 条中相关结果的比例
+    ndcg@5     前 5 条的 nDCG（按相关性等级计算增益）
+    recall     保留的相关结果占录制结果中全部相关结果的比例
+
+使用方式：
+    python benchmarks/eval_rerank.py
+    python benchmarks/eval_rerank.py --scorers bm25 -n 3 5 --min-scores 0.1 0.2 0.3
+    python benchmarks/eval_rerank.py --json
+"""
+
+import sys
+import io
+import os
+import json
+import math
+import tempfile
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import http_client  # noqa: E402
+import search_engines  # noqa: E402
+from fixture_server import FIXTURES_DIR, load_fixture  # noqa: E402
+
+DEFAULT_SIZES = [3, 5, 8, 12]
+DEFAULT_MIN_SCORES = [0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4]
+CUTOFF = 5
+
+
+def load_qrels() -> Dict[str, Dict[str, int]]:
+    """读取标注：查询 -> {结果标题: 相关性等级}"""
+    return json.loads((FIXTURES_DIR / 'serp_qrels.json').read_text(encoding='utf-8'))
+
+
+def load_serps(num_results: int) -> List[Dict]:
+    """解析录制的搜索结果页，每个引擎取前 num_results 条（模拟 -n）"""
+    results = search_engines.parse_baidu_results(load_fixture('baidu_serp.html'), num_results)
+    results += search_engines.parse_bing_results(load_fixture('bing_serp.html'), num_results)
+    return results
+
+
+def dcg(gains: List[int]) -> float:
+    """折损累计增益"""
+    return sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(gains))
+
+
+def evaluate(ranked: List[Dict], judgments: Dict[str, int]) -> Dict[str, float]:
+    """
+    计算一次 rerank 结果的指标
+
+    两个引擎返回的同一页面（标题相同）只计一次。
+
+    Args:
+        ranked: rerank 后的结果
+        judgments: 该查询的标注
+
+    Returns:
+        kept / p@5 / ndcg@5 / recall
+    """
+    titles = []
+    for result in ranked:
+        if result['title'] not in titles:
+            titles.append(result['title'])
+    gains = [judgments.get(t, 0) for t in titles]
+    ideal = sorted(judgments.values(), reverse=True)[:CUTOFF]
+    relevant = sum(1 for g in judgments.values() if g > 0)
+    return {
+        'kept': len(titles),
+        f'p@{CUTOFF}': sum(1 for g in gains[:CUTOFF] if g > 0) / CUTOFF,
+        f'ndcg@{CUTOFF}': dcg(gains[:CUTOFF]) / dcg(ideal) if ideal else 0.0,
+        'recall': sum(1 for g in gains if g > 0) / relevant if relevant else 0.0,
+    }
+
+
+def run(scorers: List[str], sizes: List[int], min_scores: List[float], max_per_domain: int) -> List[Dict]:
+    """
+    对每个 (评分器, -n, 阈值) 组合在全部标注查询上运行 rerank 并汇总指标
+
+    Returns:
+        每个组合一行的指标（各查询的平均值）
+    """
+    # DF 统计写入临时目录，且预先计入全部录制结果，使评估结果与运行顺序无关
+    os.environ.setdefault(http_client.CACHE_DIR_ENV, tempfile.mkdtemp(prefix='lwf-eval-'))
+    search_engines.BM25Scorer(set(), load_serps(max(sizes)))
+
+    qrels = load_qrels()
+    rows = []
+    for scorer in scorers:
+        for size in sizes:
+            serps = load_serps(size)
+            for min_score in min_scores:
+                totals: Dict[str, float] = {}
+                for query, judgments in qrels.items():
+                    ranked = search_engines.rerank_results(
+                        list(serps), query, min_score=min_score,
+                        max_per_domain=max_per_domain, scorer=scorer)
+                    for name, value in evaluate(ranked, judgments).items():
+                        totals[name] = totals.get(name, 0.0) + value
+                row = {'scorer': scorer, 'n': size, 'min_score': min_score}
+                row.update({name: round(value / len(qrels), 3) for name, value in totals.items()})
+                rows.append(row)
+    return rows
+
+
+def best_settings(rows: List[Dict]) -> List[Dict]:
+    """每个评分器中 ndcg@5 最高的设置；相同时取 -n 更小、召回更高的"""
+    best: Dict[str, Dict] = {}
+    metric = f'ndcg@{CUTOFF}'
+    for row in rows:
+        current = best.get(row['scorer'])
+        key = (row[metric], -row['n'], row['recall'])
+        if current is None or key > (current[metric], -current['n'], current['recall']):
+            best[row['scorer']] = row
+    return list(best.values())
+
+
+def format_table(rows: List[Dict]) -> str:
+    """将结果格式化为文本表格"""
+    headers = ['scorer', 'n', 'min_score', 'kept', f'p@{CUTOFF}', f'ndcg@{CUTOFF}', 'recall']
+    table = [headers] + [[str(row.get(h, '')) for h in headers] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(headers))]
+    lines = []
+    for i, line in enumerate(table):
+        lines.append('  '.join(cell.ljust(widths[j]) for j, cell in enumerate(line)))
+        if i == 0:
+            lines.append('  '.join('-' * w for w in widths))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rerank 相关性评估 - 对比评分器并调整 --min-score')
+    parser.add_argument('--scorers', nargs='+', choices=sorted(search_engines.RELEVANCE_SCORERS),
+                        default=sorted(search_engines.RELEVANCE_SCORERS), help='要评估的评分器（默认全部）')
+    parser.add_argument('-n', '--num-results', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='每个引擎的请求结果数（默认: 3 5 8 12）')
+    parser.add_argument('--min-scores', type=float, nargs='+', default=DEFAULT_MIN_SCORES,
+                        help='要评估的最低相关性得分阈值')
+    parser.add_argument('--max-per-domain', type=int, default=3,
+                        help='每个域名最多保留结果数（默认: 3，与 search_engines.py 相同）')
+    parser.add_argument('-j', '--json', action='store_true', help='以 JSON 格式输出')
+
+    args = parser.parse_args()
+
+    rows = run(args.scorers, args.num_results, args.min_scores, args.max_per_domain)
+    best = best_settings(rows)
+
+    if args.json:
+        print(json.dumps({'rows': rows, 'best': best}, ensure_ascii=False, indent=2))
+        return
+
+    print(format_table(rows))
+    print()
+    print('# 各评分器的最佳设置')
+    print(format_table(best))
+
+
+if __name__ == '__main__':
+    main()
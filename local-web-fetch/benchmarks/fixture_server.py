@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试用本地替身 HTTP 服务器
+
+提供录制的百度 / Bing 搜索结果页、不同大小的文章页面和真实网站的大页面，
+并支持可配置的响应延迟，使基准测试完全不依赖外部网络。
+
+路由：
+    /baidu/s            百度搜索结果页
+    /bing/search        Bing 搜索结果页
+    /article            原始文章页面（约 10 KB）
+    /article/<size>     放大到指定大小的文章页面，如 /article/100k、/article/10m
+    /real/<name>        真实网站的页面（REAL_PAGES），如 /real/rust-book
+    /portal             门户首页（约 95 KB，导航、页脚、SVG 图标、评论区和 data: 图片占大部分字节）
+    /site/page/<i>      生成的小站点（SITE_PAGES 个页面），第 i 页链接到第 2i+1、2i+2 页，用于抓取测试
+    /site/sitemap.xml   小站点的 sitemap
+
+响应按请求的 Accept-Encoding 压缩（zstd / br / gzip，视本机安装的压缩库而定），
+压缩结果按路径缓存，不计入响应延迟。
+"""
+
+import argparse
+import gzip
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+# 从真实搜索引擎录制的结果页（capture_serp.py 生成），文件名为 <引擎>_<说明>.html
+CAPTURED_DIR = FIXTURES_DIR / 'captured'
+
+# 基准测试使用的文章大小
+ARTICLE_SIZES = ['10k', '100k', '1m', '10m']
+
+# 真实网站的页面：名称 -> fixtures 中的文件（.gz 为 gzip 压缩保存）
+# rust-book：mdBook 生成的《The Rust Programming Language》单页打印版（约 1.9 MB，
+# MIT / Apache-2.0 许可），包含侧边栏目录、代码高亮和大量 <pre> 代码块
+REAL_PAGES = {
+    'rust-book': 'rust_book_print.html.gz',
+}
+
+# 生成的小站点的页面数和每页的句子数
+SITE_PAGES = 40
+SITE_SENTENCES = 24
+
+_article_cache: Dict[int, bytes] = {}
+_article_lock = threading.Lock()
+
+# 服务器支持的压缩编码，按优先级排列
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {}
+if zstd is not None:
+    COMPRESSORS['zstd'] = zstd.compress
+if brotli is not None:
+    COMPRESSORS['br'] = brotli.compress
+COMPRESSORS['gzip'] = gzip.compress
+
+_compressed_cache: Dict[Tuple[str, str], bytes] = {}
+_compressed_lock = threading.Lock()
+
+
+def load_fixture(name: str) -> str:
+    """读取 fixtures 目录下的文件内容（.gz 文件先解压）"""
+    path = FIXTURES_DIR / name
+    if path.suffix == '.gz':
+        return gzip.decompress(path.read_bytes()).decode('utf-8')
+    return path.read_text(encoding='utf-8')
+
+
+def serp_fixtures(engine: str) -> List[str]:
+    """
+    返回某个搜索引擎的结果页 fixtures（相对 fixtures 目录的文件名）
+
+    第一个是手工构造的 <引擎>_serp.html，其后是 captured 目录中录制的真实结果页。
+    """
+    names = [f'{engine}_serp.html']
+    if CAPTURED_DIR.is_dir():
+        names += [f'captured/{path.name}' for path in sorted(CAPTURED_DIR.glob(f'{engine}_*.html'))]
+    return names
+
+
+def parse_size(size: str) -> int:
+    """将 10k / 1m 形式的大小转换为字节数"""
+    match = re.fullmatch(r'(\d+)([km]?)', size.strip().lower())
+    if not match:
+        raise ValueError(f'无效的大小: {size}')
+    number, unit = int(match.group(1)), match.group(2)
+    return number * {'': 1, 'k': 1024, 'm': 1024 * 1024}[unit]
+
+
+def build_article(size_bytes: int) -> bytes:
+    """
+    以录制的文章为种子，重复正文章节直到达到指定大小
+
+    章节标题会加上序号，避免生成的内容完全重复。结果按大小缓存。
+
+    Args:
+        size_bytes: 目标大小（字节）
+
+    Returns:
+        UTF-8 编码的 HTML 页面
+    """
+    with _article_lock:
+        if size_bytes in _article_cache:
+            return _article_cache[size_bytes]
+
+        seed = load_fixture('article.html')
+        sections = re.findall(r'<section class="chapter">.*?</section>', seed, re.DOTALL)
+        head, tail = seed.split('</article>', 1)
+
+        parts = [head]
+        current = len(seed.encode('utf-8'))
+        index = 0
+        while current < size_bytes and sections:
+            section = sections[index % len(sections)]
+            section = section.replace('<h2>', f'<h2>第 {index + 1} 部分 · ', 1)
+            parts.append(section)
+            current += len(section.encode('utf-8'))
+            index += 1
+        parts.append('</article>')
+        parts.append(tail)
+
+        body = '\n'.join(parts).encode('utf-8')
+        _article_cache[size_bytes] = body
+        return body
+
+
+@lru_cache(maxsize=None)
+def build_real_page(name: str) -> bytes:
+    """读取真实网站的页面（解压结果缓存，不计入响应时间）"""
+    return load_fixture(REAL_PAGES[name]).encode('utf-8')
+
+
+def build_site_page(index: int) -> bytes:
+    """
+    生成小站点的第 index 页
+
+    正文由录制文章中的句子按页码随机抽取组成，各页内容互不相同（不会被视为近似重复）；
+    导航栏链接到首页和一个外部站点，正文链接到第 2i+1、2i+2 页。
+
+    Args:
+        index: 页码，从 0 开始
+
+    Returns:
+        UTF-8 编码的 HTML 页面
+    """
+    text = re.sub(r'<[^>]+>', '', ' '.join(re.findall(r'<p>(.*?)</p>', load_fixture('article.html'), re.DOTALL)))
+    sentences = [s.strip() + '。' for s in text.split('。') if s.strip()]
+    rng = random.Random(index)
+    paragraphs = ''.join(f'<p>{rng.choice(sentences)}</p>\n' for _ in range(SITE_SENTENCES))
+    children = ''.join(f'<li><a href="/site/page/{child}#top">第 {child} 页</a></li>'
+                       for child in (2 * index + 1, 2 * index + 2) if child < SITE_PAGES)
+    return (f'<html><head><title>站点第 {index} 页</title></head><body>'
+            f'<nav><a href="/site/page/0">首页</a> <a href="https://example.com/">外部站点</a></nav>'
+            f'<article><h1>站点第 {index} 页</h1>\n{paragraphs}<ul>{children}</ul></article>'
+            f'</body></html>').encode('utf-8')
+
+
+def build_sitemap(base_url: str = '') -> bytes:
+    """生成列出小站点全部页面的 sitemap.xml（base_url 为空时使用相对路径）"""
+    urls = ''.join(f'<url><loc>{base_url}/site/page/{i}</loc></url>' for i in range(SITE_PAGES))
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>').encode('utf-8')
+
+
+def route(path: str, host: str = '') -> Tuple[int, bytes]:
+    """按请求路径返回 (状态码, 响应正文)；host 为请求的 Host 头，用于生成 sitemap 中的绝对 URL"""
+    path = path.split('?', 1)[0].rstrip('/')
+    if path == '/baidu/s':
+        return 200, load_fixture('baidu_serp.html').encode('utf-8')
+    if path == '/bing/search':
+        return 200, load_fixture('bing_serp.html').encode('utf-8')
+    if path == '/article':
+        return 200, load_fixture('article.html').encode('utf-8')
+    if path == '/portal':
+        return 200, load_fixture('portal.html').encode('utf-8')
+    if path.startswith('/real/') and path[len('/real/'):] in REAL_PAGES:
+        return 200, build_real_page(path[len('/real/'):])
+    if path == '/site/sitemap.xml':
+        return 200, build_sitemap(f'http://{host}' if host else '')
+    if path.startswith('/site/page/'):
+        index = path.rsplit('/', 1)[1]
+        if index.isdigit() and int(index) < SITE_PAGES:
+            return 200, build_site_page(int(index))
+    if path.startswith('/article/'):
+        try:
+            return 200, build_article(parse_size(path.rsplit('/', 1)[1]))
+        except ValueError:
+            pass
+    return 404, b'not found'
+
+
+def compress(path: str, body: bytes, accept_encoding: str) -> Tuple[str, bytes]:
+    """按 Accept-Encoding 选择压缩编码，返回 (编码, 压缩后的正文)"""
+    accepted = {e.split(';')[0].strip() for e in accept_encoding.split(',')}
+    for encoding, compressor in COMPRESSORS.items():
+        if encoding in accepted:
+            key = (path.split('?', 1)[0], encoding)
+            with _compressed_lock:
+                if key not in _compressed_cache:
+                    _compressed_cache[key] = compressor(body)
+                return encoding, _compressed_cache[key]
+    return 'identity', body
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """按路由返回录制的页面，响应前按配置注入延迟"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency_ms = 0.0
+    jitter_ms = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _sleep(self) -> None:
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def do_GET(self):
+        status, body = route(self.path, self.headers.get('Host', ''))
+        if status == 200:
+            encoding, body = compress(self.path, body, self.headers.get('Accept-Encoding', ''))
+        else:
+            encoding = 'identity'
+        self._sleep()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    在后台线程中启动替身服务器
+
+    Args:
+        host: 监听地址
+        port: 监听端口，0 表示自动分配
+        latency_ms: 每个响应前的固定延迟（毫秒）
+        jitter_ms: 额外的随机延迟上限（毫秒）
+
+    Returns:
+        (服务器对象, 基础 URL)
+    """
+    handler = type('ConfiguredFixtureHandler', (FixtureHandler,),
+                   {'latency_ms': latency_ms, 'jitter_ms': jitter_ms})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试用本地替身 HTTP 服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认: 127.0.0.1）')
+    parser.add_argument('-p', '--port', type=int, default=8000, help='监听端口（默认: 8000）')
+    parser.add_argument('--latency', type=float, default=0.0, help='响应延迟（毫秒，默认: 0）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机延迟上限（毫秒，默认: 0）')
+
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.host, args.port, args.latency, args.jitter)
+    print(f'替身服务器已启动: {base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试用 HTTP/2 替身服务器
+
+以明文 HTTP/2（h2c，prior knowledge）提供与 fixture_server.py 相同的路由和压缩，
+用于对比 HTTP/2 多路复用与 HTTP/1.1 连接池的批量拉取性能。需要安装 h2：
+
+    pip install h2
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+from typing import Dict, Tuple
+
+import h2.config
+import h2.connection
+import h2.events
+import h2.exceptions
+
+from fixture_server import compress, route
+
+
+class H2Protocol(asyncio.Protocol):
+    """单个 HTTP/2 连接：并发处理多个流，按流量控制窗口发送正文"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        self.transport = None
+        self._window_open: Dict[int, asyncio.Event] = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data: bytes):
+        try:
+            events = self.conn.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            self.transport.write(self.conn.data_to_send())
+            self.transport.close()
+            return
+
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                headers = dict(event.headers)
+                asyncio.ensure_future(self._respond(event.stream_id, headers))
+            elif isinstance(event, h2.events.WindowUpdated):
+                targets = self._window_open.values() if event.stream_id == 0 \
+                    else [self._window_open.get(event.stream_id)]
+                for waiter in targets:
+                    if waiter is not None:
+                        waiter.set()
+            elif isinstance(event, h2.events.StreamReset):
+                waiter = self._window_open.pop(event.stream_id, None)
+                if waiter is not None:
+                    waiter.set()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.conn.data_to_send())
+
+    def connection_lost(self, exc):
+        for waiter in self._window_open.values():
+            waiter.set()
+
+    async def _respond(self, stream_id: int, headers: Dict[str, str]) -> None:
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+        path = headers.get(':path', '/')
+        status, body = route(path)
+        encoding = 'identity'
+        if status == 200:
+            encoding, body = compress(path, body, headers.get('accept-encoding', ''))
+
+        response_headers = [
+            (':status', str(status)),
+            ('content-type', 'text/html; charset=utf-8'),
+            ('content-length', str(len(body))),
+        ]
+        if encoding != 'identity':
+            response_headers.append(('content-encoding', encoding))
+        if self.transport.is_closing():
+            return
+        try:
+            self.conn.send_headers(stream_id, response_headers)
+        except (h2.exceptions.StreamClosedError, h2.exceptions.ProtocolError):
+            return
+        self.transport.write(self.conn.data_to_send())
+        await self._send_body(stream_id, body)
+
+    async def _send_body(self, stream_id: int, body: bytes) -> None:
+        waiter = self._window_open.setdefault(stream_id, asyncio.Event())
+        offset = 0
+        try:
+            while True:
+                if self.transport.is_closing():
+                    return
+                window = min(self.conn.local_flow_control_window(stream_id),
+                             self.conn.max_outbound_frame_size)
+                if window <= 0 and offset < len(body):
+                    waiter.clear()
+                    await waiter.wait()
+                    continue
+                chunk = body[offset:offset + window]
+                offset += len(chunk)
+                self.conn.send_data(stream_id, chunk, end_stream=offset >= len(body))
+                self.transport.write(self.conn.data_to_send())
+                if offset >= len(body):
+                    return
+        except (h2.exceptions.StreamClosedError, h2.exceptions.ProtocolError):
+            return
+        finally:
+            self._window_open.pop(stream_id, None)
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0) -> Tuple[asyncio.AbstractEventLoop, str]:
+    """
+    在后台线程的事件循环中启动 h2c 替身服务器
+
+    Returns:
+        (事件循环, 基础 URL)；调用 loop.call_soon_threadsafe(loop.stop) 停止
+    """
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    address = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(loop.create_server(
+            lambda: H2Protocol(latency_ms, jitter_ms), host, port))
+        address['port'] = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+        server.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return loop, f"http://{host}:{address['port']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试用 HTTP/2（h2c）替身服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认: 127.0.0.1）')
+    parser.add_argument('-p', '--port', type=int, default=8001, help='监听端口（默认: 8001）')
+    parser.add_argument('--latency', type=float, default=0.0, help='响应延迟（毫秒，默认: 0）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机延迟上限（毫秒，默认: 0）')
+
+    args = parser.parse_args()
+
+    loop, base_url = start_server(args.host, args.port, args.latency, args.jitter)
+    print(f'HTTP/2 替身服务器已启动: {base_url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == '__main__':
+    main()
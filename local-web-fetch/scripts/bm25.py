@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BM25 相关性评分
+
+以搜索结果的标题和摘要为文档计算 BM25 得分。文档频率（DF）统计在每次 rerank 时
+用本次的结果增量更新，并保存在缓存目录下的 SQLite 数据库中，跨进程、跨调用累积：
+查询词越少见，命中它的结果得分越高；"Python" 这类几乎每条结果都有的词贡献很小。
+
+中文没有空格分词，按相邻两个汉字切分（二元组），英文和数字按单词切分。
+"""
+
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from http_client import get_cache_dir
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 标题中的词按出现 2 次计
+TITLE_WEIGHT = 2
+# 只记录最近见过的文档，同一结果在多次搜索中出现时不重复计入 DF
+MAX_SEEN_DOCUMENTS = 50000
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[\u4e00-\u9fff]+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS corpus (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    documents INTEGER NOT NULL,
+    total_length INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO corpus (id, documents, total_length) VALUES (0, 0, 0);
+CREATE TABLE IF NOT EXISTS df (
+    term TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS seen (
+    key TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS seen_at ON seen(seen_at);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为检索词：英文单词和数字（至少 2 个字符）、汉字二元组
+
+    Args:
+        text: 任意文本
+
+    Returns:
+        检索词列表（保留重复，用于统计词频）
+    """
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text.lower()):
+        if run[0] >= '\u4e00':
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        elif len(run) >= 2:
+            tokens.append(run)
+    return tokens
+
+
+def document_terms(result: Dict) -> Counter:
+    """统计一条搜索结果的词频，标题中的词按 TITLE_WEIGHT 倍计"""
+    terms = Counter(tokenize(result.get('snippet', '')))
+    for token in tokenize(result.get('title', '')):
+        terms[token] += TITLE_WEIGHT
+    return terms
+
+
+class CorpusStats:
+    """
+    持久化的文档频率统计
+
+    每条搜索结果（按 URL 区分）只计入一次。连接在线程间共享，写入通过锁串行化；
+    多个进程同时更新时由 SQLite 的文件锁保证一致。
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else get_cache_dir() / 'bm25.db'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def observe(self, documents: Iterable[Tuple[str, Counter]]) -> int:
+        """
+        将新文档计入统计
+
+        Args:
+            documents: (文档标识, 词频) 序列；已经见过的标识会被忽略
+
+        Returns:
+            新计入的文档数
+        """
+        added = 0
+        now = time.time()
+        with self._lock, self._conn:
+            df: Counter = Counter()
+            length = 0
+            for key, terms in documents:
+                cursor = self._conn.execute('INSERT OR IGNORE INTO seen (key, seen_at) VALUES (?, ?)', (key, now))
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                length += sum(terms.values())
+                df.update(terms.keys())
+            if not added:
+                return 0
+            self._conn.executemany(
+                'INSERT INTO df (term, n) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET n = n + excluded.n',
+                df.items())
+            self._conn.execute('UPDATE corpus SET documents = documents + ?, total_length = total_length + ?',
+                               (added, length))
+            # 只保留最近的文档标识，更早的文档再次出现时会被重新计入
+            self._conn.execute(
+                'DELETE FROM seen WHERE seen_at < (SELECT seen_at FROM seen ORDER BY seen_at DESC LIMIT 1 OFFSET ?)',
+                (MAX_SEEN_DOCUMENTS,))
+        return added
+
+    def totals(self) -> Tuple[int, float]:
+        """返回 (文档总数, 平均文档长度)"""
+        with self._lock:
+            documents, total_length = self._conn.execute(
+                'SELECT documents, total_length FROM corpus').fetchone()
+        return documents, (total_length / documents if documents else 0.0)
+
+    def document_frequency(self, terms: Iterable[str]) -> Dict[str, int]:
+        """查询一组词的文档频率，未出现过的词为 0"""
+        terms = list(set(terms))
+        if not terms:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT term, n FROM df WHERE term IN ({','.join('?' * len(terms))})", terms).fetchall()
+        df = dict.fromkeys(terms, 0)
+        df.update(rows)
+        return df
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_corpus_stats() -> CorpusStats:
+    """返回进程内共享的 DF 统计"""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = CorpusStats()
+    return _stats
+
+
+def idf(documents: int, df: int) -> float:
+    """BM25 的 IDF（加 1 平滑，始终为正）"""
+    return math.log(1.0 + (documents - df + 0.5) / (df + 0.5))
+
+
+class BM25Scorer:
+    """
+    BM25 相关性评分器
+
+    创建时先把本次的全部结果计入 DF 统计，再查出查询词的 IDF；之后对单条结果评分
+    只做内存计算。得分除以查询词 IDF 之和 × (k1 + 1)（词频趋于无穷时的上限），
+    归一化到 0.0 - 1.0，可以与 --min-score 和多样性得分按原有比例组合。
+    """
+
+    def __init__(self, query_keywords: Set[str], results: List[Dict], stats: Optional[CorpusStats] = None):
+        self.stats = stats or get_corpus_stats()
+        self._terms: Dict[int, Counter] = {id(r): document_terms(r) for r in results}
+        self.stats.observe((r.get('url') or r.get('title', ''), self._terms[id(r)]) for r in results)
+
+        self.query_terms = sorted({t for keyword in query_keywords for t in tokenize(keyword)})
+        self.documents, self.avg_length = self.stats.totals()
+        df = self.stats.document_frequency(self.query_terms)
+        self.idf = {t: idf(self.documents, df[t]) for t in self.query_terms}
+        self.max_score = sum(self.idf.values()) * (BM25_K1 + 1)
+
+    def __call__(self, result: Dict) -> float:
+        if not self.max_score:
+            return 0.0
+        terms = self._terms.get(id(result))
+        if terms is None:
+            terms = document_terms(result)
+        length = sum(terms.values())
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (self.avg_length or length or 1))
+        score = 0.0
+        for term, weight in self.idf.items():
+            tf = terms.get(term, 0)
+            if tf:
+                score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+        return max(0.0, min(1.0, score / self.max_score))
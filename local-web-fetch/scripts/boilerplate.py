@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换前的样板内容裁剪
+
+正文容器（或找不到容器时的整个页面）里常有与正文无关、却占了大部分字节的内容：
+导航栏、页脚、内联 SVG 图标、<noscript> 统计像素、评论区，以及内嵌 base64 图片的
+data: URI。这些内容在转换为 Markdown 之前一次扫描删除，转换器处理的 HTML 更少，
+输出里也不再夹杂菜单和评论。
+
+所有要删除的结构合并为一个正则表达式，从前往后只扫描一遍；评论区容器可能嵌套
+同名标签，匹配到开始标签后再按标签配对找到它的结束位置。Pruner 支持分块送入，
+尚未闭合的结构留到下一块再处理，可以用在内存映射的流式转换中。
+
+使用方式：
+    python scripts/boilerplate.py page.html
+"""
+
+import sys
+import io
+import re
+import json
+import argparse
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# 整个元素（含内容）删除的标签
+PRUNED_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'footer')
+# id 或 class 中有一项恰好是这些词的容器视为评论区（按整项比较，no-comments-yet 之类不算）
+COMMENT_WIDGET_WORDS = ('comment', 'comments', 'comment-list', 'commentlist', 'comments-area', 'comments-section',
+                        'comment-respond', 'disqus_thread', 'respond', 'discussion')
+COMMENT_WIDGET_TAGS = ('div', 'section', 'aside', 'ol', 'ul')
+# 值为 data: URI 时删除的属性，只检查可能带有这些属性的标签
+DATA_URI_ATTRIBUTES = ('src', 'srcset', 'href', 'poster')
+DATA_URI_TAGS = ('img', 'source', 'a', 'video', 'audio', 'input', 'link', 'embed', 'image', 'use')
+# 分块送入时，未闭合的结构最多等待的字符数；超过后视为不会闭合，保留原样
+MAX_PENDING_CHARS = 1024 * 1024
+
+# 每个分支都以 < 开头，正则引擎可以直接跳到下一个 <，不必在每个字符上尝试全部分支。
+# 自闭合的 <svg ... /> 没有内容，只删除标签本身，不能当作开始标签一直匹配到下一个结束标签。
+# 含 data: URI 的标签整个匹配，再在标签内删除对应的属性
+PRUNE_PATTERN = re.compile(
+    r'<(?:(?P<html_comment>!--.*?--)'
+    r'|(?P<tag>%s)\b(?:[^>]*[^>/])?>.*?</(?P=tag)\s*' % '|'.join(PRUNED_TAGS)
+    + r'|(?P<empty_tag>%s)\b[^>]*/' % '|'.join(PRUNED_TAGS)
+    + r'|(?P<widget>%s)\b[^>]*?\b(?:id|class)\s*=\s*["\'](?:[^"\']*\s)?(?:%s)(?:\s[^"\']*)?["\'][^>]*'
+    % ('|'.join(COMMENT_WIDGET_TAGS), '|'.join(COMMENT_WIDGET_WORDS))
+    + r'|(?P<data_tag>%s)\b(?=[^>]*?\s(?:%s)\s*=\s*["\']\s*data:)(?:[^>"\']|"[^"]*"|\'[^\']*\')*'
+    % ('|'.join(DATA_URI_TAGS), '|'.join(DATA_URI_ATTRIBUTES))
+    + r')>',
+    re.IGNORECASE | re.DOTALL)
+DATA_URI_ATTRIBUTE_PATTERN = re.compile(
+    r'\s(?:%s)\s*=\s*(?:"\s*data:[^"]*"|\'\s*data:[^\']*\')' % '|'.join(DATA_URI_ATTRIBUTES), re.IGNORECASE)
+# 可能尚未闭合的结构的开头，分块送入时从这里开始留到下一块（评论区容器的结束位置另行配对，
+# 不完整的标签整个留到下一块）
+OPEN_PATTERN = re.compile(r'<!--|<(?:%s)\b' % '|'.join(PRUNED_TAGS), re.IGNORECASE)
+_WIDGET_TAG_PATTERNS = {tag: re.compile(r'<(/?)%s\b[^>]*>' % tag, re.IGNORECASE) for tag in COMMENT_WIDGET_TAGS}
+
+
+def _element_end(html: str, tag: str, start: int) -> Optional[int]:
+    """从开始标签之后查找与之配对的结束标签，返回结束位置；找不到时返回 None"""
+    depth = 1
+    for match in _WIDGET_TAG_PATTERNS[tag.lower()].finditer(html, start):
+        depth += -1 if match.group(1) else 1
+        if not depth:
+            return match.end()
+    return None
+
+
+class Pruner:
+    """
+    样板内容裁剪器
+
+    feed() 送入一段 HTML，返回已经可以确定的裁剪结果；结尾处尚未闭合的结构留到
+    下一次送入。最后一次送入时传 final=True，剩余内容（未闭合的结构保留原样）一并返回。
+    removed 按类别记录删除的字节数（UTF-8）。
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING_CHARS):
+        self.max_pending = max_pending
+        self.removed: Counter = Counter()
+        self._pending = ''
+
+    @property
+    def pending(self) -> str:
+        """留到下一次送入的文本（结尾处尚未闭合的结构）"""
+        return self._pending
+
+    def _remove(self, category: str, segment: str) -> None:
+        self.removed[category] += len(segment.encode('utf-8', errors='replace'))
+
+    def feed(self, text: str, final: bool = False) -> str:
+        """
+        送入一段 HTML
+
+        Args:
+            text: HTML 文本（可以在任意位置切分）
+            final: 是否为最后一段
+
+        Returns:
+            裁剪后的 HTML
+        """
+        html = self._pending + text
+        self._pending = ''
+        out = []
+        pos = 0
+        while True:
+            match = PRUNE_PATTERN.search(html, pos)
+            limit = match.start() if match else len(html)
+            if not final:
+                # 下一个完整结构之前有未闭合的结构开头：它的结束部分还没送到
+                opener = OPEN_PATTERN.search(html, pos, limit)
+                if opener is not None:
+                    if len(html) - opener.start() <= self.max_pending:
+                        out.append(html[pos:opener.start()])
+                        self._pending = html[opener.start():]
+                        break
+                    out.append(html[pos:opener.end()])
+                    pos = opener.end()
+                    continue
+            if match is None:
+                tail_start = len(html)
+                if not final:
+                    # 结尾处不完整的标签留到下一块
+                    lt = html.rfind('<', pos)
+                    if lt >= 0 and html.find('>', lt) < 0 and len(html) - lt <= self.max_pending:
+                        tail_start = lt
+                out.append(html[pos:tail_start])
+                self._pending = html[tail_start:]
+                break
+
+            end = match.end()
+            if match.group('widget'):
+                end = _element_end(html, match.group('widget'), match.end())
+                if end is None:
+                    if not final and len(html) - match.start() <= self.max_pending:
+                        out.append(html[pos:match.start()])
+                        self._pending = html[match.start():]
+                        break
+                    # 评论区容器没有配对的结束标签，保留原样
+                    out.append(html[pos:match.end()])
+                    pos = match.end()
+                    continue
+                category = 'comment_widget'
+            elif match.group('data_tag'):
+                out.append(html[pos:match.start()])
+                for attribute in DATA_URI_ATTRIBUTE_PATTERN.findall(match.group(0)):
+                    self._remove('data_uri', attribute)
+                out.append(DATA_URI_ATTRIBUTE_PATTERN.sub('', match.group(0)))
+                pos = end
+                continue
+            elif match.group('html_comment'):
+                category = 'html_comment'
+            else:
+                category = (match.group('tag') or match.group('empty_tag')).lower()
+
+            out.append(html[pos:match.start()])
+            self._remove(category, html[match.start():end])
+            pos = end
+        return ''.join(out)
+
+    def report(self) -> Dict:
+        """删除的总字节数和各类别的字节数"""
+        return {'removed_bytes': sum(self.removed.values()), 'removed': dict(self.removed.most_common())}
+
+
+def prune_html(html_content: str) -> Tuple[str, Dict]:
+    """
+    删除 HTML 中的导航栏、页脚、SVG、<noscript>、评论区、注释和 data: URI
+
+    Args:
+        html_content: 正文 HTML
+
+    Returns:
+        (裁剪后的 HTML, 裁剪报告：removed_bytes 总字节数，removed 各类别的字节数)
+    """
+    pruner = Pruner()
+    return pruner.feed(html_content, final=True), pruner.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='转换前的样板内容裁剪')
+    parser.add_argument('file', help='HTML 文件路径，- 表示标准输入')
+    parser.add_argument('--report', action='store_true', help='只输出裁剪报告（JSON）')
+
+    args = parser.parse_args()
+
+    if args.file == '-':
+        html_content = sys.stdin.read()
+    else:
+        with open(args.file, encoding='utf-8', errors='replace') as f:
+            html_content = f.read()
+    pruned, report = prune_html(html_content)
+    if args.report:
+        report['input_bytes'] = len(html_content.encode('utf-8', errors='replace'))
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(pruned, end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+站点抓取
+
+从种子 URL 或 sitemap.xml 出发，按广度优先跟随同站链接抓取页面。每个页面经过
+fetch_url 的完整流程（正文提取、样板裁剪、Markdown 转换、近似重复检测、本地页面库），
+结果按完成顺序以 NDJSON 逐行输出。与多次运行 fetch_url.py 相比，同一进程内的所有请求
+共享连接池、DNS 缓存、限速调度、指纹索引和转换进程池。
+
+抓取队列（Frontier）按主机分组：每个主机同时进行的请求不超过 --per-host 个，同一主机
+相邻两次请求的开始时间至少间隔 --delay 秒。超过深度上限的链接不再跟随，已加入队列的
+页面数达到 --max-pages 后不再加入新链接。
+
+使用方式：
+    python scripts/crawl.py https://example.com/docs/ --max-pages 50
+    python scripts/crawl.py --sitemap https://example.com/sitemap.xml --max-depth 0
+"""
+
+import sys
+import io
+import html
+import os
+import re
+import time
+import zlib
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from fetch_url import (BROWSER_HEADERS, CONVERTERS, ConversionPool, available_cpus, fetch_url,
+                       select_converter, write_ndjson)
+from http_client import fetch_bytes, prefetch_hosts
+from page_store import PageStore, get_page_store
+from simhash import FingerprintIndex
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_MAX_PAGES = 100
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_PER_HOST = 2
+DEFAULT_DELAY = 0.5
+# 最多读取的 sitemap 文件数（sitemap 索引可以嵌套）
+MAX_SITEMAPS = 50
+# 单个 sitemap 解压后最多读取的字节数（sitemap 协议规定不超过 50 MB）
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+# 扩展名表明不是网页的链接不加入队列（fetch_url 也会在首个数据块后中止二进制下载，这里省去请求）
+SKIPPED_EXTENSIONS = frozenset([
+    '.7z', '.apk', '.avi', '.bmp', '.css', '.dmg', '.doc', '.docx', '.exe', '.gif', '.gz', '.ico',
+    '.iso', '.jpeg', '.jpg', '.js', '.mov', '.mp3', '.mp4', '.pdf', '.png', '.ppt', '.pptx', '.rar',
+    '.svg', '.tar', '.tgz', '.webm', '.webp', '.woff', '.woff2', '.xls', '.xlsx', '.zip',
+])
+
+LOC_PATTERN = re.compile(rb'<loc>\s*(.*?)\s*</loc>', re.IGNORECASE | re.DOTALL)
+SITEMAP_INDEX_PATTERN = re.compile(rb'<sitemapindex\b', re.IGNORECASE)
+# 来自本地存储的结果没有 links 字段时，从 Markdown 中的链接继续抓取
+MARKDOWN_LINK_PATTERN = re.compile(r'\[[^\]]*\]\(([^)\s]+)')
+
+
+def normalize_url(url: str) -> str:
+    """去掉片段，协议和主机名转为小写，空路径补为 /，用于判断是否已访问"""
+    url, _ = urldefrag(url)
+    parsed = urlparse(url)
+    return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower(),
+                           path=parsed.path or '/').geturl()
+
+
+def site_of(url: str) -> str:
+    """URL 所属的站点：去掉 www. 前缀的主机名"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def markdown_links(markdown: str, url: str) -> List[str]:
+    """提取 Markdown 中链接的绝对 URL"""
+    return [urljoin(url, href) for href in MARKDOWN_LINK_PATTERN.findall(markdown)]
+
+
+def parse_sitemap(content, url: str) -> Tuple[List[str], bool]:
+    """
+    取出 sitemap 中 <loc> 的地址
+
+    Args:
+        content: sitemap 正文（bytes，或落盘的大文件的内存映射），可以是 gzip 压缩的
+        url: sitemap 的 URL，用于解析相对地址
+
+    Returns:
+        (地址列表, 是否为 sitemap 索引)
+    """
+    if content[:2] == b'\x1f\x8b':
+        content = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(content, MAX_SITEMAP_BYTES)
+    locations = [urljoin(url, html.unescape(loc.decode('utf-8', errors='replace')))
+                 for loc in LOC_PATTERN.findall(content)]
+    return locations, SITEMAP_INDEX_PATTERN.search(content, 0, 4096) is not None
+
+
+def fetch_sitemap(url: str, timeout: int = 30) -> List[str]:
+    """
+    读取 sitemap.xml 中的页面 URL
+
+    支持 gzip 压缩的 sitemap 和嵌套的 sitemap 索引（最多读取 MAX_SITEMAPS 个文件）。
+
+    Args:
+        url: sitemap 或 sitemap 索引的 URL
+        timeout: 请求超时时间（秒）
+
+    Returns:
+        页面 URL 列表
+
+    Raises:
+        requests.exceptions.RequestException: 请求失败
+    """
+    pages: List[str] = []
+    pending = deque([url])
+    visited: Set[str] = set()
+    while pending and len(visited) < MAX_SITEMAPS:
+        sitemap_url = pending.popleft()
+        if sitemap_url in visited:
+            continue
+        visited.add(sitemap_url)
+        response = fetch_bytes(sitemap_url, dict(BROWSER_HEADERS), timeout)
+        try:
+            # 超过 SPILL_THRESHOLD 的 sitemap 已写入临时文件，content 为空，通过内存映射读取
+            if response.spilled:
+                with response.open_mmap() as mapped:
+                    locations, is_index = parse_sitemap(mapped, sitemap_url)
+            else:
+                locations, is_index = parse_sitemap(response.content, sitemap_url)
+        finally:
+            response.close()
+        if is_index:
+            pending.extend(locations)
+        else:
+            pages.extend(locations)
+    return pages
+
+
+class Frontier:
+    """
+    按主机分组的抓取队列
+
+    每个主机一个先进先出队列，广度优先。next_ready() 只取出同时进行的请求数未达到
+    per_host、且距上次开始请求已过 delay 秒的主机的下一个 URL；done() 在请求完成后
+    归还名额。只接受 sites 中站点的 http(s) 链接。
+    """
+
+    def __init__(self, sites: Set[str], max_pages: int = DEFAULT_MAX_PAGES,
+                 max_depth: int = DEFAULT_MAX_DEPTH, per_host: int = DEFAULT_PER_HOST,
+                 delay: float = DEFAULT_DELAY):
+        self.sites = sites
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.per_host = max(1, per_host)
+        self.delay = delay
+        # 已加入队列的 URL 和重定向后的最终 URL，用于跳过已访问的地址
+        self.seen: Set[str] = set()
+        # 已加入队列的页面数（重定向目标不计入，每个页面只占一个名额）
+        self.admitted = 0
+        # 因页面数达到上限而未加入的链接数
+        self.dropped = 0
+        self._queues: Dict[str, Deque[Tuple[str, int, Optional[str]]]] = {}
+        self._active: Dict[str, int] = {}
+        self._next_start: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def add(self, url: str, depth: int, referrer: Optional[str] = None) -> bool:
+        """
+        加入一个链接
+
+        Args:
+            url: 链接 URL（绝对地址）
+            depth: 链接深度，种子为 0
+            referrer: 发现该链接的页面
+
+        Returns:
+            是否加入了队列（已访问、站外、超过深度或页面数上限时为 False）
+        """
+        url = normalize_url(url)
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or depth > self.max_depth or url in self.seen:
+            return False
+        if site_of(url) not in self.sites:
+            return False
+        if os.path.splitext(parsed.path)[1].lower() in SKIPPED_EXTENSIONS:
+            return False
+        if self.admitted >= self.max_pages:
+            self.dropped += 1
+            return False
+        self.seen.add(url)
+        self.admitted += 1
+        self._queues.setdefault(parsed.hostname or '', deque()).append((url, depth, referrer))
+        return True
+
+    def mark_seen(self, url: str) -> None:
+        """登记重定向后的最终 URL，之后发现的同一地址不再抓取（不占用页面数名额）"""
+        self.seen.add(normalize_url(url))
+
+    def next_ready(self) -> Tuple[Optional[Tuple[str, int, Optional[str]]], Optional[float]]:
+        """
+        取出下一个可以开始请求的 URL
+
+        Returns:
+            ((URL, 深度, 来源页面), None)；暂时没有可以开始的请求时为 (None, 需要等待的秒数)，
+            等待其它请求完成（或队列已空）时等待秒数为 None
+        """
+        now = time.monotonic()
+        wait_seconds = None
+        for host, queue in self._queues.items():
+            if not queue or self._active.get(host, 0) >= self.per_host:
+                continue
+            ready_at = self._next_start.get(host, 0.0)
+            if ready_at <= now:
+                self._active[host] = self._active.get(host, 0) + 1
+                self._next_start[host] = now + self.delay
+                return queue.popleft(), None
+            wait_seconds = ready_at - now if wait_seconds is None else min(wait_seconds, ready_at - now)
+        return None, wait_seconds
+
+    def done(self, url: str) -> None:
+        """归还 URL 所在主机的请求名额"""
+        host = urlparse(url).hostname or ''
+        self._active[host] = max(0, self._active.get(host, 0) - 1)
+
+
+def crawl(seeds: List[str], max_pages: int = DEFAULT_MAX_PAGES, max_depth: int = DEFAULT_MAX_DEPTH,
+          per_host: int = DEFAULT_PER_HOST, delay: float = DEFAULT_DELAY, workers: int = 8,
+          timeout: int = 30, max_length: int = 50000, timings: bool = False, http2: bool = False,
+          store: Optional[PageStore] = None, max_age: Optional[float] = None, dedup: bool = True,
+          dedup_store: bool = False, processes: Optional[int] = None, converter: str = 'auto',
+          frontier: Optional[Frontier] = None) -> Iterator[dict]:
+    """
+    从种子 URL 出发抓取同站页面，按完成顺序逐个产出结果
+
+    Args:
+        seeds: 种子 URL（深度 0），只跟随与种子同站（忽略 www. 前缀）的链接
+        max_pages: 最多抓取的页面数
+        max_depth: 最大链接深度，0 表示只抓取种子
+        per_host: 每个主机同时进行的请求数
+        delay: 同一主机相邻两次请求开始的最小间隔（秒）
+        workers: 并发线程数
+        timeout: 请求超时时间（秒）
+        max_length: 每个页面的最大内容长度
+        timings: 是否附带各阶段耗时
+        http2: 是否使用 HTTP/2 传输
+        store: 本地页面存储（见 fetch_url）
+        max_age: 本地结果的最长有效时间（秒，见 fetch_url）
+        dedup: 是否折叠本次抓取中近似重复的页面
+        dedup_store: 去重时是否也与本地页面库中已保存的页面比较
+        processes: 转换进程数，默认为可用 CPU 核数；1 表示在抓取线程中转换
+        converter: HTML → Markdown 转换后端（见 fetch_url）
+        frontier: 抓取队列，为空时按以上参数新建；传入时 seeds 追加到其中
+
+    Yields:
+        每个页面一条记录：type 为 page，input_url、depth（链接深度）、referrer（发现该链接的页面），
+        以及 fetch_url 的结果字段（不含 links）
+    """
+    if frontier is None:
+        frontier = Frontier({site_of(url) for url in seeds}, max_pages, max_depth, per_host, delay)
+    for url in seeds:
+        frontier.add(url, 0)
+    prefetch_hosts(seeds)
+
+    fingerprints = None
+    if dedup:
+        fingerprints = store.fingerprint_index() if dedup_store and store is not None else FingerprintIndex()
+    processes = available_cpus() if processes is None else processes
+    conversion_pool = ConversionPool(processes) if processes > 1 else None
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            running = {}
+            while True:
+                wait_seconds = None
+                while len(running) < workers:
+                    entry, wait_seconds = frontier.next_ready()
+                    if entry is None:
+                        break
+                    future = executor.submit(fetch_url, entry[0], timeout, max_length, timings, http2, store,
+                                             max_age, fingerprints, conversion_pool, converter, links=True)
+                    running[future] = entry
+                if not running:
+                    if wait_seconds is None:
+                        break
+                    # 队列中只剩需要等待间隔的主机
+                    time.sleep(wait_seconds)
+                    continue
+
+                finished, _ = wait(running, timeout=wait_seconds, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    url, depth, referrer = running.pop(future)
+                    frontier.done(url)
+                    result = future.result()
+                    links = result.pop('links', None)
+                    if result['success']:
+                        frontier.mark_seen(result['url'])
+                        if depth < frontier.max_depth and not result.get('duplicate_of'):
+                            if links is None:
+                                links = markdown_links(result['markdown'], result['url'])
+                            for link in links:
+                                frontier.add(link, depth + 1, result['url'])
+                    yield {'type': 'page', 'input_url': url, 'depth': depth, 'referrer': referrer, **result}
+    finally:
+        if conversion_pool is not None:
+            conversion_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='站点抓取 - 跟随同站链接批量拉取页面，以 NDJSON 流式输出')
+    parser.add_argument('seeds', nargs='*', metavar='url', help='种子 URL（可指定多个）')
+    parser.add_argument('--sitemap', action='append', default=[],
+                        help='sitemap.xml（或 sitemap 索引）的 URL，其中的页面作为种子（可指定多次）')
+    parser.add_argument('--max-pages', type=int, default=DEFAULT_MAX_PAGES,
+                        help=f'最多抓取的页面数，默认 {DEFAULT_MAX_PAGES}')
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH,
+                        help=f'最大链接深度，0 表示只抓取种子，默认 {DEFAULT_MAX_DEPTH}')
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST,
+                        help=f'每个主机同时进行的请求数，默认 {DEFAULT_PER_HOST}')
+    parser.add_argument('--delay', type=float, default=DEFAULT_DELAY,
+                        help=f'同一主机相邻两次请求的最小间隔（秒），默认 {DEFAULT_DELAY}')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='并发线程数，默认 8')
+    parser.add_argument('-p', '--processes', type=int,
+                        help='转换 Markdown 的进程数（默认: 可用 CPU 核数；1 表示不使用进程池）')
+    parser.add_argument('-t', '--timeout', type=int, default=30, help='请求超时时间（秒），默认 30')
+    parser.add_argument('-l', '--max-length', type=int, default=50000, help='每个页面的最大内容长度，默认 50000')
+    parser.add_argument('--converter', choices=['auto'] + list(CONVERTERS), default='auto',
+                        help='HTML → Markdown 转换后端（默认: auto）')
+    parser.add_argument('--timings', action='store_true', help='在每条记录中附带各阶段耗时')
+    parser.add_argument('--http2', action='store_true',
+                        help='使用 HTTP/2 传输（需要 httpx 和 h2，不支持时自动回落到 HTTP/1.1）')
+    parser.add_argument('--max-age', type=float,
+                        help='本地库中有该秒数内拉取过的结果时直接使用，不发请求')
+    parser.add_argument('--no-store', action='store_true', help='不读写本地页面库')
+    parser.add_argument('--no-dedup', action='store_true', help='不折叠近似重复的页面')
+    parser.add_argument('--dedup-store', action='store_true', help='去重时也与本地页面库中已保存的页面比较')
+
+    args = parser.parse_args()
+
+    if not args.seeds and not args.sitemap:
+        parser.error('请指定种子 URL 或 --sitemap')
+    if args.max_pages < 1 or args.max_depth < 0 or args.per_host < 1 or args.delay < 0:
+        parser.error('--max-pages 和 --per-host 至少为 1，--max-depth 和 --delay 不能为负数')
+    try:
+        select_converter(args.converter, 0)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    seeds = list(args.seeds)
+    for sitemap in args.sitemap:
+        try:
+            pages = fetch_sitemap(sitemap, args.timeout)
+        except Exception as e:
+            print(f'错误: 读取 sitemap 失败: {sitemap}: {e}', file=sys.stderr)
+            continue
+        print(f'# [Sitemap] {sitemap}: {len(pages)} 个页面', file=sys.stderr)
+        seeds.extend(pages)
+    if not seeds:
+        print('错误: 没有可抓取的 URL', file=sys.stderr)
+        sys.exit(1)
+
+    # sitemap 所在的站点也视为同站
+    sites = {site_of(url) for url in seeds + args.sitemap}
+    frontier = Frontier(sites, args.max_pages, args.max_depth, args.per_host, args.delay)
+    store = None if args.no_store else get_page_store()
+
+    counts = {'pages': 0, 'failed': 0, 'duplicates': 0}
+    for record in crawl(seeds, workers=args.workers, timeout=args.timeout, max_length=args.max_length,
+                        timings=args.timings, http2=args.http2, store=store, max_age=args.max_age,
+                        dedup=not args.no_dedup, dedup_store=args.dedup_store, processes=args.processes,
+                        converter=args.converter, frontier=frontier):
+        write_ndjson(record)
+        if not record['success']:
+            counts['failed'] += 1
+        elif record.get('duplicate_of'):
+            counts['duplicates'] += 1
+        else:
+            counts['pages'] += 1
+
+    write_ndjson({'type': 'summary', **counts, 'dropped_links': frontier.dropped,
+                  'elapsed_ms': round((time.perf_counter() - start) * 1000, 3)})
+
+
+if __name__ == '__main__':
+    main()
@@ -9,10 +9,28 @@
 
 import sys
 import io
+import os
 import json
 import re
+import time
+import codecs
+import html
 import argparse
-from urllib.parse import urlparse, urljoin
+import bisect
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse, urljoin
+
+from http_client import (ACCEPT_ENCODING, Download, StageTimer, fetch_bytes, get_memory_budget,
+                         prefetch_hosts, recording)
+from boilerplate import Pruner, prune_html
+from lxml_markdown import LXML_AVAILABLE, MarkdownStream
+from lxml_markdown import html_to_markdown as lxml_to_markdown
+from page_store import PageStore, get_page_store
+from simhash import FingerprintIndex, simhash
 
 # 设置标准输出为 UTF-8 编码（Windows 兼容）
 if sys.platform == 'win32':
@@ -32,35 +50,101 @@ except ImportError:
     HTML2TEXT_AVAILABLE = False
 
 
-def clean_html_with_html2text(html_content: str, base_url: str = "") -> str:
-    """使用 html2text 将 HTML 转换为 Markdown"""
-    if not HTML2TEXT_AVAILABLE:
-        return None
-
-    h = HTML2Text()
+def configure_html2text(h: 'HTML2Text') -> 'HTML2Text':
+    """设置 html2text 的转换选项"""
     h.ignore_links = False
     h.ignore_images = False
     h.body_width = 0  # 不换行
     h.unicode_snob = True
     h.skip_internal_links = False
+    return h
 
+
+def clean_html_with_html2text(html_content: str, base_url: str = "") -> str:
+    """使用 html2text 将 HTML 转换为 Markdown"""
+    if not HTML2TEXT_AVAILABLE:
+        return None
+
+    h = configure_html2text(HTML2Text())
     return h.handle(html_content)
 
 
-def clean_html_simple(html_content: str) -> str:
-    """简单的 HTML 清理（备用方案）"""
-    # 移除 script 和 style 标签
-    html_content = re.sub(r'<script[^>]*>.*?</script>', '', html_content, flags=re.IGNORECASE | re.DOTALL)
-    html_content = re.sub(r'<style[^>]*>.*?</style>', '', html_content, flags=re.IGNORECASE | re.DOTALL)
+def clean_html_with_lxml(html_content: str, base_url: str = "") -> str:
+    """使用 lxml 快速转换器将 HTML 转换为 Markdown（见 lxml_markdown.py）"""
+    if not LXML_AVAILABLE:
+        return None
 
-    # 移除所有 HTML 标签
-    html_content = re.sub(r'<[^>]+>', ' ', html_content)
+    return lxml_to_markdown(html_content)
 
-    # 清理多余空白
-    html_content = re.sub(r'\s+', ' ', html_content)
-    html_content = html_content.strip()
 
-    return html_content
+# 连续的 script / style 元素、标签和空白，整体替换为一个空格
+SIMPLE_STRIP_PATTERN = re.compile(r'(?:<(script|style)\b[^>]*>.*?</\1\s*>|<[^>]+>|\s)+', re.IGNORECASE | re.DOTALL)
+
+
+def clean_html_simple(html_content: str, base_url: str = "") -> str:
+    """简单的 HTML 清理（备用方案）：一次扫描去掉 script / style、其余标签和多余空白"""
+    return SIMPLE_STRIP_PATTERN.sub(' ', html_content).strip()
+
+
+# HTML → Markdown 转换后端：名称 -> 转换函数(HTML, 页面 URL)
+CONVERTERS: Dict[str, Callable[[str, str], str]] = {
+    'html2text': clean_html_with_html2text,
+    'lxml': clean_html_with_lxml,
+    'simple': clean_html_simple,
+}
+# auto 模式下正文达到该大小（字符）时优先使用 lxml：html2text 的输出与以往一致，
+# 但纯 Python 解析在大页面上慢数倍
+AUTO_LXML_CHARS = 64 * 1024
+
+
+def available_converters() -> List[str]:
+    """已安装所需库、可以使用的转换后端"""
+    installed = {'html2text': HTML2TEXT_AVAILABLE, 'lxml': LXML_AVAILABLE, 'simple': True}
+    return [name for name in CONVERTERS if installed[name]]
+
+
+def select_converter(converter: str, size: int) -> str:
+    """
+    确定实际使用的转换后端
+
+    auto 按正文大小和已安装的库选择：小于 AUTO_LXML_CHARS 时依次尝试 html2text、lxml，
+    更大的页面依次尝试 lxml、html2text，都未安装时使用 simple（只保留纯文本）。
+
+    Args:
+        converter: 后端名称（见 CONVERTERS）或 auto
+        size: 正文 HTML 的大小
+
+    Returns:
+        后端名称
+
+    Raises:
+        ValueError: 后端名称未知或所需的库未安装
+    """
+    available = available_converters()
+    if converter == 'auto':
+        preferred = ['html2text', 'lxml'] if size < AUTO_LXML_CHARS else ['lxml', 'html2text']
+        return next((name for name in preferred if name in available), 'simple')
+    if converter not in CONVERTERS:
+        raise ValueError(f"未知的转换后端: {converter}（可选: auto, {', '.join(CONVERTERS)}）")
+    if converter not in available:
+        raise ValueError(f'转换后端 {converter} 所需的库未安装，请运行: pip install {converter}')
+    return converter
+
+
+def html_to_markdown(main_html: str, url: str = "", converter: str = 'auto') -> Tuple[str, str]:
+    """
+    将正文 HTML 转换为 Markdown
+
+    Args:
+        main_html: 正文 HTML
+        url: 页面 URL
+        converter: 转换后端名称或 auto（见 select_converter）
+
+    Returns:
+        (Markdown 内容, 实际使用的后端名称)
+    """
+    name = select_converter(converter, len(main_html))
+    return CONVERTERS[name](main_html, url), name
 
 
 def extract_metadata(html_content: str, url: str) -> dict:
@@ -90,6 +174,27 @@ def extract_metadata(html_content: str, url: str) -> dict:
     return metadata
 
 
+def extract_links(hrefs: Iterable[str], url: str) -> List[str]:
+    """
+    将页面中的 href 转换为去重的绝对 http(s) URL
+
+    Args:
+        hrefs: 页面中 <a> 标签的 href（未解码 HTML 实体）
+        url: 页面 URL，用于解析相对链接
+
+    Returns:
+        按出现顺序排列的 URL，最多 MAX_LINKS 个
+    """
+    links: Dict[str, None] = {}
+    for href in hrefs:
+        link = urljoin(url, html.unescape(href.strip()))
+        if urlparse(link).scheme in ('http', 'https'):
+            links[link] = None
+            if len(links) >= MAX_LINKS:
+                break
+    return list(links)
+
+
 def extract_main_content(html_content: str) -> str:
     """尝试提取主要内容区域"""
     # 尝试提取常见的文章容器
@@ -109,66 +214,1056 @@ def extract_main_content(html_content: str) -> str:
     return html_content
 
 
-def fetch_url(url: str, timeout: int = 30, max_length: int = 50000) -> dict:
+# 文件头魔数 -> MIME 类型，命中即视为二进制内容
+MAGIC_SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\x1f\x8b\x08', 'application/gzip'),
+    (b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (b'Rar!\x1a\x07', 'application/vnd.rar'),
+    (b'\x7fELF', 'application/x-executable'),
+    (b'OggS', 'audio/ogg'),
+    (b'fLaC', 'audio/flac'),
+    (b'\x1aE\xdf\xa3', 'video/webm'),
+    (b'wOFF', 'font/woff'),
+    (b'wOF2', 'font/woff2'),
+]
+
+HTML_TYPES = ('text/html', 'application/xhtml+xml', 'text/xml', 'application/xml')
+TEXT_TYPES = ('text/', 'application/javascript', 'application/ecmascript')
+BINARY_TYPE_PREFIXES = ('image/', 'audio/', 'video/', 'font/', 'application/pdf', 'application/zip',
+                        'application/gzip', 'application/x-', 'application/vnd.', 'application/msword')
+
+
+def sniff_content(content_type: str, head: bytes) -> Tuple[str, str]:
+    """
+    根据 Content-Type 和首个数据块的魔数判断内容类别
+
+    魔数优先于声明的类型（服务器常把下载文件标成 text/html）；声明缺失或为
+    application/octet-stream 时，按首块内容判断是 HTML、JSON、纯文本还是二进制。
+
+    Args:
+        content_type: 响应头中的 Content-Type
+        head: 首个数据块
+
+    Returns:
+        (类别, MIME 类型)，类别为 html / json / text / binary 之一
+    """
+    mime = content_type.split(';', 1)[0].strip().lower()
+    if mime == 'application/octet-stream':
+        mime = ''
+
+    for signature, magic_mime in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return 'binary', magic_mime
+    if head[8:12] == b'WEBP' and head.startswith(b'RIFF'):
+        return 'binary', 'image/webp'
+    if head[4:8] == b'ftyp':
+        return 'binary', mime if mime.startswith(('video/', 'audio/', 'image/')) else 'video/mp4'
+
+    if mime in HTML_TYPES or mime.endswith('+xml'):
+        return 'html', mime
+    if mime == 'application/json' or mime.endswith('+json'):
+        return 'json', mime
+    if mime.startswith(TEXT_TYPES):
+        return 'text', mime
+    if mime.startswith(BINARY_TYPE_PREFIXES):
+        return 'binary', mime
+
+    # 类型未声明或无法判断，按内容探测
+    sample = head[:1024]
+    if b'\x00' in sample and not sample.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'binary', mime or 'application/octet-stream'
+    stripped = sample.lstrip(b'\xef\xbb\xbf \t\r\n')
+    if stripped.startswith(b'<'):
+        return 'html', mime or 'text/html'
+    if stripped.startswith((b'{', b'[')):
+        return 'json', mime or 'application/json'
+    return 'text', mime or 'text/plain'
+
+
+def content_charset(content_type: str) -> str:
+    """提取 Content-Type 中声明的 charset，未声明时返回空字符串"""
+    match = re.search(r'charset=["\']?([\w.:-]+)', content_type, re.IGNORECASE)
+    return match.group(1) if match else ''
+
+
+def file_metadata(url: str, mime: str, headers) -> dict:
+    """非 HTML 内容的元数据：以文件名作为标题，附带内容类型和声明的大小"""
+    metadata = {'url': url, 'content_type': mime}
+    name = unquote(urlparse(url).path.rstrip('/').rsplit('/', 1)[-1])
+    if name:
+        metadata['title'] = name
+    length = headers.get('Content-Length')
+    if length and length.isdigit() and not headers.get('Content-Encoding'):
+        metadata['size'] = int(length)
+    return metadata
+
+
+def format_size(size: int) -> str:
+    """将字节数格式化为易读的大小"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024.0
+    return f'{size:.1f} GB'
+
+
+# 内存中处理页面时的工作集估算（相对正文字节数的倍数）：原始字节、解码后的字符串、
+# 正文片段、转换器缓冲和 Markdown 各占一份
+IN_MEMORY_FACTOR = 8
+# 大页面流式处理时每次送入转换器的字节数
+STREAM_CHUNK_SIZE = 256 * 1024
+# 大页面只在前 1 MB 内查找 </head>，用于提取元数据和探测编码
+HEAD_SCAN_LIMIT = 1024 * 1024
+HEAD_SAMPLE_SIZE = 64 * 1024
+
+HEAD_END_PATTERN = re.compile(rb'</head\s*>', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+# 与 extract_main_content 相同的正文容器，直接在内存映射的字节上匹配
+MAIN_CONTENT_PATTERNS = [
+    re.compile(rb'<article[^>]*>.*?</article>', re.IGNORECASE | re.DOTALL),
+    re.compile(rb'<div[^>]*class=["\'][^"\']*content[^"\']*["\'][^>]*>.*?</div>', re.IGNORECASE | re.DOTALL),
+    re.compile(rb'<div[^>]*id=["\']content["\'][^>]*>.*?</div>', re.IGNORECASE | re.DOTALL),
+    re.compile(rb'<main[^>]*>.*?</main>', re.IGNORECASE | re.DOTALL),
+]
+# 大页面只取正文前 512 KB 计算 SimHash
+SIMHASH_SCAN_BYTES = 512 * 1024
+
+# 页面中的链接（用于抓取站点，见 crawl.py），忽略 # 之后的片段；每个页面最多收集 MAX_LINKS 个
+LINK_PATTERN = re.compile(r'<a\s[^>]*?\bhref\s*=\s*["\']\s*([^"\'#]+)', re.IGNORECASE)
+LINK_BYTES_PATTERN = re.compile(LINK_PATTERN.pattern.encode('ascii'), re.IGNORECASE)
+MAX_LINKS = 1000
+
+# 按长度上限转换时可以停下的位置：块级元素的开始标签
+BLOCK_START_PATTERN = re.compile(
+    r'<(?:p|h[1-6]|pre|ul|ol|li|dl|table|blockquote|figure|section|article|div|hr)\b', re.IGNORECASE)
+# 按长度上限转换时每次至少送入的 HTML 字符数
+MIN_BUDGET_CHUNK = 2048
+# 续读时恢复偏移处所在的列表：偏移之前的列表标签，有序列表的起始序号
+LIST_TAG_PATTERN = re.compile(r'<(/?)(ol|ul|li)\b([^>]*)>', re.IGNORECASE)
+LIST_TAG_BYTES_PATTERN = re.compile(LIST_TAG_PATTERN.pattern.encode('ascii'), re.IGNORECASE)
+LIST_START_PATTERN = re.compile(r'\bstart\s*=\s*["\']?(\d+)', re.IGNORECASE)
+
+# 小于该字节数的 HTML 页面在拉取线程中转换（进程间传输的开销与转换本身相当）
+POOL_MIN_PAGE_BYTES = 32 * 1024
+# 累计待转换的 HTML 达到该字节数（约 1 秒的转换量）后才启动转换进程池
+POOL_START_BYTES = 1024 * 1024
+
+DUPLICATE_NOTE = '> 与 {url} 内容近似重复（SimHash 距离 {distance}），已跳过转换。'
+# 正文文本少于该字符数时不计算 SimHash（指纹没有区分度，短页面之间容易误判为重复）
+MIN_FINGERPRINT_CHARS = 200
+TRUNCATION_NOTE = '\n\n... (内容过长，已截断)'
+
+# 分页读取时整篇文档转换结果的长度上限（字符）
+MAX_DOCUMENT_CHARS = 4 * 1024 * 1024
+# 分页时页尾回退到段落之间的空行，但每页至少保留页面大小的一半
+MIN_PAGE_FILL = 0.5
+
+
+def fingerprint_content(main_html: str, url: str, fingerprints: Optional[FingerprintIndex],
+                        timer: StageTimer) -> dict:
+    """
+    计算正文的 SimHash，并在指纹索引中查找近似重复的页面
+
+    Args:
+        main_html: 正文 HTML
+        url: 页面最终 URL
+        fingerprints: 指纹索引；为空时只计算指纹
+        timer: 阶段计时器
+
+    Returns:
+        包含 simhash（16 位十六进制）的字典；近似重复时还包含 duplicate_of 和 distance。
+        正文过短（见 MIN_FINGERPRINT_CHARS）时返回空字典
+    """
+    with timer.stage('simhash'):
+        text = clean_html_simple(main_html)
+        if len(text.strip()) < MIN_FINGERPRINT_CHARS:
+            return {}
+        fingerprint = simhash(text)
+        match = fingerprints.claim(fingerprint, url) if fingerprints is not None else None
+    if not fingerprint:
+        return {}
+    fields = {'simhash': f'{fingerprint:016x}'}
+    if match is not None:
+        fields['duplicate_of'], fields['distance'] = match
+    return fields
+
+
+def duplicate_note(fields: dict) -> str:
+    """近似重复页面代替 Markdown 内容的说明"""
+    return DUPLICATE_NOTE.format(url=fields['duplicate_of'], distance=fields['distance'])
+
+
+def covers(stored: dict, max_length: int, paged: bool) -> bool:
+    """store 中保存的结果能否用于本次请求：保存的是整篇文档，或不分页且截断时的上限不小于 max_length"""
+    return bool(stored.get('full_content')) or (not paged and (stored.get('content_limit') or 0) >= max_length)
+
+
+def working_set_estimate(response: Download, max_length: int) -> int:
+    """估算处理一个页面需要的内存（字节），用于向共享内存预算预留额度（估算值，不测量实际占用）"""
+    if response.spilled:
+        return STREAM_CHUNK_SIZE * IN_MEMORY_FACTOR + max_length * 8
+    return response.size * IN_MEMORY_FACTOR
+
+
+def detect_encoding(head: bytes, content_type: str) -> str:
+    """按 Content-Type、<meta charset> 和内容探测的顺序确定编码"""
+    encoding = content_charset(content_type)
+    if not encoding:
+        match = META_CHARSET_PATTERN.search(head)
+        if match:
+            encoding = match.group(1).decode('ascii', errors='ignore')
+    if not encoding:
+        encoding = requests.compat.chardet.detect(head)['encoding'] or 'utf-8'
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return 'utf-8'
+
+
+class _TextExtractor(HTMLParser):
+    """simple 后端的流式文本提取，跳过 script / style，效果与 clean_html_simple 相同"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.out_chars = 0
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+            self.out_chars += len(data)
+
+    def result(self) -> str:
+        return self.partial(len(self.parts))
+
+    def checkpoint(self) -> int:
+        return len(self.parts)
+
+    def partial(self, mark: int) -> str:
+        return re.sub(r'\s+', ' ', ' '.join(self.parts[:mark])).strip()
+
+
+if HTML2TEXT_AVAILABLE:
+
+    class _CountingHTML2Text(HTML2Text):
+        """统计已输出字符数的 HTML2Text，流式转换在达到长度上限后停止送入数据"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.out_chars = 0
+
+        def outtextf(self, s: str) -> None:
+            super().outtextf(s)
+            self.out_chars += len(s)
+
+        def result(self) -> str:
+            return self.optwrap(self.finish())
+
+        def checkpoint(self) -> int:
+            return len(self.outtextlist)
+
+        def partial(self, mark: int) -> str:
+            """截至 mark 的输出，不结束解析（与 finish() 相同地还原不换行空格）"""
+            nbsp = '\xa0' if self.unicode_snob else ' '
+            return self.optwrap(''.join(self.outtextlist[:mark]).replace('&nbsp_place_holder;', nbsp))
+
+
+def streaming_converter(name: str):
+    """
+    创建分块送入 HTML 的转换器
+
+    转换器提供 feed()、out_chars（已输出字符数）和 result()，见 convert_spilled_html；
+    以及 checkpoint() / partial()，见 convert_with_budget。
+    """
+    if name == 'html2text':
+        converter = configure_html2text(_CountingHTML2Text())
+        converter.start = True
+        return converter
+    if name == 'lxml':
+        return MarkdownStream()
+    return _TextExtractor()
+
+
+def convert_with_budget(main_html: str, name: str, max_length: int) -> Tuple[str, Optional[int]]:
+    """
+    分块转换正文 HTML，输出将超过 max_length 时在块级元素的边界处停止
+
+    每次送入的 HTML 都截止到某个块级元素的开始标签之前，大小按剩余的输出额度估算
+    （HTML 转换后通常不会变长），因此越接近上限每块越小。某一块使输出超过上限时，
+    回退到这一块之前的输出，停止位置就是这一块的起点；之后的 HTML 不再解析。
+
+    Args:
+        main_html: 正文 HTML
+        name: 转换后端名称（见 CONVERTERS）
+        max_length: 最大输出字符数
+
+    Returns:
+        (Markdown 内容, 停止位置)。停止位置为正文 HTML 中尚未转换部分的起始偏移，全部转换完时
+        为 None。第一个块就超过上限时按字符截断，停止位置为该块之后
+    """
+    stream = streaming_converter(name)
+    pos = 0
+    mark, mark_pos = stream.checkpoint(), pos
+    while pos < len(main_html):
+        match = BLOCK_START_PATTERN.search(main_html, pos + max(max_length - stream.out_chars, MIN_BUDGET_CHUNK))
+        end = match.start() if match else len(main_html)
+        stream.feed(main_html[pos:end])
+        if stream.out_chars > max_length:
+            if mark_pos == 0:
+                return stream.partial(stream.checkpoint())[:max_length], (end if end < len(main_html) else None)
+            return stream.partial(mark), mark_pos
+        pos = end
+        mark, mark_pos = stream.checkpoint(), pos
+    return stream.result(), None
+
+
+def list_context(matches: Iterable, at_item: bool) -> str:
+    """
+    续读时补在开头的列表标签
+
+    在块级元素边界停止时，停止位置可能在列表中间；续读时单独转换后面的 HTML，列表项会失去
+    所在的列表，有序列表的序号也从头开始。这里把偏移之前仍未闭合的 <ol> / <ul> 按原来的嵌套
+    重新打开，有序列表用 start 接上原来的序号；偏移落在列表项内部时再打开一个列表项。
+
+    Args:
+        matches: LIST_TAG_PATTERN（或 LIST_TAG_BYTES_PATTERN）在偏移之前的全部匹配
+        at_item: 偏移处是否正好是一个 <li> 开始标签
+
+    Returns:
+        要补在续读内容之前的 HTML，不在列表中时为空字符串
+    """
+    # 每层：[是否有序, 起始序号, 已打开的列表项数, 是否在列表项内部]
+    stack = []
+    for match in matches:
+        closing, tag, attrs = (group.decode('latin-1') if isinstance(group, bytes) else group
+                               for group in match.groups())
+        tag = tag.lower()
+        if tag == 'li':
+            if stack:
+                if not closing:
+                    stack[-1][2] += 1
+                stack[-1][3] = not closing
+        elif closing:
+            if stack:
+                stack.pop()
+        else:
+            start = LIST_START_PATTERN.search(attrs)
+            stack.append([tag == 'ol', int(start.group(1)) if start else 1, 0, False])
+
+    parts = []
+    for depth, (ordered, start, count, in_item) in enumerate(stack):
+        # 外层一定在某个列表项内部（嵌套列表）；最内层在列表项内部且偏移处不是新的列表项时继续该项
+        reopen = in_item and (depth < len(stack) - 1 or not at_item)
+        number = start + count - (1 if reopen else 0)
+        parts.append(f'<ol start="{number}">' if ordered else '<ul>')
+        if reopen:
+            parts.append('<li>')
+    return ''.join(parts)
+
+
+def convert_main_content(main_html: str, url: str, converter: str, max_length: Optional[int] = None,
+                         offset: int = 0) -> Tuple[str, dict]:
+    """
+    将正文 HTML 转换为 Markdown；正文比 max_length 长时按长度上限转换（见 convert_with_budget）
+
+    Args:
+        main_html: 正文 HTML
+        url: 页面 URL
+        converter: 转换后端名称或 auto（见 select_converter）
+        max_length: 最大输出字符数，为空时不限
+        offset: 从正文 HTML 的该字符偏移开始转换
+
+    Returns:
+        (Markdown 内容, 附加结果字段)：converter 为实际使用的后端；提前停止时还有 continuation，
+        包含停止位置 offset 和正文 HTML 的总长度 total
+
+    Raises:
+        ValueError: offset 超出正文 HTML 的范围
+    """
+    if offset and not 0 < offset < len(main_html):
+        raise ValueError(f'续读偏移超出正文范围: {offset}（正文 HTML 共 {len(main_html)} 个字符）')
+    total = len(main_html)
+    prefix = ''
+    if offset:
+        prefix = list_context(LIST_TAG_PATTERN.finditer(main_html, 0, offset),
+                              main_html[offset:offset + 3].lower() == '<li')
+        main_html = prefix + main_html[offset:]
+    if max_length is None or len(main_html) <= max_length:
+        markdown_content, name = html_to_markdown(main_html, url, converter)
+        return markdown_content, {'converter': name}
+
+    name = select_converter(converter, len(main_html))
+    markdown_content, stopped = convert_with_budget(main_html, name, max_length)
+    fields = {'converter': name}
+    if stopped is not None:
+        # 停止位置换算回原正文 HTML 中的偏移
+        fields['continuation'] = {'offset': offset + max(stopped - len(prefix), 1), 'total': total}
+    return markdown_content, fields
+
+
+def convert_spilled_html(response: Download, url: str, max_length: int, timer: StageTimer,
+                         fingerprints: Optional[FingerprintIndex] = None, converter: str = 'auto',
+                         links: bool = False, resume_offset: int = 0) -> tuple:
+    """
+    以内存映射、分块的方式转换写入临时文件的大页面
+
+    元数据只从 <head> 部分提取；正文容器直接在映射的字节上定位，再按块增量解码、
+    裁剪样板内容（见 boilerplate.Pruner）并送入转换器，内存占用与页面大小无关。
+    与 convert_with_budget 相同，每块的大小按剩余的输出额度估算，某一块使输出超过
+    max_length 时回退到这一块之前的输出并停止。这里的停止位置是页面中的字节偏移
+    （解码器和裁剪器中尚未送入转换器的部分不算已转换），可作为 resume_offset 继续转换。
+
+    Args:
+        response: 正文写入了临时文件的下载结果
+        url: 页面 URL
+        max_length: 最大内容长度
+        timer: 阶段计时器
+        fingerprints: 近似重复指纹索引（见 fingerprint_content）
+        converter: 转换后端名称或 auto（见 select_converter）
+        links: 是否收集页面中的链接（在映射的字节上扫描整个页面）
+        resume_offset: 从页面的该字节偏移继续转换（上一次结果的 continuation.offset）
+
+    Returns:
+        (元数据, Markdown 内容, 附加结果字段)，附加字段见 convert_response；提前停止时
+        continuation 的 offset 为停止处的字节偏移，total 为正文容器结束处的字节偏移
+
+    Raises:
+        ValueError: resume_offset 不在正文容器范围内
+    """
+    with response.open_mmap() as mapped:
+        with timer.stage('decode'):
+            head_end = HEAD_END_PATTERN.search(mapped, 0, HEAD_SCAN_LIMIT)
+            head = mapped[:head_end.end() if head_end else HEAD_SAMPLE_SIZE]
+            encoding = detect_encoding(head[:HEAD_SAMPLE_SIZE], response.headers.get('Content-Type', ''))
+            head_text = head.decode(encoding, errors='replace')
+
+        with timer.stage('metadata'):
+            metadata = extract_metadata(head_text, url)
+            page_links = None
+            if links:
+                page_links = extract_links((match.group(1).decode(encoding, errors='replace')
+                                            for match in LINK_BYTES_PATTERN.finditer(mapped)), response.url)
+
+        with timer.stage('main_content'):
+            start, end = 0, len(mapped)
+            for pattern in MAIN_CONTENT_PATTERNS:
+                match = pattern.search(mapped)
+                if match:
+                    start, end = match.span()
+                    break
+
+        sample = mapped[start:min(end, start + SIMHASH_SCAN_BYTES)].decode(encoding, errors='ignore')
+        with timer.stage('prune'):
+            sample, _ = prune_html(sample)
+        fields = fingerprint_content(sample, response.url, fingerprints, timer)
+        if page_links is not None:
+            fields['links'] = page_links
+        if 'duplicate_of' in fields:
+            return metadata, duplicate_note(fields), fields
+
+        begin = start
+        if resume_offset:
+            if not start < resume_offset < end:
+                raise ValueError(f'续读偏移超出正文范围: {resume_offset}（该页面的正文位于第 {start}-{end} 字节）')
+            begin = resume_offset
+
+        # 裁剪与转换交替进行，计入 markdown 阶段
+        with timer.stage('markdown'):
+            name = select_converter(converter, end - begin)
+            stream = streaming_converter(name)
+            pruner = Pruner()
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            pos = begin
+            if resume_offset:
+                stream.feed(list_context(LIST_TAG_BYTES_PATTERN.finditer(mapped, start, resume_offset),
+                                         mapped[resume_offset:resume_offset + 3].lower() == b'<li'))
+            mark, mark_pos = stream.checkpoint(), pos
+            stopped = None
+            held = ''
+            while pos < end:
+                chunk_end = min(end, pos + min(STREAM_CHUNK_SIZE, max(max_length - stream.out_chars, MIN_BUDGET_CHUNK)))
+                final = chunk_end >= end
+                text = held + pruner.feed(decoder.decode(mapped[pos:chunk_end], final=final), final=final)
+                held = ''
+                if not final:
+                    # 只送入到最后一个块级元素的开始标签之前，回退时不会丢掉转换器中缓冲的半段文字
+                    block = None
+                    for block in BLOCK_START_PATTERN.finditer(text):
+                        pass
+                    if block is not None and block.start() > 0:
+                        text, held = text[:block.start()], text[block.start():]
+                stream.feed(text)
+                pos = chunk_end
+                # 已送入转换器的输入截止处：解码器中不完整的字符、裁剪器中未闭合的结构和留下的
+                # 半个块都留到下一块
+                unfed = pruner.pending + held
+                fed_pos = pos - len(decoder.getstate()[0]) - len(unfed.encode(encoding, errors='replace'))
+                if stream.out_chars > max_length:
+                    if mark_pos == begin:
+                        markdown_content = stream.partial(stream.checkpoint())[:max_length]
+                        stopped = fed_pos if fed_pos < end else None
+                    else:
+                        markdown_content, stopped = stream.partial(mark), mark_pos
+                    break
+                mark, mark_pos = stream.checkpoint(), fed_pos
+            else:
+                markdown_content = stream.result()
+
+    fields.update(converter=name, pruned=pruner.report())
+    if stopped is not None:
+        fields['continuation'] = {'offset': stopped, 'total': end}
+    return metadata, markdown_content, fields
+
+
+def read_spilled_text(response: Download, encoding: str, max_length: int) -> str:
+    """从临时文件中按块解码文本，读到 max_length 个字符后停止"""
+    with response.open_mmap() as mapped:
+        encoding = encoding or detect_encoding(mapped[:HEAD_SAMPLE_SIZE], '')
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parts, chars = [], 0
+        for offset in range(0, len(mapped), STREAM_CHUNK_SIZE):
+            text = decoder.decode(mapped[offset:offset + STREAM_CHUNK_SIZE])
+            parts.append(text)
+            chars += len(text)
+            if chars > max_length:
+                break
+        return ''.join(parts)
+
+
+def extract_document(response: Download, url: str, timer: StageTimer,
+                     links: bool = False) -> Tuple[dict, str, dict]:
+    """
+    解码内存中的 HTML 页面，提取元数据和正文 HTML，并裁剪正文中的样板内容
+
+    Args:
+        response: 下载结果（正文在内存中）
+        url: 页面 URL
+        timer: 阶段计时器
+        links: 是否收集整个页面（裁剪前）中的链接
+
+    Returns:
+        (元数据, 裁剪后的正文 HTML, 附加结果字段：pruned 为裁剪报告（见 boilerplate.prune_html），
+        收集链接时还有 links)
+    """
+    with timer.stage('decode'):
+        html_content = response.text()
+
+    # 提取元数据
+    with timer.stage('metadata'):
+        metadata = extract_metadata(html_content, url)
+        extracted = {}
+        if links:
+            extracted['links'] = extract_links(LINK_PATTERN.findall(html_content), response.url)
+
+    # 尝试提取主要内容
+    with timer.stage('main_content'):
+        main_html = extract_main_content(html_content)
+
+    # 删除导航栏、页脚、评论区等与正文无关的内容
+    with timer.stage('prune'):
+        main_html, extracted['pruned'] = prune_html(main_html)
+
+    return metadata, main_html, extracted
+
+
+def convert_document_job(response: Download, url: str, fingerprint: bool, markdown: bool,
+                         converter: str = 'auto', max_length: Optional[int] = None,
+                         resume_offset: int = 0, links: bool = False) -> tuple:
+    """
+    在转换进程中处理一个 HTML 页面：解码、提取正文，按需计算 SimHash 和转换为 Markdown
+
+    Args:
+        response: 只含正文字节的下载结果（content 在内存中）
+        url: 页面 URL
+        fingerprint: 是否计算 SimHash
+        markdown: 是否转换为 Markdown
+        converter: 转换后端名称或 auto（见 select_converter）
+        max_length: 最大输出字符数，为空时不限（见 convert_main_content）
+        resume_offset: 从正文 HTML 的该字符偏移开始转换
+        links: 是否收集页面中的链接
+
+    Returns:
+        (元数据, Markdown 内容或 None, 附加结果字段, 阶段计时器)，附加字段见 convert_response
+    """
+    timer = StageTimer()
+    metadata, main_html, extracted = extract_document(response, url, timer, links)
+    fields = fingerprint_content(main_html, response.url, None, timer) if fingerprint else {}
+    fields.update(extracted)
+    markdown_content = None
+    if markdown:
+        with timer.stage('markdown'):
+            markdown_content, converted = convert_main_content(main_html, url, converter, max_length, resume_offset)
+        fields.update(converted)
+    return metadata, markdown_content, fields, timer
+
+
+def convert_in_process(response: Download, url: str, timer: StageTimer,
+                       fingerprints: Optional[FingerprintIndex], process_pool: Executor,
+                       converter: str = 'auto', max_length: Optional[int] = None,
+                       resume_offset: int = 0, links: bool = False) -> tuple:
+    """
+    在进程池中转换内存中的 HTML 页面，绕开 GIL，多个页面的转换可以在多个核上同时进行
+
+    转换进程的各阶段耗时并入 timer；提交、排队和进程间传输的耗时记为 process_pool 阶段。
+    开启去重时分两步：先在转换进程中计算 SimHash，在本进程的指纹索引中登记后，
+    不是近似重复的页面再提交一次转换（正文在转换进程中重新解码和提取）。
+
+    Args:
+        response: 下载结果（正文在内存中）
+        url: 页面 URL
+        timer: 阶段计时器
+        fingerprints: 近似重复指纹索引，为空时不做去重
+        process_pool: 转换进程池
+        converter: 转换后端名称或 auto（见 select_converter）
+        max_length: 最大输出字符数，为空时不限（见 convert_main_content）
+        resume_offset: 从正文 HTML 的该字符偏移开始转换
+        links: 是否收集页面中的链接（在第一次提交的任务中收集）
+
+    Returns:
+        (元数据, Markdown 内容, 附加结果字段)，附加字段见 convert_response
+    """
+    # 只把正文字节发给转换进程，响应头等不需要序列化
+    job = Download(response.url, response.status_code, {}, response.content, {})
+
+    def run(fingerprint: bool, markdown: bool) -> tuple:
+        start = time.perf_counter()
+        metadata, markdown_content, fields, job_timer = process_pool.submit(
+            convert_document_job, job, url, fingerprint, markdown, converter, max_length, resume_offset,
+            links and fingerprint).result()
+        timer.merge(job_timer)
+        timer.add('process_pool', max(0.0, time.perf_counter() - start - job_timer.total()))
+        return metadata, markdown_content, fields
+
+    if fingerprints is None:
+        return run(True, True)
+
+    metadata, _, fields = run(True, False)
+    if 'simhash' in fields:
+        with timer.stage('simhash'):
+            match = fingerprints.claim(int(fields['simhash'], 16), response.url)
+        if match is not None:
+            fields['duplicate_of'], fields['distance'] = match
+            return metadata, duplicate_note(fields), fields
+    _, markdown_content, converted = run(False, True)
+    fields.update((key, converted[key]) for key in ('converter', 'continuation') if key in converted)
+    return metadata, markdown_content, fields
+
+
+def _start_worker() -> None:
+    """空任务，用于提前启动转换进程"""
+
+
+class ConversionPool:
+    """
+    按需启动的转换进程池
+
+    进程以 spawn 方式启动（拉取线程已在运行，fork 可能复制到被其它线程持有的锁），
+    每个进程需要数百毫秒导入模块。因此累计待转换的 HTML 达到 POOL_START_BYTES 后
+    才启动进程池，小批量拉取不承担这部分开销；进程全部就绪前、以及小于
+    POOL_MIN_PAGE_BYTES 的页面，仍在拉取线程中转换，不等待进程启动。线程安全。
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._starting: List = []
+        self._seen_bytes = 0
+        self._lock = threading.Lock()
+
+    def executor_for(self, size: int) -> Optional[Executor]:
+        """
+        为一个页面选择转换方式
+
+        Args:
+            size: 页面正文字节数
+
+        Returns:
+            进程池；应在当前线程中转换时返回 None
+        """
+        if size < POOL_MIN_PAGE_BYTES:
+            return None
+        with self._lock:
+            self._seen_bytes += size
+            if self._pool is None:
+                if self._seen_bytes < POOL_START_BYTES:
+                    return None
+                self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+                self._starting = [self._pool.submit(_start_worker) for _ in range(self.processes)]
+            if self._starting:
+                if not all(future.done() for future in self._starting):
+                    return None
+                self._starting = []
+            return self._pool
+
+    def shutdown(self) -> None:
+        """关闭进程池（未启动时什么也不做）"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+def convert_response(response: Download, kind: str, mime: str, url: str, max_length: int,
+                     timer: StageTimer, fingerprints: Optional[FingerprintIndex] = None,
+                     process_pool: Optional[Executor] = None, converter: str = 'auto',
+                     resume_offset: int = 0, links: bool = False) -> tuple:
+    """
+    按内容类别将下载结果转换为 Markdown
+
+    HTML 页面在提取正文、裁剪样板内容后计算 SimHash；与指纹索引中已有页面近似重复时
+    跳过转换，Markdown 内容只是一行说明。正文较长时转换到 max_length 附近的块边界即停止，
+    后面的 HTML 不再解析（见 convert_with_budget）。
+
+    Args:
+        response: 下载结果
+        kind: 内容类别（html / json / text / binary）
+        mime: MIME 类型
+        url: 页面 URL
+        max_length: 最大内容长度
+        timer: 阶段计时器
+        fingerprints: 近似重复指纹索引，为空时不做去重
+        process_pool: 转换进程池；传入时内存中的 HTML 页面在进程池中转换（见 convert_in_process），
+            写入临时文件的大页面仍在当前线程中流式转换
+        converter: HTML 页面的转换后端名称或 auto（见 select_converter）
+        resume_offset: 从上一次结果的 continuation.offset 继续转换：内存中的 HTML 页面为正文 HTML 的
+            字符偏移，写入临时文件的大页面为页面的字节偏移（见 convert_spilled_html）
+        links: 是否收集 HTML 页面中的链接
+
+    Returns:
+        (元数据, Markdown 内容, 附加结果字段)。HTML 页面的附加字段包括 simhash（近似重复时还有
+        duplicate_of 和 distance）、converter（实际使用的转换后端）、pruned（裁剪报告），
+        转换提前停止时还有 continuation（见 convert_main_content），收集链接时还有 links
+    """
+    content_type = response.headers.get('Content-Type', '')
+
+    if kind == 'binary':
+        # 二进制内容（PDF、图片、压缩包等）只返回元数据
+        metadata = file_metadata(url, mime, response.headers)
+        size = f"，{format_size(metadata['size'])}" if 'size' in metadata else ''
+        return metadata, f'> 非文本内容（{mime}{size}），未下载正文。', {}
+
+    if kind in ('json', 'text'):
+        # JSON 和纯文本原样输出，不经过 HTML 提取与转换
+        with timer.stage('decode'):
+            charset = content_charset(content_type) or ('utf-8' if kind == 'json' else None)
+            if response.spilled:
+                text_content = read_spilled_text(response, charset, max_length)
+            else:
+                text_content = response.text(charset)
+        metadata = file_metadata(url, mime, response.headers)
+        return metadata, f'```json\n{text_content}\n```' if kind == 'json' else text_content, {}
+
+    if response.spilled:
+        return convert_spilled_html(response, url, max_length, timer, fingerprints, converter, links, resume_offset)
+
+    if process_pool is not None:
+        return convert_in_process(response, url, timer, fingerprints, process_pool, converter,
+                                  max_length, resume_offset, links)
+
+    metadata, main_html, extracted = extract_document(response, url, timer, links)
+
+    # 近似重复的页面不再转换
+    fields = fingerprint_content(main_html, response.url, fingerprints, timer)
+    fields.update(extracted)
+    if 'duplicate_of' in fields:
+        return metadata, duplicate_note(fields), fields
+
+    # 转换为 Markdown，输出达到长度上限后停止
+    with timer.stage('markdown'):
+        markdown_content, converted = convert_main_content(main_html, url, converter, max_length, resume_offset)
+    fields.update(converted)
+
+    return metadata, markdown_content, fields
+
+
+def page_end(markdown: str, start: int, page_size: int) -> int:
+    """从 start 开始的一页的结束位置：不超过 page_size 个字符，尽量停在段落之间的空行后"""
+    end = start + page_size
+    if end >= len(markdown):
+        return len(markdown)
+    cut = markdown.rfind('\n\n', start + int(page_size * MIN_PAGE_FILL), end)
+    return cut + 2 if cut >= 0 else end
+
+
+def paginate(markdown: str, page_size: int, offset: Optional[int] = None,
+             page: Optional[int] = None) -> Tuple[str, dict]:
+    """
+    从整篇文档的 Markdown 中截取一页
+
+    各页从文档开头依次划分（见 page_end），page 为页码；offset 为任意字符偏移，从该处开始
+    截取一页，所在页码为包含该偏移的页。
+
+    Args:
+        markdown: 整篇文档的 Markdown
+        page_size: 每页最大字符数
+        offset: 起始字符偏移（与 page 二选一）
+        page: 页码，从 1 开始
+
+    Returns:
+        (该页内容, 分页信息：offset、page、total_pages、page_size、total_length，
+        还有下一页时有 next_offset)
+
+    Raises:
+        ValueError: 偏移或页码超出文档范围
+    """
+    starts = [0]
+    while True:
+        end = page_end(markdown, starts[-1], page_size)
+        if end >= len(markdown):
+            break
+        starts.append(end)
+
+    if offset is None:
+        page = page or 1
+        if not 1 <= page <= len(starts):
+            raise ValueError(f'页码超出范围: {page}（共 {len(starts)} 页）')
+        offset = starts[page - 1]
+    else:
+        if not 0 <= offset < max(len(markdown), 1):
+            raise ValueError(f'偏移超出范围: {offset}（文档共 {len(markdown)} 个字符）')
+        page = bisect.bisect_right(starts, offset)
+
+    end = page_end(markdown, offset, page_size)
+    paging = {
+        'offset': offset,
+        'page': page,
+        'total_pages': len(starts),
+        'page_size': page_size,
+        'total_length': len(markdown),
+    }
+    if end < len(markdown):
+        paging['next_offset'] = end
+    return markdown[offset:end], paging
+
+
+def page_result(result: dict, page_size: int, offset: Optional[int] = None,
+                page: Optional[int] = None) -> dict:
+    """将整篇文档的结果换成其中一页（见 paginate），原结果不变"""
+    try:
+        markdown_content, paging = paginate(result['markdown'], page_size, offset, page)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    return {**result, 'markdown': markdown_content, 'content_length': len(markdown_content), 'paging': paging}
+
+
+def truncate_result(result: dict, max_length: int) -> dict:
+    """内容超过 max_length 时截断（本地存储中保存的可能是整篇文档）"""
+    if len(result['markdown']) > max_length:
+        result['markdown'] = result['markdown'][:max_length] + TRUNCATION_NOTE
+        result['content_length'] = len(result['markdown'])
+    return result
+
+
+# 模拟浏览器的请求头
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+
+def fetch_url(url: str, timeout: int = 30, max_length: int = 50000, timings: bool = False,
+              http2: bool = False, store: Optional[PageStore] = None,
+              max_age: Optional[float] = None, fingerprints: Optional[FingerprintIndex] = None,
+              conversion_pool: Optional[ConversionPool] = None, converter: str = 'auto',
+              resume_offset: int = 0, offset: Optional[int] = None, page: Optional[int] = None,
+              links: bool = False) -> dict:
     """
     拉取指定 URL 的内容并转换为 Markdown
 
     Args:
         url: 要拉取的网页 URL
         timeout: 请求超时时间（秒）
-        max_length: 最大内容长度
+        max_length: 最大内容长度；分页读取时为每页的最大字符数
+        timings: 是否在结果中附带各阶段耗时（毫秒）
+        http2: 是否使用 HTTP/2 传输（需要 httpx 和 h2，否则自动使用 HTTP/1.1）
+        store: 本地页面存储；传入时成功的结果会被保存，已保存的页面通过
+            If-None-Match / If-Modified-Since 条件请求验证，未修改（304）时直接使用本地内容
+        max_age: 与 store 一起使用，本地结果在该秒数内拉取过时直接返回，不发请求
+        fingerprints: 近似重复指纹索引；正文与索引中已有页面近似重复时跳过转换，
+            结果带有 duplicate_of（规范副本 URL）和 distance（SimHash 汉明距离），且不保存到 store；
+            规范副本已保存在 store 中时 markdown 为它的内容，否则为一行重复说明
+        conversion_pool: 转换进程池（见 ConversionPool），为空时在当前线程中转换
+        converter: HTML → Markdown 转换后端（见 CONVERTERS），auto 按正文大小和已安装的库选择
+        resume_offset: 从正文 HTML 的该字符偏移继续转换，取上一次结果的 continuation.offset；
+            大于 0 时不读取也不保存 store 中的结果
+        offset: 分页读取：从整篇文档 Markdown 的该字符偏移开始返回一页（见 paginate）
+        page: 分页读取：返回第几页（从 1 开始）。分页读取时转换整篇文档并保存到 store，
+            之后的各页直接从 store 中截取，不再发请求
+        links: 是否在结果中附带页面中的链接（links 字段，绝对 URL；来自 store 的结果没有该字段）
 
     Returns:
-        包含网页内容和元数据的字典
+        包含网页内容和元数据的字典；来自本地存储的结果带有 cached 字段，HTML 页面带有 simhash、
+        pruned（裁剪报告）字段，转换过的 HTML 页面带有 converter 字段（实际使用的后端），
+        因长度上限提前停止转换时带有 continuation 字段（offset 为继续转换的位置，total 为正文 HTML 长度），
+        分页读取时带有 paging 字段（见 paginate）
     """
     if not REQUESTS_AVAILABLE:
         return {
             'success': False,
             'error': 'requests 库未安装，请运行: pip install requests'
         }
+    try:
+        select_converter(converter, 0)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+
+    timer = StageTimer()
+    start = time.perf_counter()
+
+    def finish(result: dict) -> dict:
+        if timings:
+            timer.add('total', time.perf_counter() - start)
+            result['timings'] = timer.as_dict()
+        return result
+
+    # 续读的结果只是页面的一部分，不与 store 中的完整结果混用
+    if resume_offset:
+        store = None
+    paged = offset is not None or page is not None
+
+    def respond(result: dict, content_limit: Optional[int] = None) -> dict:
+        if paged:
+            return finish(page_result(result, max_length, offset, page))
+        if content_limit == max_length:
+            # 内容就是按本次的上限截断的，已带有截断说明
+            return finish(result)
+        return finish(truncate_result(result, max_length))
+
+    stored = None
+    content_limit = None
+    if store is not None:
+        with timer.stage('store_lookup'):
+            stored = store.get(url)
+        if stored is not None:
+            covered = covers(stored, max_length, paged)
+            stored.pop('full_content', None)
+            content_limit = stored.pop('content_limit', None)
+            fresh = max_age is None or time.time() - stored['fetched_at'] <= max_age
+            if not covered:
+                # 需要重新下载并转换，不能用条件请求
+                stored = None
+            elif fresh and (paged or max_age is not None):
+                # 已保存整篇文档时，分页读取不再发请求（除非超过 max_age）
+                return respond(stored, content_limit)
 
     try:
         # 设置请求头，模拟浏览器
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
+        headers = dict(BROWSER_HEADERS)
+        if stored is not None:
+            validators = stored.get('validators') or {}
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
 
-        response = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding or 'utf-8'
+        # 首个数据块到达时判断内容类别，二进制内容立即中止下载
+        sniffed = {'kind': 'html', 'mime': 'text/html'}
 
-        html_content = response.text
+        def inspect(response_headers, head: bytes) -> bool:
+            sniffed['kind'], sniffed['mime'] = sniff_content(response_headers.get('Content-Type', ''), head)
+            return sniffed['kind'] != 'binary'
 
-        # 提取元数据
-        metadata = extract_metadata(html_content, url)
+        # 下载过程占用限速名额，保证每个主机的并发连接数不超限
+        response = fetch_bytes(url, headers, timeout, timer=timer, http2=http2, inspect=inspect)
+        kind, mime = sniffed['kind'], sniffed['mime']
 
-        # 尝试提取主要内容
-        main_html = extract_main_content(html_content)
+        if response.status_code == 304 and stored is not None:
+            # 页面未修改，使用本地保存的内容
+            response.close()
+            store.touch(stored['url'])
+            stored['fetched_at'] = time.time()
+            stored['revalidated'] = True
+            stored['transfer'] = response.transfer
+            return respond(stored, content_limit)
 
-        # 转换为 Markdown
-        if HTML2TEXT_AVAILABLE:
-            markdown_content = clean_html_with_html2text(main_html, url)
-        else:
-            markdown_content = clean_html_simple(main_html)
+        # 按估算的工作集向共享内存预算预留额度，估算总量超过预算时后续页面等待
+        spilled = response.spilled
+        process_pool = None
+        if conversion_pool is not None and kind == 'html' and not spilled:
+            process_pool = conversion_pool.executor_for(response.size)
+        # 分页读取时转换整篇文档（不超过 MAX_DOCUMENT_CHARS），保存后再截取其中一页
+        limit = MAX_DOCUMENT_CHARS if paged else max_length
+        try:
+            with recording(timer), get_memory_budget().reserve(working_set_estimate(response, limit)):
+                metadata, markdown_content, fields = convert_response(
+                    response, kind, mime, url, limit, timer, fingerprints, process_pool, converter,
+                    resume_offset, links)
+        finally:
+            response.close()
 
-        # 限制内容长度
-        if len(markdown_content) > max_length:
-            markdown_content = markdown_content[:max_length] + '\n\n... (内容过长，已截断)'
+        # 能完整转换时保存整篇文档，返回前再按 max_length 截断；提前停止转换（有 continuation）
+        # 或超过 MAX_DOCUMENT_CHARS 时只是部分内容，记录截断时的上限
+        full_content = 'continuation' not in fields and len(markdown_content) <= limit
+        content_limit = None
+        canonical = None
+        if 'duplicate_of' in fields and store is not None:
+            # 规范副本已保存在本地页面库中时返回它的内容，而不只是一行重复说明
+            canonical = store.get(fields['duplicate_of'])
+            if canonical is not None and not covers(canonical, max_length, paged):
+                canonical = None
+        if canonical is not None:
+            markdown_content = canonical['markdown']
+            content_limit = canonical.get('content_limit')
+        elif paged:
+            markdown_content = markdown_content[:limit]
+            if not full_content:
+                content_limit = limit
+        elif 'continuation' in fields:
+            content_limit = max_length
+            stopped = fields['continuation']['offset']
+            position = f'页面第 {stopped} 字节' if spilled else f'正文 HTML 第 {stopped} 个字符'
+            markdown_content += f"{TRUNCATION_NOTE[:-1]}；从{position}继续转换: --resume-offset {stopped})"
+        elif len(markdown_content) > MAX_DOCUMENT_CHARS:
+            full_content = False
+            content_limit = MAX_DOCUMENT_CHARS
+            markdown_content = markdown_content[:MAX_DOCUMENT_CHARS] + TRUNCATION_NOTE
 
-        return {
+        result = {
             'success': True,
             'url': response.url,
             'status_code': response.status_code,
             'metadata': metadata,
             'markdown': markdown_content,
-            'content_length': len(markdown_content)
+            'content_length': len(markdown_content),
+            'content_type': mime,
+            'content_kind': kind,
+            'complete': response.complete,
+            'spilled': spilled,
+            'transfer': response.transfer,
+            'validators': {key: response.headers[header]
+                           for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'))
+                           if response.headers.get(header)},
+            'fetched_at': time.time(),
+            **fields,
         }
+        if store is not None and kind != 'binary' and 'duplicate_of' not in fields:
+            with timer.stage('store'):
+                store.put(result, requested_url=url, full_content=full_content, content_limit=content_limit)
+        return respond(result, content_limit)
 
     except requests.exceptions.Timeout:
         return {
@@ -185,6 +1280,12 @@ def fetch_url(url: str, timeout: int = 30, max_length: int = 50000) -> dict:
             'success': False,
             'error': f'HTTP 错误: {e.response.status_code}'
         }
+    except ValueError as e:
+        # 续读偏移超出正文范围等参数错误
+        return {
+            'success': False,
+            'error': str(e)
+        }
     except Exception as e:
         return {
             'success': False,
@@ -192,42 +1293,329 @@ def fetch_url(url: str, timeout: int = 30, max_length: int = 50000) -> dict:
         }
 
 
+def available_cpus() -> int:
+    """当前进程可用的 CPU 核数（考虑 CPU 亲和性设置）"""
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def fetch_urls(urls: List[str], timeout: int = 30, max_length: int = 50000, workers: int = 4,
+               timings: bool = False, http2: bool = False, store: Optional[PageStore] = None,
+               max_age: Optional[float] = None, dedup: bool = False, dedup_store: bool = False,
+               processes: Optional[int] = None, converter: str = 'auto',
+               offset: Optional[int] = None, page: Optional[int] = None) -> Iterator[Tuple[str, dict]]:
+    """
+    并发拉取多个 URL，按完成顺序逐个产出结果
+
+    开始拉取前在后台并发预解析所有主机名，各请求的 dns 阶段只记录等待解析的时间。
+    开启去重时，本批次共用一个指纹索引（dedup_store 为真时预先载入 store 中已保存页面的指纹），
+    正文近似重复的页面只有最先完成提取的一个会被转换，其余标记为它的重复。
+
+    HTML 到 Markdown 的转换是纯 Python 的 CPU 密集计算，在线程中受 GIL 限制只能用到
+    一个核；多个 URL 且待转换的页面足够多时，转换在进程池中进行（见 ConversionPool），
+    拉取线程只负责网络 I/O。
+
+    Args:
+        urls: URL 列表
+        timeout: 请求超时时间（秒）
+        max_length: 最大内容长度
+        workers: 并发线程数
+        timings: 是否附带各阶段耗时
+        http2: 是否使用 HTTP/2 传输（同一主机的并发请求复用一个连接）
+        store: 本地页面存储（见 fetch_url）
+        max_age: 本地结果的最长有效时间（秒，见 fetch_url）
+        dedup: 是否折叠本批次中近似重复的页面
+        dedup_store: 去重时是否也与 store 中已保存的页面比较
+        processes: 转换进程数，默认为可用 CPU 核数（不超过 URL 数）；1 表示在拉取线程中转换
+        converter: HTML → Markdown 转换后端（见 fetch_url）
+        offset: 分页读取的起始字符偏移（见 fetch_url）
+        page: 分页读取的页码（见 fetch_url）
+
+    Yields:
+        (URL, 结果字典)
+    """
+    prefetch_hosts(urls)
+    fingerprints = None
+    if dedup:
+        fingerprints = store.fingerprint_index() if dedup_store and store is not None else FingerprintIndex()
+    processes = min(available_cpus() if processes is None else processes, len(urls))
+    conversion_pool = ConversionPool(processes) if processes > 1 else None
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                executor.submit(fetch_url, url, timeout, max_length, timings, http2, store, max_age,
+                                fingerprints, conversion_pool, converter, 0, offset, page): url
+                for url in urls
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    finally:
+        if conversion_pool is not None:
+            conversion_pool.shutdown()
+
+
+# 对比转换后端时每个后端重复转换的次数，取最快一次
+COMPARE_REPEAT = 3
+
+
+def load_document(source: str, timeout: int = 30) -> str:
+    """
+    读取本地 HTML 文件，或拉取 URL 的完整 HTML（不经过转换，用于对比转换后端）
+
+    Args:
+        source: 本地文件路径或 URL
+        timeout: 请求超时时间（秒）
+
+    Returns:
+        解码后的 HTML 文本
+    """
+    if os.path.isfile(source):
+        with open(source, 'rb') as f:
+            return Download(source, 200, {}, f.read(), {}).text()
+    response = fetch_bytes(source, dict(BROWSER_HEADERS), timeout)
+    try:
+        if response.spilled:
+            with response.open_mmap() as mapped:
+                content = mapped[:]
+        else:
+            content = response.content
+        return Download(response.url, response.status_code, response.headers, content, {}).text(
+            content_charset(response.headers.get('Content-Type', '')))
+    finally:
+        response.close()
+
+
+def compare_converters(html_content: str, repeat: int = COMPARE_REPEAT) -> List[Dict]:
+    """
+    用每个已安装的转换后端转换同一页面的正文，对比速度和输出
+
+    Args:
+        html_content: 完整页面 HTML
+        repeat: 每个后端的转换次数，耗时取最快一次
+
+    Returns:
+        每个后端一行：耗时（毫秒）、输出字符数和字节数、行数、标题数、链接数，
+        auto 模式会选择的后端带有 auto 标记
+    """
+    main_html = extract_main_content(html_content)
+    auto = select_converter('auto', len(main_html))
+    rows = []
+    for name in available_converters():
+        best = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            output = CONVERTERS[name](main_html, '')
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        lines = output.splitlines()
+        rows.append({
+            'converter': name,
+            'auto': name == auto,
+            'input_chars': len(main_html),
+            'ms': round(best * 1000, 3),
+            'chars': len(output),
+            'bytes': len(output.encode('utf-8')),
+            'lines': len(lines),
+            'headings': sum(1 for line in lines if line.startswith('#')),
+            'links': output.count(']('),
+        })
+    return rows
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    """将转换后端对比结果格式化为文本表格"""
+    headers = ['converter', 'ms', 'chars', 'bytes', 'lines', 'headings', 'links']
+    table = [headers] + [[row['converter'] + (' (auto)' if row['auto'] else '')]
+                         + [str(row[h]) for h in headers[1:]] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(headers))]
+    lines = []
+    for i, line in enumerate(table):
+        lines.append('  '.join(cell.ljust(widths[j]) for j, cell in enumerate(line)))
+        if i == 0:
+            lines.append('  '.join('-' * w for w in widths))
+    return '\n'.join(lines)
+
+
+def run_comparison(sources: List[str], timeout: int, as_json: bool) -> bool:
+    """
+    对每个 URL 或本地 HTML 文件对比转换后端并输出结果
+
+    Returns:
+        是否全部成功
+    """
+    reports = []
+    ok = True
+    for source in sources:
+        try:
+            rows = compare_converters(load_document(source, timeout))
+        except Exception as e:
+            print(f'错误: {source}: {e}', file=sys.stderr)
+            ok = False
+            continue
+        reports.append({'source': source, 'converters': rows})
+        if not as_json:
+            print(f"# {source}（正文 {rows[0]['input_chars']} 字符）")
+            print(format_comparison(rows))
+            print()
+    if as_json:
+        output = reports[0] if len(reports) == 1 else reports
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+    return ok
+
+
+def write_ndjson(record: dict, stream=None) -> None:
+    """以紧凑 JSON 行写出一条记录并立即刷新（NDJSON 流式输出）"""
+    stream = stream or sys.stdout
+    stream.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+    stream.flush()
+
+
+def print_markdown(result: dict) -> None:
+    """以 Markdown 格式输出单个页面结果"""
+    title = result['metadata'].get('title') or result['metadata'].get('og_title') or '无标题'
+    output = []
+    output.append(f"# {title}\n")
+    output.append(f"> 来源: {result['url']}\n")
+
+    if result['metadata'].get('description'):
+        output.append(f"> {result['metadata']['description']}\n")
+
+    output.append("---\n")
+    output.append(result['markdown'])
+
+    paging = result.get('paging')
+    if paging:
+        output[-1] = output[-1].rstrip('\n')
+        output.append(f"\n\n---\n\n> 第 {paging['page']}/{paging['total_pages']} 页"
+                      f"（字符 {paging['offset']}-{paging['offset'] + result['content_length']}，"
+                      f"共 {paging['total_length']}）")
+        if 'next_offset' in paging:
+            output.append(f"，下一页: --offset {paging['next_offset']}")
+
+    output_text = ''.join(output)
+    # 确保输出使用 UTF-8 编码
+    try:
+        print(output_text, flush=True)
+    except UnicodeEncodeError:
+        print(output_text.encode('utf-8', errors='replace').decode('utf-8', errors='replace'), flush=True)
+
+
 def main():
     parser = argparse.ArgumentParser(description='本地网页内容拉取工具 - 转换为 Markdown')
-    parser.add_argument('url', help='要拉取的网页 URL')
+    parser.add_argument('urls', nargs='+', metavar='url',
+                        help='要拉取的网页 URL（可指定多个；--compare-converters 时也可以是本地 HTML 文件）')
     parser.add_argument('-t', '--timeout', type=int, default=30, help='请求超时时间（秒），默认 30')
     parser.add_argument('-l', '--max-length', type=int, default=50000, help='最大内容长度，默认 50000')
     parser.add_argument('-j', '--json', action='store_true', help='以 JSON 格式输出')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='以 NDJSON 格式流式输出（每个页面一行紧凑 JSON，完成即输出）')
+    parser.add_argument('--timings', action='store_true',
+                        help='输出各阶段耗时（DNS、连接、TLS、首字节、下载、解码、提取、转换）')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='批量拉取时的并发数，默认 4')
+    parser.add_argument('-p', '--processes', type=int,
+                        help='批量拉取时转换 Markdown 的进程数（默认: 可用 CPU 核数；1 表示不使用进程池）')
+    parser.add_argument('--converter', choices=['auto'] + list(CONVERTERS), default='auto',
+                        help='HTML → Markdown 转换后端（默认: auto，按正文大小和已安装的库选择；'
+                             'lxml 为快速转换器，simple 只保留纯文本）')
+    parser.add_argument('--compare-converters', action='store_true',
+                        help='不输出内容，对比各转换后端在这些页面上的耗时和输出大小')
+    parser.add_argument('--http2', action='store_true',
+                        help='使用 HTTP/2 传输（需要 httpx 和 h2，不支持时自动回落到 HTTP/1.1）')
+    parser.add_argument('--page', type=int,
+                        help='分页读取长文档：返回第几页（从 1 开始，每页最多 --max-length 个字符）；'
+                             '首次读取时转换整篇文档并保存到本地页面库，之后各页不再发请求')
+    parser.add_argument('--offset', type=int,
+                        help='分页读取长文档：从整篇文档 Markdown 的该字符偏移开始返回一页')
+    parser.add_argument('--resume-offset', type=int, default=0,
+                        help='从正文 HTML 的该字符偏移继续转换（上一次结果的 continuation.offset，只能指定一个 URL）')
+
+    parser.add_argument('--max-age', type=float,
+                        help='本地库中有该秒数内拉取过的结果时直接返回，不发请求')
+    parser.add_argument('--no-store', action='store_true', help='不读写本地页面库')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='不折叠近似重复的页面（默认按正文 SimHash 跳过本批次中镜像页面的转换）')
+    parser.add_argument('--dedup-store', action='store_true',
+                        help='去重时也与本地页面库中已保存的页面比较，重复时返回已保存的规范副本')
 
     args = parser.parse_args()
 
-    result = fetch_url(args.url, args.timeout, args.max_length)
+    try:
+        select_converter(args.converter, 0)
+    except ValueError as e:
+        parser.error(str(e))
 
-    if args.json:
-        print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.compare_converters:
+        if not run_comparison(args.urls, args.timeout, args.json):
+            sys.exit(1)
+        return
+
+    if args.resume_offset < 0:
+        parser.error('--resume-offset 不能为负数')
+    if args.resume_offset and len(args.urls) > 1:
+        parser.error('--resume-offset 只能与一个 URL 一起使用')
+    if args.page is not None and args.offset is not None:
+        parser.error('--page 和 --offset 不能同时使用')
+    if args.page is not None and args.page < 1:
+        parser.error('--page 从 1 开始')
+    if args.offset is not None and args.offset < 0:
+        parser.error('--offset 不能为负数')
+    if args.resume_offset and (args.page is not None or args.offset is not None):
+        parser.error('--resume-offset 不能与 --page / --offset 同时使用')
+
+    store = None if args.no_store else get_page_store()
+    if args.resume_offset:
+        url = args.urls[0]
+        pages = [(url, fetch_url(url, args.timeout, args.max_length, args.timings, args.http2,
+                                 converter=args.converter, resume_offset=args.resume_offset))]
     else:
+        pages = fetch_urls(args.urls, args.timeout, args.max_length, args.workers,
+                           timings=args.timings, http2=args.http2, store=store, max_age=args.max_age,
+                           dedup=not args.no_dedup, dedup_store=args.dedup_store, processes=args.processes,
+                           converter=args.converter, offset=args.offset, page=args.page)
+
+    if args.ndjson:
+        # NDJSON 按完成顺序输出
+        for url, result in pages:
+            write_ndjson({'type': 'page', 'input_url': url, **result})
+        return
+
+    # 其它格式保持输入顺序
+    results = dict(pages)
+
+    if args.json:
+        # 单个 URL 时保持原有的对象输出格式
+        json_results = [results[url] for url in args.urls]
+        output = json_results[0] if len(json_results) == 1 else json_results
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+        return
+
+    failed = False
+    duplicates = 0
+    for url in args.urls:
+        result = results[url]
         if result['success']:
-            # 输出 Markdown 格式
-            title = result['metadata'].get('title') or result['metadata'].get('og_title') or '无标题'
-            output = []
-            output.append(f"# {title}\n")
-            output.append(f"> 来源: {result['url']}\n")
-
-            if result['metadata'].get('description'):
-                output.append(f"> {result['metadata']['description']}\n")
-
-            output.append("---\n")
-            output.append(result['markdown'])
-
-            output_text = ''.join(output)
-            # 确保输出使用 UTF-8 编码
-            try:
-                print(output_text)
-            except UnicodeEncodeError:
-                print(output_text.encode('utf-8', errors='replace').decode('utf-8', errors='replace'))
+            print_markdown(result)
+            if result.get('duplicate_of'):
+                duplicates += 1
+                print(f"# [Dedup] {url}: 与 {result['duplicate_of']} 近似重复（距离 {result['distance']}）",
+                      file=sys.stderr)
+            if args.timings:
+                print(f"# [Timings] {url}: {json.dumps(result['timings'], ensure_ascii=False)}", file=sys.stderr)
+                if result.get('transfer'):
+                    # 来自本地存储、未发请求的结果没有传输信息
+                    print(f"# [Transfer] {url}: {json.dumps(result['transfer'], ensure_ascii=False)}",
+                          file=sys.stderr)
         else:
-            print(f"错误: {result['error']}", file=sys.stderr)
-            sys.exit(1)
+            print(f"错误: {url}: {result['error']}", file=sys.stderr)
+            failed = True
+
+    if duplicates:
+        print(f'# [Dedup] 共折叠 {duplicates} 个近似重复页面', file=sys.stderr)
+
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,1044 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 客户端公共模块
+
+为 fetch_url.py 和 search_engines.py 提供共享的 requests 会话（连接复用），
+按阶段记录每次请求的耗时（DNS 解析、TCP 连接、TLS 握手等），并通过按主机的
+令牌桶限速器控制请求频率和并发连接数，对瞬时错误进行带抖动的退避重试。
+主机名解析经过进程内 DNS 缓存（按记录 TTL 过期），批量请求前可并发预解析所有主机。
+安装 httpx 和 h2 后，可选用 HTTP/2 传输，在单个连接上多路复用同一主机的并发请求。
+超过阈值的大页面正文写入临时文件；并发处理的页面按估算的内存用量共享进程内的预算（准入控制，
+不是硬性上限）。
+"""
+
+import ipaddress
+import json
+import mmap
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+    from urllib3.util.request import ACCEPT_ENCODING as URLLIB3_ENCODINGS
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    URLLIB3_ENCODINGS = 'gzip,deflate'
+    REQUESTS_AVAILABLE = False
+
+try:
+    import httpx
+    import httpcore
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import dns.exception
+    import dns.resolver
+    DNSPYTHON_AVAILABLE = True
+except ImportError:
+    DNSPYTHON_AVAILABLE = False
+
+
+def negotiate_encodings(available: str = URLLIB3_ENCODINGS) -> str:
+    """
+    生成 Accept-Encoding 请求头
+
+    只声明 urllib3 在当前环境中能解码的编码：安装 brotli / brotlicffi 时包含 br，
+    安装 zstandard 支持（Python 3.14+ 或 backports.zstd）时包含 zstd。
+    按压缩率从高到低排列，未安装解码器时退化为 gzip, deflate。
+    """
+    names = {name.strip() for name in available.split(',')}
+    return ', '.join(name for name in ('zstd', 'br', 'gzip', 'deflate') if name in names)
+
+
+ACCEPT_ENCODING = negotiate_encodings()
+
+
+# 本地缓存目录（引擎健康状态等），可通过环境变量覆盖
+CACHE_DIR_ENV = 'LOCAL_WEB_FETCH_CACHE'
+
+
+def get_cache_dir() -> Path:
+    """返回本地缓存目录，不存在时创建"""
+    path = Path(os.environ.get(CACHE_DIR_ENV) or Path.home() / '.cache' / 'local-web-fetch')
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@contextmanager
+def locked_json(path):
+    """
+    在文件锁保护下读写 JSON 状态文件
+
+    产出可修改的字典，退出上下文时写回文件。不支持 fcntl 的平台上不加锁。
+    """
+    with open(path, 'a+', encoding='utf-8') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or '{}')
+            except ValueError:
+                state = {}
+            yield state
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state, ensure_ascii=False))
+            f.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class StageTimer:
+    """
+    按阶段累计耗时
+
+    同名阶段多次计时会累加（例如重定向时的多次 DNS 解析），输出单位为毫秒。
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """以上下文管理器的方式为一个阶段计时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        """累加某个阶段的耗时（秒）"""
+        self._stages[name] = self._stages.get(name, 0.0) + seconds
+
+    def get(self, name: str) -> float:
+        """返回某个阶段已累计的耗时（秒）"""
+        return self._stages.get(name, 0.0)
+
+    def total(self) -> float:
+        """返回各阶段耗时之和（秒）"""
+        return sum(self._stages.values())
+
+    def merge(self, other: 'StageTimer') -> None:
+        """累加另一个计时器（例如转换进程返回的）中的各阶段耗时"""
+        for name, seconds in other._stages.items():
+            self.add(name, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        """返回各阶段耗时（毫秒，保留 3 位小数）"""
+        return {name: round(seconds * 1000, 3) for name, seconds in self._stages.items()}
+
+
+_local = threading.local()
+
+
+@contextmanager
+def recording(timer: Optional[StageTimer]):
+    """
+    将计时器绑定到当前线程
+
+    在此上下文中通过共享会话发起的请求，会把 DNS / 连接 / TLS 耗时记录到该计时器。
+    """
+    previous = getattr(_local, 'timer', None)
+    _local.timer = timer
+    try:
+        yield timer
+    finally:
+        _local.timer = previous
+
+
+def _record(name: str, seconds: float) -> None:
+    timer = getattr(_local, 'timer', None)
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+# DNS 缓存的 TTL（秒）。系统解析器不返回 TTL，未安装 dnspython 时使用默认值；
+# 解析失败的结果短暂缓存，避免批量请求中反复查询不存在的主机
+DNS_DEFAULT_TTL = 60.0
+DNS_MIN_TTL = 5.0
+DNS_MAX_TTL = 600.0
+DNS_NEGATIVE_TTL = 5.0
+DNS_MAX_ENTRIES = 1024
+DNS_PREFETCH_WORKERS = 16
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class DNSCache:
+    """
+    进程内 DNS 缓存
+
+    按记录的 TTL 缓存主机名解析结果（安装 dnspython 时读取真实 TTL，否则使用
+    默认 TTL），同一主机的并发解析合并为一次查询，其余线程等待该查询完成。
+    """
+
+    def __init__(self, default_ttl: float = DNS_DEFAULT_TTL, min_ttl: float = DNS_MIN_TTL,
+                 max_ttl: float = DNS_MAX_TTL, negative_ttl: float = DNS_NEGATIVE_TTL,
+                 max_entries: int = DNS_MAX_ENTRIES):
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # 主机名 -> (过期时间, 地址列表或解析异常)
+        self._entries: Dict[str, Tuple[float, object]] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _query(self, host: str) -> Tuple[List[str], float]:
+        """查询主机名，返回 (地址列表, TTL)"""
+        if DNSPYTHON_AVAILABLE:
+            addresses, ttls = [], []
+            for rdtype in ('A', 'AAAA'):
+                try:
+                    answer = dns.resolver.resolve(host, rdtype)
+                except dns.exception.DNSException:
+                    continue
+                addresses.extend(record.address for record in answer)
+                ttls.append(answer.rrset.ttl)
+            if addresses:
+                return addresses, min(max(min(ttls), self.min_ttl), self.max_ttl)
+
+        # 系统解析器（同时覆盖 hosts 文件等 dnspython 查不到的名称）
+        infos = socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos)), self.default_ttl
+
+    def _lookup(self, host: str) -> Optional[object]:
+        entry = self._entries.get(host)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def resolve(self, host: str) -> List[str]:
+        """
+        解析主机名，优先使用未过期的缓存
+
+        Args:
+            host: 主机名或 IP 地址（IP 地址原样返回）
+
+        Returns:
+            地址列表
+
+        Raises:
+            socket.gaierror: 解析失败
+        """
+        host = host.strip('[]').lower()
+        if _is_ip_address(host):
+            return [host]
+
+        while True:
+            with self._lock:
+                cached = self._lookup(host)
+                if cached is None:
+                    waiter = self._inflight.get(host)
+                    owner = waiter is None
+                    if owner:
+                        waiter = self._inflight[host] = threading.Event()
+            if cached is not None:
+                break
+            if not owner:
+                # 其它线程正在解析同一主机，等待其结果
+                waiter.wait()
+                continue
+
+            # 查询时出现 OSError 以外的异常（例如 KeyboardInterrupt）不写入缓存，
+            # 异常照常抛出，等待中的线程被唤醒后重新解析
+            entry = None
+            try:
+                addresses, ttl = self._query(host)
+                entry = (time.monotonic() + ttl, addresses)
+            except OSError as e:
+                error = e if isinstance(e, socket.gaierror) else socket.gaierror(str(e))
+                entry = (time.monotonic() + self.negative_ttl, error)
+            finally:
+                with self._lock:
+                    if entry is not None:
+                        if len(self._entries) >= self.max_entries:
+                            now = time.monotonic()
+                            self._entries = {h: e for h, e in self._entries.items() if e[0] > now}
+                        self._entries[host] = entry
+                    self._inflight.pop(host).set()
+            cached = entry[1]
+            break
+
+        if isinstance(cached, Exception):
+            raise cached
+        return cached
+
+    def _resolve_quietly(self, host: str) -> None:
+        try:
+            self.resolve(host)
+        except socket.gaierror:
+            pass
+
+    def prefetch(self, hosts: Iterable[str]) -> List[Future]:
+        """
+        在后台线程中并发解析多个主机名，立即返回
+
+        之后对同一主机的 resolve() 会直接命中缓存，或等待进行中的解析完成。
+
+        Args:
+            hosts: 主机名列表（重复和 IP 地址会被忽略）
+
+        Returns:
+            每个待解析主机的 Future
+        """
+        pending = [h for h in dict.fromkeys(h.strip('[]').lower() for h in hosts if h)
+                   if not _is_ip_address(h)]
+        with self._lock:
+            pending = [h for h in pending if self._lookup(h) is None]
+            if pending and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=DNS_PREFETCH_WORKERS,
+                                                    thread_name_prefix='dns-prefetch')
+        return [self._executor.submit(self._resolve_quietly, h) for h in pending]
+
+
+_dns_cache = DNSCache()
+
+
+def get_dns_cache() -> DNSCache:
+    """返回进程内共享的 DNS 缓存"""
+    return _dns_cache
+
+
+def set_dns_cache(cache: DNSCache) -> None:
+    """替换共享的 DNS 缓存"""
+    global _dns_cache
+    _dns_cache = cache
+
+
+def prefetch_hosts(urls: Iterable[str]) -> List[Future]:
+    """在后台并发预解析一批 URL 的主机名（见 DNSCache.prefetch）"""
+    return get_dns_cache().prefetch(urlparse(url).hostname or '' for url in urls)
+
+
+if REQUESTS_AVAILABLE:
+
+    class _TimedConnectionMixin:
+        """经 DNS 缓存解析主机名，并单独计时 DNS 解析和 TCP 连接的 urllib3 连接"""
+
+        _setup_seconds = 0.0
+
+        def _new_conn(self):
+            host = self._dns_host
+            start = time.perf_counter()
+            try:
+                addresses = get_dns_cache().resolve(host)
+            except socket.gaierror:
+                # 解析失败交给 urllib3 处理，保持原有的异常类型
+                return super()._new_conn()
+            dns_seconds = time.perf_counter() - start
+            _record('dns', dns_seconds)
+
+            # 依次尝试解析出的地址，与 socket.create_connection 的行为一致
+            start = time.perf_counter()
+            last_error = None
+            try:
+                for address in addresses:
+                    self._dns_host = address
+                    try:
+                        return super()._new_conn()
+                    except (NewConnectionError, ConnectTimeoutError) as e:
+                        last_error = e
+                raise last_error
+            finally:
+                self._dns_host = host
+                connect_seconds = time.perf_counter() - start
+                _record('connect', connect_seconds)
+                self._setup_seconds = dns_seconds + connect_seconds
+
+    class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+        def connect(self):
+            self._setup_seconds = 0.0
+            start = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                _record('tls', max(0.0, time.perf_counter() - start - self._setup_seconds))
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(HTTPAdapter):
+        """使用可计时连接池的 requests 适配器"""
+
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': TimedHTTPConnectionPool,
+                'https': TimedHTTPSConnectionPool,
+            }
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def transfer_stats(response: 'requests.Response', decoded_bytes: Optional[int] = None) -> Dict:
+    """
+    返回响应的传输统计
+
+    wire_bytes 为线上传输的（压缩后）正文字节数，decoded_bytes 为解码后的字节数。
+    需要在正文读取完毕后调用；以流式方式读取的响应需传入 decoded_bytes。
+    """
+    try:
+        wire_bytes = response.raw.tell()
+    except (AttributeError, OSError):
+        wire_bytes = None
+    return {
+        'content_encoding': response.headers.get('Content-Encoding', 'identity'),
+        'wire_bytes': wire_bytes,
+        'decoded_bytes': len(response.content) if decoded_bytes is None else decoded_bytes,
+    }
+
+
+def create_session() -> 'requests.Session':
+    """创建挂载了可计时适配器的 requests 会话"""
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    adapter = TimedHTTPAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> 'requests.Session':
+    """返回进程内共享的 requests 会话（复用连接）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+# 按主机的默认限速：(每秒补充令牌数, 桶容量, 最大并发连接数)
+# 搜索引擎对频繁请求较敏感，限速更严格
+HOST_RATE_LIMITS: Dict[str, Tuple[float, float, int]] = {
+    'www.baidu.com': (1.0, 3, 2),
+    'www.bing.com': (1.0, 3, 2),
+}
+DEFAULT_RATE_LIMIT: Tuple[float, float, int] = (5.0, 10, 6)
+
+# 设置后，多个进程通过该文件共享令牌桶状态
+RATE_LOCK_ENV = 'LOCAL_WEB_FETCH_RATE_LOCK'
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    以固定速率补充令牌，允许不超过桶容量的突发。reserve() 采用预约方式：
+    令牌不足时先记账为负数，再返回需要等待的时间，保证等待者按先后顺序放行。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class HostScheduler:
+    """
+    按主机的限速调度器
+
+    每个主机一个令牌桶控制请求速率，一个信号量控制同时进行的连接数。
+    指定 lock_file 时，令牌桶状态保存在该文件中并通过文件锁在进程间共享
+    （仅限支持 fcntl 的平台，其它平台退化为进程内限速）。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float, int]]] = None,
+                 default: Tuple[float, float, int] = DEFAULT_RATE_LIMIT,
+                 lock_file: Optional[str] = None):
+        self.limits = dict(HOST_RATE_LIMITS if limits is None else limits)
+        self.default = default
+        self.lock_file = lock_file if fcntl is not None else None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _limit_for(self, host: str) -> Tuple[float, float, int]:
+        return self.limits.get(host, self.default)
+
+    def _state_for(self, host: str) -> Tuple[TokenBucket, threading.BoundedSemaphore]:
+        with self._lock:
+            if host not in self._buckets:
+                rate, capacity, concurrency = self._limit_for(host)
+                self._buckets[host] = TokenBucket(rate, capacity)
+                self._semaphores[host] = threading.BoundedSemaphore(concurrency)
+            return self._buckets[host], self._semaphores[host]
+
+    def _reserve_shared(self, host: str) -> float:
+        """在文件锁保护下预约令牌，状态为 {主机: [令牌数, 更新时间]}"""
+        rate, capacity, _ = self._limit_for(host)
+        with locked_json(self.lock_file) as state:
+            now = time.time()
+            tokens, updated = state.get(host, [capacity, now])
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate) - 1
+            state[host] = [tokens, now]
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    @contextmanager
+    def slot(self, host: str):
+        """
+        占用主机的一个请求名额
+
+        先等待并发名额，再等待令牌；等待时间记录为 rate_limit 阶段。
+        """
+        bucket, semaphore = self._state_for(host)
+        start = time.perf_counter()
+        semaphore.acquire()
+        try:
+            if self.lock_file:
+                try:
+                    wait = self._reserve_shared(host)
+                except OSError:
+                    wait = bucket.reserve()
+            else:
+                wait = bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            _record('rate_limit', time.perf_counter() - start)
+            yield
+        finally:
+            semaphore.release()
+
+
+_scheduler = None
+
+
+def get_scheduler() -> HostScheduler:
+    """返回进程内共享的限速调度器"""
+    global _scheduler
+    if _scheduler is None:
+        with _session_lock:
+            if _scheduler is None:
+                _scheduler = HostScheduler(lock_file=os.environ.get(RATE_LOCK_ENV) or None)
+    return _scheduler
+
+
+def set_scheduler(scheduler: HostScheduler) -> None:
+    """替换进程内共享的限速调度器（例如基准测试时取消限速）"""
+    global _scheduler
+    _scheduler = scheduler
+
+
+def throttle(url: str):
+    """按 URL 的主机占用一个请求名额（上下文管理器）"""
+    return get_scheduler().slot(urlparse(url).hostname or '')
+
+
+# 可重试的 HTTP 状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _clamp_timeout(timeout, remaining: float):
+    """将单次请求的超时限制在剩余时间内，支持 (连接, 读取) 形式的超时"""
+    if isinstance(timeout, tuple):
+        return tuple(min(t, remaining) for t in timeout)
+    return min(timeout, remaining) if timeout is not None else remaining
+
+
+def get_with_retry(url: str, retries: int = 2, backoff: float = 0.5, max_backoff: float = 4.0,
+                   deadline: Optional[float] = None, **kwargs) -> 'requests.Response':
+    """
+    经过限速调度的 GET 请求，对瞬时错误进行带抖动的指数退避重试
+
+    只重试连接错误、超时和 RETRY_STATUS 中的状态码。每次等待时间在
+    [0, min(max_backoff, backoff * 2^n)] 内随机选取，记录为 retry_wait 阶段。
+
+    Args:
+        url: 请求地址
+        retries: 最多重试次数
+        backoff: 退避基数（秒）
+        max_backoff: 单次退避上限（秒）
+        deadline: 包括重试在内的总耗时上限（秒），每次请求的超时不超过剩余时间
+        **kwargs: 传给 requests 的其它参数
+
+    Returns:
+        最后一次请求的响应（可能是可重试状态码的响应）
+    """
+    timeout = kwargs.pop('timeout', None)
+    start = time.monotonic()
+    attempt = 0
+
+    while True:
+        attempt_timeout = timeout
+        if deadline is not None:
+            attempt_timeout = _clamp_timeout(timeout, max(0.1, deadline - (time.monotonic() - start)))
+
+        error = None
+        response = None
+        try:
+            with throttle(url):
+                response = get_session().get(url, timeout=attempt_timeout, **kwargs)
+            if response.status_code not in RETRY_STATUS or attempt >= retries:
+                return response
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= retries:
+                raise
+            error = e
+
+        delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+        if deadline is not None and time.monotonic() - start + delay >= deadline:
+            if error is not None:
+                raise error
+            return response
+
+        if response is not None:
+            response.close()
+        _record('retry_wait', delay)
+        time.sleep(delay)
+        attempt += 1
+
+
+# 流式下载的分块大小，首个数据块用于内容类型探测
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 解码后正文超过该大小时写入临时文件，不再整体保存在内存中
+SPILL_THRESHOLD = 2 * 1024 * 1024
+
+# 进程内并发处理页面的内存预算（字节，按估算值计），可用环境变量按 MB 设置
+MEMORY_BUDGET_ENV = 'LOCAL_WEB_FETCH_MEMORY_BUDGET'
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# 首块检查回调：(响应头, 首个数据块) -> 是否继续下载
+InspectCallback = Callable[[Dict, bytes], bool]
+
+
+class MemoryBudget:
+    """
+    进程内共享的内存预算（按估算值的准入控制）
+
+    并发处理的页面在转换前按估算的工作集大小预留额度，额度不足时等待其它页面释放。
+    单个预留超过总预算时按总预算计，保证其在独占时仍能执行。
+
+    预算只限制同时开始转换的页面数量，不测量实际占用的内存，也不限制单个页面：
+    估算偏低时进程的实际内存可能超过预算。单个页面在内存中缓冲的下载数据由
+    SPILL_THRESHOLD 限制（超过后写入临时文件），这一项才是按实际字节数执行的上限。
+    """
+
+    def __init__(self, limit: int = DEFAULT_MEMORY_BUDGET):
+        self.limit = limit
+        self._used = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        """预留 nbytes 字节的额度（上下文管理器），等待时间记录为 memory_wait 阶段"""
+        nbytes = max(0, min(int(nbytes), self.limit))
+        start = time.perf_counter()
+        with self._cond:
+            while self._used and self._used + nbytes > self.limit:
+                self._cond.wait()
+            self._used += nbytes
+        waited = time.perf_counter() - start
+        if waited > 0.001:
+            _record('memory_wait', waited)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._used -= nbytes
+                self._cond.notify_all()
+
+
+_memory_budget = None
+
+
+def get_memory_budget() -> MemoryBudget:
+    """返回进程内共享的内存预算"""
+    global _memory_budget
+    if _memory_budget is None:
+        with _session_lock:
+            if _memory_budget is None:
+                limit = DEFAULT_MEMORY_BUDGET
+                try:
+                    limit = int(float(os.environ[MEMORY_BUDGET_ENV]) * 1024 * 1024)
+                except (KeyError, ValueError):
+                    pass
+                _memory_budget = MemoryBudget(limit)
+    return _memory_budget
+
+
+def set_memory_budget(budget: MemoryBudget) -> None:
+    """替换进程内共享的内存预算"""
+    global _memory_budget
+    _memory_budget = budget
+
+
+class Download:
+    """
+    一次下载的结果，与使用的传输方式（HTTP/1.1 或 HTTP/2）无关
+
+    正文较小时保存在 content 中；超过 SPILL_THRESHOLD 时写入临时文件（spool），
+    content 为 None，需通过 open_mmap() 以内存映射方式读取，用完后调用 close()。
+    complete 为 False 表示检查回调在首个数据块后中止了下载，content 只包含该数据块。
+    """
+
+    __slots__ = ('url', 'status_code', 'headers', 'content', 'transfer', 'complete', 'spool', 'size')
+
+    def __init__(self, url: str, status_code: int, headers, content: Optional[bytes], transfer: Dict,
+                 complete: bool = True, spool=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.transfer = transfer
+        self.complete = complete
+        self.spool = spool
+        self.size = transfer.get('decoded_bytes') or 0
+
+    @property
+    def spilled(self) -> bool:
+        """正文是否写入了临时文件"""
+        return self.spool is not None
+
+    @contextmanager
+    def open_mmap(self):
+        """以只读内存映射方式打开临时文件中的正文（上下文管理器）"""
+        mapped = mmap.mmap(self.spool.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+    def close(self) -> None:
+        """删除临时文件"""
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def text(self, encoding: Optional[str] = None) -> str:
+        """
+        解码正文
+
+        Args:
+            encoding: 指定编码（如响应头中的 charset）；为空或无效时按探测到的编码解码
+                （与 requests 的 apparent_encoding 一致）
+        """
+        if encoding:
+            try:
+                return self.content.decode(encoding, errors='replace')
+            except LookupError:
+                pass
+        encoding = requests.compat.chardet.detect(self.content)['encoding'] or 'utf-8'
+        return self.content.decode(encoding, errors='replace')
+
+
+def _read_body(chunks: Iterator[bytes], headers,
+               inspect: Optional[InspectCallback]) -> Tuple[Optional[bytes], object, int, bool]:
+    """
+    读取响应正文
+
+    inspect 对首个数据块返回 False 时提前停止；累计超过 SPILL_THRESHOLD 后改为写入临时文件。
+
+    Returns:
+        (内存中的正文, 临时文件, 正文字节数, 是否完整)，正文和临时文件二者之一为 None
+    """
+    parts = []
+    size = 0
+    spool = None
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if not size and inspect is not None and not inspect(headers, chunk):
+                return chunk, None, len(chunk), False
+            size += len(chunk)
+            if spool is not None:
+                spool.write(chunk)
+                continue
+            parts.append(chunk)
+            if size > SPILL_THRESHOLD:
+                spool = tempfile.TemporaryFile(prefix='local-web-fetch-')
+                spool.writelines(parts)
+                parts = []
+    except BaseException:
+        if spool is not None:
+            spool.close()
+        raise
+
+    if spool is not None:
+        spool.flush()
+        return None, spool, size, True
+    return b''.join(parts), None, size, True
+
+
+def _download_http1(url: str, headers: Dict, timeout, timer: StageTimer,
+                    inspect: Optional[InspectCallback] = None) -> Download:
+    """通过共享的 requests 会话（HTTP/1.1 连接池）下载"""
+    setup_before = timer.get('dns') + timer.get('connect') + timer.get('tls')
+    request_start = time.perf_counter()
+    response = get_session().get(url, headers=headers, timeout=timeout,
+                                 allow_redirects=True, stream=True)
+    setup = timer.get('dns') + timer.get('connect') + timer.get('tls') - setup_before
+    timer.add('ttfb', max(0.0, time.perf_counter() - request_start - setup))
+
+    with response:
+        response.raise_for_status()
+        with timer.stage('download'):
+            # 提前中止时关闭响应会直接断开连接，不会读完剩余正文
+            content, spool, size, complete = _read_body(response.iter_content(DOWNLOAD_CHUNK_SIZE),
+                                                        response.headers, inspect)
+
+    transfer = transfer_stats(response, size)
+    transfer['http_version'] = 'HTTP/1.0' if response.raw.version == 10 else 'HTTP/1.1'
+    return Download(response.url, response.status_code, response.headers, content, transfer, complete,
+                    spool)
+
+
+if HTTP2_AVAILABLE:
+
+    class _CachedDNSBackend(httpcore.SyncBackend):
+        """经 DNS 缓存解析主机名的 httpcore 网络后端"""
+
+        def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            start = time.perf_counter()
+            try:
+                addresses = get_dns_cache().resolve(host)
+            except socket.gaierror:
+                return super().connect_tcp(host, port, timeout, local_address, socket_options)
+            _record('dns', time.perf_counter() - start)
+
+            last_error = None
+            for address in addresses:
+                try:
+                    return super().connect_tcp(address, port, timeout, local_address, socket_options)
+                except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                    last_error = e
+            raise last_error
+
+    # httpcore 异常到 httpx 异常的对应关系，_download_http2 再转换为 requests 的异常
+    _HTTPCORE_ERRORS = ((httpcore.TimeoutException, httpx.TimeoutException),
+                        ((httpcore.NetworkError, httpcore.ProtocolError, httpcore.ProxyError,
+                          httpcore.UnsupportedProtocol), httpx.TransportError))
+
+    @contextmanager
+    def _map_httpcore_errors():
+        try:
+            yield
+        except Exception as e:
+            for source, target in _HTTPCORE_ERRORS:
+                if isinstance(e, source):
+                    raise target(str(e)) from e
+            raise
+
+    class _HttpcoreStream(httpx.SyncByteStream):
+        """把 httpcore 的响应流包装为 httpx 的字节流"""
+
+        def __init__(self, stream):
+            self._stream = stream
+
+        def __iter__(self):
+            with _map_httpcore_errors():
+                yield from self._stream
+
+        def close(self) -> None:
+            if hasattr(self._stream, 'close'):
+                self._stream.close()
+
+    class _CachedDNSTransport(httpx.BaseTransport):
+        """
+        经 DNS 缓存建立连接的 httpx 传输
+
+        httpx.HTTPTransport 不接受自定义网络后端，这里直接使用 httpcore 的连接池
+        （network_backend 是其公开参数），请求和响应按 httpx 的传输接口转换。
+        """
+
+        def __init__(self, http1: bool = True):
+            self._pool = httpcore.ConnectionPool(ssl_context=httpx.create_ssl_context(), http1=http1, http2=True,
+                                                 network_backend=_CachedDNSBackend())
+
+        def handle_request(self, request: 'httpx.Request') -> 'httpx.Response':
+            core_request = httpcore.Request(
+                method=request.method,
+                url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host,
+                                 port=request.url.port, target=request.url.raw_path),
+                headers=request.headers.raw,
+                content=request.stream,
+                extensions=request.extensions,
+            )
+            with _map_httpcore_errors():
+                core_response = self._pool.handle_request(core_request)
+            return httpx.Response(status_code=core_response.status, headers=core_response.headers,
+                                  stream=_HttpcoreStream(core_response.stream), extensions=core_response.extensions)
+
+        def close(self) -> None:
+            self._pool.close()
+
+
+_http2_client = None
+
+
+def create_http2_client(http1: bool = True) -> 'httpx.Client':
+    """
+    创建使用 DNS 缓存的 HTTP/2 客户端
+
+    Args:
+        http1: 是否允许通过 ALPN 回落到 HTTP/1.1；为 False 时对明文地址使用
+            prior knowledge 的 h2c
+    """
+    return httpx.Client(transport=_CachedDNSTransport(http1=http1))
+
+
+def get_http2_client() -> 'httpx.Client':
+    """返回进程内共享的 HTTP/2 客户端（每个主机复用一个多路复用连接）"""
+    global _http2_client
+    if _http2_client is None:
+        with _session_lock:
+            if _http2_client is None:
+                _http2_client = create_http2_client()
+    return _http2_client
+
+
+def set_http2_client(client: 'httpx.Client') -> None:
+    """替换共享的 HTTP/2 客户端（例如基准测试中使用明文 h2c）"""
+    global _http2_client
+    _http2_client = client
+
+
+def _as_requests_response(response: 'httpx.Response') -> requests.Response:
+    """把 httpx 的响应（状态、头部、URL）转换为 requests.Response，不含正文"""
+    adapted = requests.Response()
+    adapted.status_code = response.status_code
+    adapted.reason = response.reason_phrase
+    adapted.headers = requests.structures.CaseInsensitiveDict(response.headers.multi_items())
+    adapted.url = str(response.url)
+    return adapted
+
+
+def _download_http2(url: str, headers: Dict, timeout, timer: StageTimer,
+                    inspect: Optional[InspectCallback] = None) -> Download:
+    """
+    通过 httpx 的 HTTP/2 客户端下载
+
+    服务器不支持 HTTP/2 时 httpx 会通过 ALPN 自动回落到 HTTP/1.1。
+    Accept-Encoding 交给 httpx 按其已安装的解码器生成；HTTP/2 禁止的
+    逐跳头部（Connection 等）会被移除。
+    """
+    headers = {k: v for k, v in headers.items()
+               if k.lower() not in ('accept-encoding', 'connection', 'upgrade-insecure-requests')}
+    started = {}
+
+    def trace(event: str, info: Dict) -> None:
+        # httpcore 的连接事件：connection.connect_tcp.* 包含网络后端记录的 DNS 解析，需扣除
+        for prefix, stage in (('connection.connect_tcp.', 'connect'), ('connection.start_tls.', 'tls')):
+            if event.startswith(prefix):
+                if event.endswith('.started'):
+                    started[stage] = (time.perf_counter(), timer.get('dns'))
+                elif stage in started:
+                    start, dns_before = started.pop(stage)
+                    elapsed = time.perf_counter() - start - (timer.get('dns') - dns_before)
+                    timer.add(stage, max(0.0, elapsed))
+
+    def setup_seconds() -> float:
+        return timer.get('dns') + timer.get('connect') + timer.get('tls')
+
+    try:
+        setup_before = setup_seconds()
+        request_start = time.perf_counter()
+        with get_http2_client().stream('GET', url, headers=headers, timeout=timeout,
+                                       follow_redirects=True, extensions={'trace': trace}) as response:
+            setup = setup_seconds() - setup_before
+            timer.add('ttfb', max(0.0, time.perf_counter() - request_start - setup))
+
+            if response.status_code >= 400:
+                # 与 HTTP/1.1 路径相同，由 requests 的 Response 生成 HTTPError（异常的 response 属性可用）
+                _as_requests_response(response).raise_for_status()
+
+            with timer.stage('download'):
+                # 提前中止时退出上下文会重置该流（RST_STREAM），连接上的其它流不受影响
+                content, spool, size, complete = _read_body(response.iter_bytes(DOWNLOAD_CHUNK_SIZE),
+                                                            response.headers, inspect)
+
+            transfer = {
+                'content_encoding': response.headers.get('Content-Encoding', 'identity'),
+                'wire_bytes': response.num_bytes_downloaded,
+                'decoded_bytes': size,
+                'http_version': response.http_version,
+            }
+            return Download(str(response.url), response.status_code, response.headers, content, transfer,
+                            complete, spool)
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+
+
+def fetch_bytes(url: str, headers: Dict, timeout, timer: Optional[StageTimer] = None,
+                http2: bool = False, inspect: Optional[InspectCallback] = None) -> Download:
+    """
+    经过限速调度下载一个 URL 的正文
+
+    记录 rate_limit / dns / connect / tls / ttfb / download 阶段耗时。
+    出错时抛出 requests 的异常类型（Timeout、ConnectionError、HTTPError），
+    两种传输方式一致。
+
+    Args:
+        url: 请求地址
+        headers: 请求头
+        timeout: 超时时间（秒）
+        timer: 阶段计时器
+        http2: 是否使用 HTTP/2 传输；未安装 httpx / h2 时自动使用 HTTP/1.1
+        inspect: 可选回调，首个（已解压的）数据块到达时以 (响应头, 数据块) 调用，
+            返回 False 时中止下载
+
+    Returns:
+        下载结果，transfer 中的 http_version 记录实际使用的协议；正文写入临时文件时
+        调用方需在处理完后调用 close()
+    """
+    timer = timer or StageTimer()
+    with recording(timer), throttle(url):
+        if http2 and HTTP2_AVAILABLE:
+            return _download_http2(url, headers, timeout, timer, inspect)
+        return _download_http1(url, headers, timeout, timer, inspect)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于 lxml 的 HTML → Markdown 快速转换
+
+html2text 用纯 Python 的 html.parser 逐个标记解析，大页面上很慢。这里由 lxml（libxml2）
+完成解析，以解析器目标（target）的方式接收开始标签、结束标签和文本事件，边解析边输出
+Markdown，不建立文档树。同一个转换器既可以一次转换整段 HTML，也可以分块送入数据，
+流式转换写入临时文件的大页面。
+
+支持标题、段落、列表、链接、图片、粗体/斜体、行内代码、代码块、引用、表格和分隔线，
+输出格式与 html2text 的默认设置接近。
+
+使用方式：
+    python scripts/lxml_markdown.py page.html
+"""
+
+import sys
+import io
+import argparse
+from typing import Dict, List, Optional
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# 内容不输出的元素
+SKIP_TAGS = frozenset(['head', 'script', 'style', 'template', 'svg', 'math'])
+# 前后换行的块级元素
+BLOCK_TAGS = frozenset(['address', 'article', 'aside', 'caption', 'center', 'dd', 'details', 'dialog', 'div',
+                        'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'header', 'main',
+                        'nav', 'section', 'summary'])
+# 前后空一行的块级元素
+PARAGRAPH_TAGS = frozenset(['p'])
+HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+EMPHASIS_MARKS = {'b': '**', 'strong': '**', 'i': '_', 'em': '_'}
+# 不作为链接输出的 href
+IGNORED_HREF_PREFIXES = ('javascript:',)
+
+
+class MarkdownTarget:
+    """
+    lxml 解析器目标：接收解析事件并输出 Markdown
+
+    块级元素只登记"需要几个换行"，在下一段文本输出前才真正写入，因此相邻的块不会
+    产生多余的空行，文档末尾也没有悬空的换行。out_chars 为已输出的字符数。
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.out_chars = 0
+        self._pending = 0
+        self._pending_depth = 0
+        self._space = False
+        self._trailing_newlines = 0
+        self._line_start = True
+        self._skip = 0
+        self._pre = 0
+        self._cell = 0
+        self._prefix: List[str] = []
+        self._lists: List[List] = []
+        self._links: List[Optional[str]] = []
+        self._row: Optional[Dict] = None
+
+    # ---- 输出 ----
+
+    def _emit(self, text: str) -> None:
+        self.parts.append(text)
+        self.out_chars += len(text)
+        stripped = text.rstrip('\n')
+        if stripped:
+            self._trailing_newlines = len(text) - len(stripped)
+        else:
+            self._trailing_newlines += len(text)
+
+    def _break(self, newlines: int) -> None:
+        """在下一段输出前换行；表格单元格内不换行"""
+        if not self._cell:
+            # 空行只带上各次请求共同所在的引用层级的前缀
+            depth = len(self._prefix)
+            self._pending_depth = min(self._pending_depth, depth) if self._pending else depth
+            self._pending = max(self._pending, newlines)
+            self._space = False
+
+    def _flush_break(self) -> None:
+        if self.out_chars:
+            if self.parts[-1].endswith(' '):
+                last = self.parts[-1]
+                self.parts[-1] = last.rstrip(' ')
+                self.out_chars -= len(last) - len(self.parts[-1])
+            newlines = self._pending - self._trailing_newlines
+            if newlines > 0:
+                quote = ''.join(self._prefix[:self._pending_depth]).rstrip()
+                self._emit('\n' + (quote + '\n') * (newlines - 1))
+            self._line_start = True
+        self._pending = 0
+
+    def write(self, text: str) -> None:
+        """输出一段行内文本，按需先写入换行、行首前缀和单词间的空格"""
+        if self._pending or not self.out_chars:
+            self._flush_break()
+        if self._line_start:
+            if self._prefix:
+                self._emit(''.join(self._prefix))
+            self._line_start = False
+        elif self._space:
+            self._emit(' ')
+        self._space = False
+        self._emit(text)
+
+    def _close_mark(self, mark: str) -> None:
+        """输出结束标记（**、]() 等），标记前不留空格"""
+        space = self._space
+        self._space = False
+        if not self._line_start or self._pending:
+            self.write(mark)
+        self._space = space
+
+    def _write_raw(self, text: str) -> None:
+        """原样输出代码块中的文本，每行加上引用前缀"""
+        lines = text.split('\n')
+        if self._pending or not self.out_chars:
+            self._flush_break()
+        for i, line in enumerate(lines):
+            if i:
+                self._emit('\n')
+                self._line_start = True
+            if line:
+                if self._line_start and self._prefix:
+                    self._emit(''.join(self._prefix))
+                self._line_start = False
+                self._emit(line)
+
+    # ---- 解析器事件 ----
+
+    def start(self, tag, attrib) -> None:
+        if not isinstance(tag, str):
+            return
+        if self._skip or tag in SKIP_TAGS:
+            self._skip += 1
+            return
+
+        if tag in BLOCK_TAGS:
+            self._break(1)
+        elif tag in PARAGRAPH_TAGS:
+            self._break(2)
+        elif tag in HEADING_LEVELS:
+            self._break(2)
+            self.write('#' * HEADING_LEVELS[tag])
+            self._space = True
+        elif tag in EMPHASIS_MARKS:
+            if not self._pre:
+                self.write(EMPHASIS_MARKS[tag])
+        elif tag == 'a':
+            href = (attrib.get('href') or '').strip()
+            if href and not href.lower().startswith(IGNORED_HREF_PREFIXES) and not self._pre:
+                self.write('[')
+                self._links.append(href)
+            else:
+                self._links.append(None)
+        elif tag == 'img':
+            src = (attrib.get('src') or '').strip()
+            if src:
+                alt = ' '.join((attrib.get('alt') or '').split())
+                self.write(f'![{alt}]({src})')
+        elif tag == 'br':
+            self._break(1)
+        elif tag == 'hr':
+            self._break(2)
+            self.write('* * *')
+            self._break(2)
+        elif tag in ('ul', 'ol'):
+            self._break(1 if self._lists else 2)
+            start = (attrib.get('start') or '').strip()
+            self._lists.append([tag == 'ol', int(start) - 1 if start.isdigit() else 0])
+        elif tag == 'li':
+            self._break(1)
+            indent = '  ' * max(0, len(self._lists) - 1)
+            if self._lists and self._lists[-1][0]:
+                self._lists[-1][1] += 1
+                self.write(f'{indent}{self._lists[-1][1]}.')
+            else:
+                self.write(f'{indent}*')
+            self._space = True
+        elif tag == 'pre':
+            self._break(2)
+            self.write('```')
+            self._break(1)
+            self._pre += 1
+        elif tag == 'code':
+            if not self._pre:
+                self.write('`')
+        elif tag == 'blockquote':
+            self._break(2)
+            self._prefix.append('> ')
+        elif tag == 'table':
+            self._break(2)
+        elif tag == 'tr':
+            self._break(1)
+            self._row = {'cells': 0, 'header': False}
+        elif tag in ('td', 'th'):
+            if self._row is not None:
+                if not self._row['cells']:
+                    self.write('|')
+                self._row['cells'] += 1
+                self._row['header'] = self._row['header'] or tag == 'th'
+            self._cell += 1
+            self._space = True
+
+    def end(self, tag) -> None:
+        if not isinstance(tag, str):
+            return
+        if self._skip:
+            self._skip -= 1
+            return
+
+        if tag in BLOCK_TAGS:
+            self._break(1)
+        elif tag in PARAGRAPH_TAGS or tag in HEADING_LEVELS:
+            self._break(2)
+        elif tag in EMPHASIS_MARKS:
+            if not self._pre:
+                self._close_mark(EMPHASIS_MARKS[tag])
+        elif tag == 'a':
+            href = self._links.pop() if self._links else None
+            if href is not None:
+                self._close_mark(f']({href})')
+        elif tag in ('ul', 'ol'):
+            if self._lists:
+                self._lists.pop()
+            self._break(1 if self._lists else 2)
+        elif tag == 'li':
+            self._break(1)
+        elif tag == 'pre':
+            self._pre = max(0, self._pre - 1)
+            self._break(1)
+            self.write('```')
+            self._break(2)
+        elif tag == 'code':
+            if not self._pre:
+                self._close_mark('`')
+        elif tag == 'blockquote':
+            if self._prefix:
+                self._prefix.pop()
+            self._break(2)
+        elif tag == 'table':
+            self._break(2)
+        elif tag in ('td', 'th'):
+            self._cell = max(0, self._cell - 1)
+            if self._row is not None:
+                self._space = True
+                self.write('|')
+                self._space = True
+        elif tag == 'tr':
+            row, self._row = self._row, None
+            if row and row['header'] and row['cells']:
+                self._break(1)
+                self.write('|' + ' --- |' * row['cells'])
+            self._break(1)
+
+    def data(self, data: str) -> None:
+        if self._skip or not data:
+            return
+        if self._pre:
+            self._write_raw(data)
+            return
+        text = ' '.join(data.split())
+        if not text:
+            self._space = True
+            return
+        if data[0].isspace():
+            self._space = True
+        self.write(text)
+        if data[-1].isspace():
+            self._space = True
+
+    def render(self, count: Optional[int] = None) -> str:
+        """拼接前 count 段输出（默认全部）为 Markdown 文本"""
+        text = ''.join(self.parts[:count]).strip('\n')
+        return text + '\n' if text else ''
+
+    def close(self) -> str:
+        return self.render()
+
+
+class MarkdownStream:
+    """
+    分块送入 HTML、增量输出 Markdown 的转换器
+
+    接口与 fetch_url 中流式转换使用的转换器相同：feed() 送入一段 HTML 文本，
+    out_chars 为已输出的字符数，result() 结束解析并返回 Markdown；checkpoint() 记录
+    当前的输出位置，partial() 返回截至某个位置的输出，用于在块边界处回退。
+    """
+
+    def __init__(self):
+        if not LXML_AVAILABLE:
+            raise RuntimeError('lxml 未安装，请运行: pip install lxml')
+        self._target = MarkdownTarget()
+        self._parser = etree.HTMLParser(target=self._target)
+        self._fed = False
+
+    @property
+    def out_chars(self) -> int:
+        return self._target.out_chars
+
+    def feed(self, text: str) -> None:
+        if text:
+            self._parser.feed(text)
+            self._fed = True
+
+    def result(self) -> str:
+        if not self._fed:
+            return ''
+        return self._parser.close()
+
+    def checkpoint(self) -> int:
+        return len(self._target.parts)
+
+    def partial(self, mark: int) -> str:
+        return self._target.render(mark)
+
+
+def html_to_markdown(html_content: str) -> str:
+    """
+    将 HTML 转换为 Markdown
+
+    Args:
+        html_content: HTML 文本（完整页面或片段均可）
+
+    Returns:
+        Markdown 文本
+    """
+    stream = MarkdownStream()
+    stream.feed(html_content)
+    return stream.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基于 lxml 的 HTML → Markdown 快速转换')
+    parser.add_argument('file', help='HTML 文件路径，- 表示标准输入')
+
+    args = parser.parse_args()
+
+    if not LXML_AVAILABLE:
+        print('错误: lxml 未安装，请运行: pip install lxml', file=sys.stderr)
+        sys.exit(1)
+    if args.file == '-':
+        html_content = sys.stdin.read()
+    else:
+        with open(args.file, encoding='utf-8', errors='replace') as f:
+            html_content = f.read()
+    print(html_to_markdown(html_content), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地网页存储
+
+将 fetch_url.py 成功拉取的页面（最终 URL、元数据、Markdown、缓存校验头、拉取时间）
+保存在本地 SQLite 数据库中，并在标题和正文上建立 FTS5 全文索引。重复拉取同一页面时
+可直接从本地读取，也可以离线检索以前读过的内容。能完整转换的页面保存整篇文档的转换结果
+（full_content），之后按各次请求的长度上限或分页截取；按长度上限提前停止转换的页面记录
+截断时的上限（content_limit），只用于不超过该上限的请求。
+
+数据库默认位于缓存目录（见 http_client.get_cache_dir）下的 pages.db。
+
+使用方式：
+    python scripts/page_store.py search "asyncio 事件循环"
+    python scripts/page_store.py get https://example.com/article
+    python scripts/page_store.py list -n 20
+"""
+
+import sys
+import io
+import json
+import re
+import sqlite3
+import threading
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from http_client import get_cache_dir
+from simhash import FingerprintIndex, to_signed, to_unsigned
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# 三元组分词器按子串匹配，适合不以空格分词的中文；短于 3 个字符的词改用 LIKE 扫描
+TRIGRAM_MIN_CHARS = 3
+# 摘要在首个命中位置前后截取的字符数
+SNIPPET_BEFORE = 40
+SNIPPET_AFTER = 120
+
+CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff]{4,}')
+
+# 旧版本创建的数据库缺少的列及其定义
+ADDED_COLUMNS = {
+    'simhash': 'INTEGER',
+    'full_content': 'INTEGER NOT NULL DEFAULT 0',
+    'content_limit': 'INTEGER',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    requested_url TEXT,
+    title TEXT,
+    description TEXT,
+    metadata TEXT,
+    markdown TEXT,
+    content_type TEXT,
+    status_code INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    simhash INTEGER,
+    full_content INTEGER NOT NULL DEFAULT 0,
+    content_limit INTEGER
+);
+CREATE INDEX IF NOT EXISTS pages_requested_url ON pages(requested_url);
+CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages(fetched_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    title, markdown, content='pages', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts(rowid, title, markdown) VALUES (new.id, new.title, new.markdown);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, title, markdown) VALUES ('delete', old.id, old.title, old.markdown);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, title, markdown) VALUES ('delete', old.id, old.title, old.markdown);
+    INSERT INTO pages_fts(rowid, title, markdown) VALUES (new.id, new.title, new.markdown);
+END;
+"""
+
+
+def trigram_available() -> bool:
+    """检查 SQLite 是否支持 FTS5 三元组分词器（SQLite 3.34+）"""
+    try:
+        sqlite3.connect(':memory:').execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def make_snippet(text: str, terms: List[str], marker: str = '**') -> str:
+    """
+    截取首个命中词附近的文本作为摘要
+
+    FTS5 的 snippet() 以词元计数，对三元组分词器无法按长度截断，因此在 Python 中截取。
+
+    Args:
+        text: 页面正文
+        terms: 查询词
+        marker: 标出命中词的标记，为空时不标出
+
+    Returns:
+        摘要文本
+    """
+    lowered = text.lower()
+    positions = [(lowered.find(t.lower()), t) for t in terms if t]
+    positions = [(pos, t) for pos, t in positions if pos >= 0]
+    if not positions:
+        return re.sub(r'\s+', ' ', text[:SNIPPET_BEFORE + SNIPPET_AFTER]).strip()
+
+    pos, _ = min(positions)
+    start = max(0, pos - SNIPPET_BEFORE)
+    end = min(len(text), pos + SNIPPET_AFTER)
+    snippet = text[start:end]
+    if marker:
+        for _, term in sorted(positions, key=lambda p: -len(p[1])):
+            snippet = re.sub(re.escape(term), lambda m: marker + m.group(0) + marker, snippet,
+                             flags=re.IGNORECASE)
+    snippet = re.sub(r'\s+', ' ', snippet).strip()
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
+
+
+class PageStore:
+    """
+    基于 SQLite 的页面存储
+
+    同一最终 URL 只保留最新一次拉取的结果。连接在线程间共享，写入通过锁串行化，
+    可直接在 fetch_urls 的线程池中使用。
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else get_cache_dir() / 'pages.db'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA.format(
+                tokenizer='trigram' if trigram_available() else 'unicode61'))
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(pages)')}
+            for name, definition in ADDED_COLUMNS.items():
+                if name not in columns:
+                    self._conn.execute(f'ALTER TABLE pages ADD COLUMN {name} {definition}')
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def put(self, result: Dict, requested_url: Optional[str] = None, full_content: bool = False,
+            content_limit: Optional[int] = None) -> None:
+        """
+        保存一次成功的拉取结果
+
+        Args:
+            result: fetch_url 返回的结果字典（success 为 True）
+            requested_url: 请求时使用的 URL（与重定向后的最终 URL 不同时便于按原 URL 查找）
+            full_content: markdown 是否为整篇文档的转换结果（没有按 max_length 截断），可用于任意长度上限和分页读取
+            content_limit: 不是整篇文档时，markdown 截断时的长度上限
+        """
+        metadata = result.get('metadata') or {}
+        validators = result.get('validators') or {}
+        row = (
+            result['url'], requested_url or result['url'],
+            metadata.get('title') or metadata.get('og_title'),
+            metadata.get('description') or metadata.get('og_description'),
+            json.dumps(metadata, ensure_ascii=False), result.get('markdown', ''),
+            result.get('content_type'), result.get('status_code'),
+            validators.get('etag'), validators.get('last_modified'),
+            result.get('fetched_at') or time.time(),
+            to_signed(int(result['simhash'], 16)) if result.get('simhash') else None,
+            int(full_content), None if full_content else content_limit,
+        )
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO pages (url, requested_url, title, description, metadata, markdown,
+                                   content_type, status_code, etag, last_modified, fetched_at, simhash,
+                                   full_content, content_limit)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    requested_url = excluded.requested_url, title = excluded.title,
+                    description = excluded.description, metadata = excluded.metadata,
+                    markdown = excluded.markdown, content_type = excluded.content_type,
+                    status_code = excluded.status_code, etag = excluded.etag,
+                    last_modified = excluded.last_modified, fetched_at = excluded.fetched_at,
+                    simhash = excluded.simhash, full_content = excluded.full_content,
+                    content_limit = excluded.content_limit
+            """, row)
+
+    def touch(self, url: str, fetched_at: Optional[float] = None) -> None:
+        """更新页面的拉取时间（例如条件请求返回 304 时）"""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE pages SET fetched_at = ? WHERE url = ?',
+                               (fetched_at or time.time(), url))
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """
+        按最终 URL 或请求 URL 读取页面
+
+        Args:
+            url: 页面 URL
+            max_age: 只返回在该秒数内拉取的结果，为空时不限
+
+        Returns:
+            与 fetch_url 结果格式相同的字典（附带 fetched_at 和 cached 字段；保存的是整篇文档时
+            还有 full_content 字段，否则有截断时的上限时还有 content_limit 字段），不存在时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM pages WHERE url = ? OR requested_url = ? ORDER BY url = ? DESC, fetched_at DESC LIMIT 1',
+                (url, url, url)).fetchone()
+        if row is None or (max_age is not None and time.time() - row['fetched_at'] > max_age):
+            return None
+        return self._to_result(row)
+
+    @staticmethod
+    def _to_result(row: sqlite3.Row) -> Dict:
+        validators = {k: row[k] for k in ('etag', 'last_modified') if row[k]}
+        result = {
+            'success': True,
+            'url': row['url'],
+            'status_code': row['status_code'],
+            'metadata': json.loads(row['metadata'] or '{}'),
+            'markdown': row['markdown'] or '',
+            'content_length': len(row['markdown'] or ''),
+            'content_type': row['content_type'],
+            'validators': validators,
+            'fetched_at': row['fetched_at'],
+            'cached': True,
+        }
+        if row['simhash'] is not None:
+            result['simhash'] = f"{to_unsigned(row['simhash']):016x}"
+        if row['full_content']:
+            result['full_content'] = True
+        elif row['content_limit']:
+            result['content_limit'] = row['content_limit']
+        return result
+
+    @staticmethod
+    def _build_query(query: str, match_all: bool = True) -> Tuple[str, List[str], List[str]]:
+        """
+        将查询拆分为 FTS5 MATCH 表达式、需要 LIKE 匹配的短词和全部查询词
+
+        match_all 为 False 时各词以 OR 连接，较长的连续中文再拆成重叠的三字片段，
+        使未分词的中文短语也能部分命中，由 bm25 按命中程度排序。
+        """
+        terms = [t for t in query.split() if t]
+        if not match_all:
+            expanded = []
+            for term in terms:
+                expanded.append(term)
+                for run in CJK_RUN_PATTERN.findall(term):
+                    expanded.extend(run[i:i + TRIGRAM_MIN_CHARS] for i in range(len(run) - TRIGRAM_MIN_CHARS + 1))
+            terms = list(dict.fromkeys(expanded))
+        match_terms = ['"{}"'.format(t.replace('"', '""')) for t in terms if len(t) >= TRIGRAM_MIN_CHARS]
+        like_terms = [t for t in terms if len(t) < TRIGRAM_MIN_CHARS]
+        return (' AND ' if match_all else ' OR ').join(match_terms), like_terms, terms
+
+    def search(self, query: str, limit: int = 10, match_all: bool = True,
+               highlight: bool = True) -> List[Dict]:
+        """
+        全文检索已保存的页面
+
+        查询按空白拆分为多个词，标题命中的权重更高。
+
+        Args:
+            query: 查询关键词
+            limit: 最多返回的结果数
+            match_all: 为 True 时所有词都需匹配（标题或正文），否则命中任一词即可
+            highlight: 是否在摘要中用 ** 标出命中的词
+
+        Returns:
+            结果列表，每项包含 url、title、snippet、fetched_at 和 score（越大越相关）
+        """
+        match, like_terms, terms = self._build_query(query, match_all)
+        if not match and not like_terms:
+            return []
+        if match and not match_all:
+            # 任一词匹配时，短词只作为排序前的补充条件会过滤掉结果，直接忽略
+            like_terms = []
+
+        join = ' AND ' if match_all else ' OR '
+        like_sql = join.join('(p.title LIKE ? OR p.markdown LIKE ?)' for _ in like_terms)
+        like_args = [arg for t in like_terms for arg in ('%' + t + '%',) * 2]
+
+        if match:
+            sql = ("SELECT p.url, p.title, p.fetched_at, p.markdown, -bm25(pages_fts, 5.0, 1.0) AS score "
+                   "FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid "
+                   "WHERE pages_fts MATCH ?" + (' AND ' + like_sql if like_sql else '') +
+                   " ORDER BY score DESC LIMIT ?")
+            args = [match] + like_args + [limit]
+        else:
+            sql = ("SELECT p.url, p.title, p.fetched_at, p.markdown, 0.0 AS score "
+                   "FROM pages p WHERE " + like_sql + " ORDER BY p.fetched_at DESC LIMIT ?")
+            args = like_args + [limit]
+
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+
+        marker = '**' if highlight else ''
+        return [{'url': row['url'], 'title': row['title'], 'fetched_at': row['fetched_at'],
+                 'snippet': make_snippet(row['markdown'] or '', terms, marker), 'score': row['score']}
+                for row in rows]
+
+    def fingerprint_index(self, max_distance: Optional[int] = None) -> FingerprintIndex:
+        """
+        以已保存页面的 SimHash 构建近似重复指纹索引
+
+        Args:
+            max_distance: 视为近似重复的最大汉明距离，为空时使用默认值
+
+        Returns:
+            指纹索引，已保存的页面作为规范副本
+        """
+        index = FingerprintIndex() if max_distance is None else FingerprintIndex(max_distance)
+        with self._lock:
+            rows = self._conn.execute('SELECT url, simhash FROM pages WHERE simhash IS NOT NULL').fetchall()
+        for row in rows:
+            index.add(to_unsigned(row['simhash']), row['url'])
+        return index
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        """按拉取时间倒序列出页面"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, title, fetched_at, length(markdown) AS content_length '
+                'FROM pages ORDER BY fetched_at DESC LIMIT ?', (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, url: str) -> bool:
+        """删除页面，返回是否存在"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute('DELETE FROM pages WHERE url = ? OR requested_url = ?', (url, url))
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict:
+        """返回页面数量、数据库大小等统计信息"""
+        with self._lock:
+            count, oldest, newest = self._conn.execute(
+                'SELECT count(*), min(fetched_at), max(fetched_at) FROM pages').fetchone()
+        return {
+            'path': str(self.path),
+            'pages': count,
+            'oldest': oldest,
+            'newest': newest,
+            'size_bytes': self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_page_store() -> PageStore:
+    """返回进程内共享的页面存储"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PageStore()
+    return _store
+
+
+def format_time(timestamp: Optional[float]) -> str:
+    """将时间戳格式化为本地时间"""
+    if not timestamp:
+        return '-'
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地网页存储 - 检索以前拉取过的页面')
+    parser.add_argument('--db', help='数据库路径（默认: 缓存目录下的 pages.db）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # 各子命令共用的输出选项
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-j', '--json', action='store_true', help='以 JSON 格式输出')
+
+    search_parser = subparsers.add_parser('search', parents=[common], help='全文检索已保存的页面')
+    search_parser.add_argument('query', help='搜索关键词（多个词以空格分隔，需全部匹配）')
+    search_parser.add_argument('-n', '--num-results', type=int, default=10, help='返回结果数量，默认 10')
+
+    get_parser = subparsers.add_parser('get', parents=[common], help='读取已保存页面的 Markdown 内容')
+    get_parser.add_argument('url', help='页面 URL')
+
+    list_parser = subparsers.add_parser('list', parents=[common], help='按拉取时间列出页面')
+    list_parser.add_argument('-n', '--num-results', type=int, default=20, help='列出数量，默认 20')
+
+    delete_parser = subparsers.add_parser('delete', parents=[common], help='删除已保存的页面')
+    delete_parser.add_argument('url', help='页面 URL')
+
+    subparsers.add_parser('stats', parents=[common], help='显示存储统计信息')
+
+    args = parser.parse_args()
+    store = PageStore(args.db)
+
+    if args.command == 'search':
+        results = store.search(args.query, args.num_results)
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=2))
+        elif not results:
+            print('未找到匹配的页面')
+        else:
+            for i, item in enumerate(results, 1):
+                print(f"## {i}. {item['title'] or '无标题'}\n")
+                print(f"**链接**: {item['url']}\n")
+                print(f"**拉取时间**: {format_time(item['fetched_at'])}\n")
+                print(f"{item['snippet']}\n")
+
+    elif args.command == 'get':
+        page = store.get(args.url)
+        if page is None:
+            print(f'错误: 未找到页面: {args.url}', file=sys.stderr)
+            sys.exit(1)
+        if args.json:
+            print(json.dumps(page, ensure_ascii=False, indent=2))
+        else:
+            print(f"# {page['metadata'].get('title') or '无标题'}\n")
+            print(f"> 来源: {page['url']}（拉取于 {format_time(page['fetched_at'])}）\n")
+            print('---\n')
+            print(page['markdown'])
+
+    elif args.command == 'list':
+        pages = store.recent(args.num_results)
+        if args.json:
+            print(json.dumps(pages, ensure_ascii=False, indent=2))
+        else:
+            for page in pages:
+                print(f"{format_time(page['fetched_at'])}  {page['title'] or '无标题'}  {page['url']}")
+
+    elif args.command == 'delete':
+        if not store.delete(args.url):
+            print(f'错误: 未找到页面: {args.url}', file=sys.stderr)
+            sys.exit(1)
+        print(f'已删除: {args.url}')
+
+    elif args.command == 'stats':
+        stats = store.stats()
+        if args.json:
+            print(json.dumps(stats, ensure_ascii=False, indent=2))
+        else:
+            print(f"数据库: {stats['path']}")
+            print(f"页面数: {stats['pages']}")
+            print(f"大小: {stats['size_bytes'] / 1024 / 1024:.2f} MB")
+            print(f"最早拉取: {format_time(stats['oldest'])}")
+            print(f"最近拉取: {format_time(stats['newest'])}")
+
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -15,12 +15,25 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 import json
+import math
 import re
+import time
+import sqlite3
 import argparse
+import heapq
 import urllib.parse
-from typing import List, Dict, Optional, Set, Tuple
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
+from collections import Counter, defaultdict
+from collections.abc import Mapping
 from difflib import SequenceMatcher
+from json.encoder import encode_basestring
+
+from http_client import (StageTimer, get_cache_dir, get_with_retry, locked_json, recording,
+                         transfer_stats)
+from bm25 import BM25Scorer
+from page_store import get_page_store
+from segmenter import get_segmenter, keyword_terms
 
 
 # 无关内容关键词黑名单（用于过滤广告和无关内容）
@@ -44,6 +57,130 @@ LOW_QUALITY_DOMAINS: Set[str] = {
 }
 
 
+class SearchResult(Mapping):
+    """
+    一条搜索结果
+
+    字段保存在 __slots__ 中，rerank 各阶段的得分也写入字段，不再往字典里添加内部键，
+    输出时也不必复制一份去掉内部键。结果对象本身（不含字符串）约为同样内容字典的三分之一
+    （88 与 272 字节）。
+
+    实现了完整的只读映射协议（collections.abc.Mapping），加上对已有键的赋值，可以像以前
+    返回的字典一样使用：result['title']、result.get('snippet')、'url' in result、
+    keys() / items() / values()、dict(result)、**result、按键迭代和相等比较。键为 title、
+    url、snippet、source，以及已评分时的 '_relevance_score'、'_diversity_score'、
+    '_final_score'（未评分时视为不存在）。json.dumps 只接受 dict，序列化前用 to_dict()
+    转换（或 json.dumps(..., default=SearchResult.to_dict)），也可以直接用 to_json()。
+    """
+
+    __slots__ = ('title', 'url', 'snippet', 'source', 'relevance_score', 'diversity_score', 'final_score')
+
+    FIELDS = ('title', 'url', 'snippet', 'source')
+    # 输出时的得分键名 -> 字段名
+    SCORE_FIELDS = (
+        ('_relevance_score', 'relevance_score'),
+        ('_diversity_score', 'diversity_score'),
+        ('_final_score', 'final_score'),
+    )
+    _KEYS = dict([(name, name) for name in FIELDS] + list(SCORE_FIELDS))
+
+    def __init__(self, title: str = '', url: str = '', snippet: str = '', source: str = ''):
+        self.title = title
+        self.url = url
+        self.snippet = snippet
+        self.source = source
+        self.relevance_score: Optional[float] = None
+        self.diversity_score: Optional[float] = None
+        self.final_score: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SearchResult':
+        """由字典创建（忽略其它键，已有的得分一并保留）"""
+        result = cls(data.get('title', ''), data.get('url', ''), data.get('snippet', ''), data.get('source', ''))
+        for key, name in cls.SCORE_FIELDS:
+            setattr(result, name, data.get(key))
+        return result
+
+    def copy(self) -> 'SearchResult':
+        """浅复制（包括得分）"""
+        result = SearchResult(self.title, self.url, self.snippet, self.source)
+        result.set_scores(self.relevance_score, self.diversity_score, self.final_score)
+        return result
+
+    def set_scores(self, relevance: Optional[float], diversity: Optional[float], final: Optional[float]) -> None:
+        """记录得分，保留三位小数"""
+        self.relevance_score = None if relevance is None else round(relevance, 3)
+        self.diversity_score = None if diversity is None else round(diversity, 3)
+        self.final_score = None if final is None else round(final, 3)
+
+    def get(self, key: str, default=None):
+        name = self._KEYS.get(key)
+        value = getattr(self, name) if name else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value) -> None:
+        """给已有的键赋值（字段或得分）；slots 中没有的键不能添加"""
+        name = self._KEYS.get(key)
+        if name is None:
+            raise KeyError(key)
+        setattr(self, name, value)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.FIELDS
+        for key, name in self.SCORE_FIELDS:
+            if getattr(self, name) is not None:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) + sum(getattr(self, name) is not None for _, name in self.SCORE_FIELDS)
+
+    def __repr__(self) -> str:
+        return f'SearchResult(title={self.title!r}, url={self.url!r}, final_score={self.final_score!r})'
+
+    def to_dict(self, scores: bool = False) -> Dict:
+        """
+        转换为字典
+
+        Args:
+            scores: 是否包含已计算的得分（键名以下划线开头）
+        """
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        if scores:
+            for key, name in self.SCORE_FIELDS:
+                value = getattr(self, name)
+                if value is not None:
+                    data[key] = value
+        return data
+
+    def to_json(self, scores: bool = False, record_type: Optional[str] = None) -> str:
+        """
+        序列化为紧凑 JSON（与 json.dumps(to_dict(), ensure_ascii=False, separators=(',', ':')) 相同）
+
+        直接由字段拼接，不创建中间字典。
+
+        Args:
+            scores: 是否包含已计算的得分
+            record_type: 指定时在最前面加上 "type" 字段（NDJSON 记录）
+        """
+        parts = [f'"type":{encode_basestring(record_type)}'] if record_type is not None else []
+        parts.extend(f'"{name}":{encode_basestring(getattr(self, name))}' for name in self.FIELDS)
+        if scores:
+            for key, name in self.SCORE_FIELDS:
+                value = getattr(self, name)
+                if value is not None:
+                    parts.append(f'"{key}":{value!r}')
+        return '{' + ','.join(parts) + '}'
+
+
 def extract_query_keywords(query: str) -> Set[str]:
     """
     从搜索查询中提取关键词
@@ -64,9 +201,8 @@ def extract_query_keywords(query: str) -> Set[str]:
     english_words = re.findall(r'[a-zA-Z]{2,}', cleaned)
     words.update(w.lower() for w in english_words)
 
-    # 提取中文词组（简单按连续中文字符）
-    chinese_phrases = re.findall(r'[\u4e00-\u9fff]{2,}', cleaned)
-    words.update(chinese_phrases)
+    # 中文按词典分词（见 segmenter.py），"人工智能最新进展"切分为"人工智能"、"最新"、"进展"
+    words.update(keyword_terms(cleaned))
 
     return words
 
@@ -142,6 +278,19 @@ def calculate_relevance_score(result: Dict, query_keywords: Set[str]) -> float:
     return max(0.0, min(1.0, score))
 
 
+def heuristic_scorer(query_keywords: Set[str], results: List[Dict]) -> Callable[[Dict], float]:
+    """原有的关键词命中加分规则（见 calculate_relevance_score）"""
+    return lambda result: calculate_relevance_score(result, query_keywords)
+
+
+# 相关性评分器：名称 -> 工厂函数。工厂以 (查询关键词, 本次全部结果) 调用，
+# 返回对单条结果评分（0.0 - 1.0）的函数
+RELEVANCE_SCORERS: Dict[str, Callable[[Set[str], List[Dict]], Callable[[Dict], float]]] = {
+    'heuristic': heuristic_scorer,
+    'bm25': BM25Scorer,
+}
+
+
 def calculate_text_similarity(text1: str, text2: str) -> float:
     """
     计算两个文本的相似度（用于检测重复内容）
@@ -155,6 +304,78 @@ def calculate_text_similarity(text1: str, text2: str) -> float:
     return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
 
 
+# 计算多样性时把文本切成的字符 n-gram（shingle）长度；二元组对中文和英文都适用
+DIVERSITY_SHINGLE_SIZE = 2
+
+
+def shingle_vector(text: str) -> Dict[str, float]:
+    """
+    文本的字符二元组计数向量（L2 归一化），两个向量的点积即余弦相似度
+
+    Args:
+        text: 文本（比较前转为小写、合并空白）
+
+    Returns:
+        {二元组: 归一化后的权重}，文本短于一个二元组时为空
+    """
+    text = ' '.join(text.lower().split())
+    counts = Counter(text[i:i + DIVERSITY_SHINGLE_SIZE] for i in range(len(text) - DIVERSITY_SHINGLE_SIZE + 1))
+    norm = math.sqrt(sum(count * count for count in counts.values()))
+    return {shingle: count / norm for shingle, count in counts.items()} if norm else {}
+
+
+def result_vector(result) -> Dict[str, float]:
+    """搜索结果标题和摘要的 shingle 向量"""
+    return shingle_vector(f"{result.get('title', '')} {result.get('snippet', '')}")
+
+
+def add_vector(total: Dict[str, float], vector: Dict[str, float]) -> None:
+    """把 vector 累加到 total 上"""
+    for shingle, weight in vector.items():
+        total[shingle] = total.get(shingle, 0.0) + weight
+
+
+def vector_diversity(vector: Dict[str, float], total: Dict[str, float], count: int) -> float:
+    """
+    由与全部向量之和的点积得到多样性得分
+
+    余弦相似度对向量是线性的：与其它结果的相似度之和等于本结果向量与其它结果向量之和的
+    点积，也就是与全部向量之和的点积减去与自身的相似度（归一化后为 1）。因此每个结果只需
+    一次点积，不必两两比较。
+
+    Args:
+        vector: 本结果的 shingle 向量
+        total: 全部 count 个结果（含本结果）的向量之和
+        count: 结果总数
+
+    Returns:
+        多样性得分 = 1 - 与其它结果的平均相似度 (0.0 - 1.0)
+    """
+    if count <= 1:
+        return 1.0
+    similarity_sum = sum(weight * total.get(shingle, 0.0) for shingle, weight in vector.items())
+    if vector:
+        similarity_sum -= 1.0
+    return max(0.0, min(1.0, 1.0 - similarity_sum / (count - 1)))
+
+
+def diversity_scores(results: List) -> List[float]:
+    """
+    计算每个结果的多样性得分（见 vector_diversity），总开销与结果数成正比
+
+    Args:
+        results: 搜索结果列表
+
+    Returns:
+        与 results 一一对应的多样性得分
+    """
+    vectors = [result_vector(result) for result in results]
+    total: Dict[str, float] = {}
+    for vector in vectors:
+        add_vector(total, vector)
+    return [vector_diversity(vector, total, len(vectors)) for vector in vectors]
+
+
 def extract_domain(url: str) -> str:
     """
     从 URL 中提取主域名
@@ -179,152 +400,344 @@ def extract_domain(url: str) -> str:
         return ""
 
 
-def check_irrelevant_content(result: Dict, query_keywords: Set[str]) -> Tuple[bool, str]:
+def check_irrelevant_content(result: Dict, query_keywords: Set[str],
+                             timer: Optional[StageTimer] = None) -> Tuple[bool, str]:
     """
     增强版内容检查 - 实现 rerank 算法的质量评估
 
     Args:
         result: 搜索结果字典
         query_keywords: 查询关键词集合
+        timer: 可选计时器，传入时按检查项累计耗时（filter.blacklist、filter.url 等）
 
     Returns:
         (是否应过滤, 过滤原因)
     """
+    timer = timer or StageTimer()
     title = result.get('title', '').lower()
     snippet = result.get('snippet', '').lower()
     url = result.get('url', '').lower()
     combined_text = f"{title} {snippet}"
 
     # 1. 黑名单关键词检查（严格过滤）
-    for keyword in IRRELEVANT_KEYWORDS:
-        if any(keyword.lower() in qk.lower() for qk in query_keywords):
-            continue
-        if keyword.lower() in combined_text:
-            return True, f"包含黑名单关键词: {keyword}"
+    with timer.stage('filter.blacklist'):
+        for keyword in IRRELEVANT_KEYWORDS:
+            if any(keyword.lower() in qk.lower() for qk in query_keywords):
+                continue
+            if keyword.lower() in combined_text:
+                return True, f"包含黑名单关键词: {keyword}"
 
     # 2. URL 质量检查
-    from urllib.parse import urlparse
-    parsed = urlparse(url)
-    domain = parsed.netloc
-
-    # IP 地址直接访问
-    if re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', domain):
-        return True, "IP 地址直接访问（不安全）"
-
-    # 过多广告追踪参数
-    if url.count('utm_') > 3:
-        return True, "广告追踪参数过多"
-
-    # 可疑域名模式
-    suspicious_patterns = [
-        r'\d{5,}',  # 域名包含长数字
-        r'[a-z]{20,}',  # 域名包含超长字母序列
-        r'[-_]{2,}',  # 多个连字符或下划线
-    ]
-    for pattern in suspicious_patterns:
-        if re.search(pattern, domain):
-            return True, f"可疑域名模式: {pattern}"
+    with timer.stage('filter.url'):
+        from urllib.parse import urlparse
+        parsed = urlparse(url)
+        domain = parsed.netloc
+
+        # IP 地址直接访问
+        if re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', domain):
+            return True, "IP 地址直接访问（不安全）"
+
+        # 过多广告追踪参数
+        if url.count('utm_') > 3:
+            return True, "广告追踪参数过多"
+
+        # 可疑域名模式
+        suspicious_patterns = [
+            r'\d{5,}',  # 域名包含长数字
+            r'[a-z]{20,}',  # 域名包含超长字母序列
+            r'[-_]{2,}',  # 多个连字符或下划线
+        ]
+        for pattern in suspicious_patterns:
+            if re.search(pattern, domain):
+                return True, f"可疑域名模式: {pattern}"
 
     # 3. 内容质量检查
-    # 标题过短或过长
-    title_len = len(result.get('title', ''))
-    if title_len < 5:
-        return True, "标题过短（可能是垃圾内容）"
-    if title_len > 150:
-        return True, "标题过长（可能是堆砌关键词）"
-
-    # 摘要过短且标题不相关
-    snippet_len = len(snippet)
-    if snippet_len < 15:
-        return True, "摘要过短（信息不足）"
+    with timer.stage('filter.length'):
+        # 标题过短或过长
+        title_len = len(result.get('title', ''))
+        if title_len < 5:
+            return True, "标题过短（可能是垃圾内容）"
+        if title_len > 150:
+            return True, "标题过长（可能是堆砌关键词）"
+
+        # 摘要过短且标题不相关
+        snippet_len = len(snippet)
+        if snippet_len < 15:
+            return True, "摘要过短（信息不足）"
 
     # 4. 标题与摘要相似度检查（防止标题党）
-    if snippet and title:
-        similarity = calculate_text_similarity(title, snippet)
-        if similarity > 0.9:
-            return True, "标题与摘要高度重复（可能是低质量内容）"
+    with timer.stage('filter.title_snippet'):
+        if snippet and title:
+            similarity = calculate_text_similarity(title, snippet)
+            if similarity > 0.9:
+                return True, "标题与摘要高度重复（可能是低质量内容）"
 
     # 5. 检查是否为纯广告页面
-    ad_indicators = [
-        '点击了解', '立即购买', '限时优惠', '免费试用',
-        '点击查看', '了解更多', '立即咨询', '马上',
-        'click here', 'buy now', 'limited time', 'free trial',
-    ]
-    for indicator in ad_indicators:
-        if indicator in combined_text:
-            # 如果查询关键词不包含该词，则判定为广告
-            if not any(indicator in qk.lower() for qk in query_keywords):
-                return True, f"疑似广告: {indicator}"
+    with timer.stage('filter.ad'):
+        ad_indicators = [
+            '点击了解', '立即购买', '限时优惠', '免费试用',
+            '点击查看', '了解更多', '立即咨询', '马上',
+            'click here', 'buy now', 'limited time', 'free trial',
+        ]
+        for indicator in ad_indicators:
+            if indicator in combined_text:
+                # 如果查询关键词不包含该词，则判定为广告
+                if not any(indicator in qk.lower() for qk in query_keywords):
+                    return True, f"疑似广告: {indicator}"
 
     return False, ""
 
 
-def rerank_results(results: List[Dict], query: str, min_score: float = 0.15,
-                   max_per_domain: int = 5) -> List[Dict]:
+# rerank 报告中按顺序列出的丢弃阶段
+RERANK_DROP_STAGES = ('filter', 'min_score', 'domain_cap', 'dedup')
+
+
+def build_rerank_report(input_count: int, output_count: int, dropped: Counter, reasons: Counter,
+                        comparisons: Counter, timer: StageTimer) -> Dict:
+    """
+    汇总 rerank 报告
+
+    Args:
+        input_count: 输入结果数
+        output_count: 输出结果数
+        dropped: 各阶段丢弃的结果数
+        reasons: 质量过滤的各项原因及次数
+        comparisons: 各阶段的文本相似度比较次数
+        timer: 各阶段耗时
+
+    Returns:
+        {input, output, dropped, filter_reasons, comparisons, timings}；dropped 总是包含
+        RERANK_DROP_STAGES 中的阶段，其它阶段（top_k、capacity）只在有丢弃时列出
+    """
+    stages = {stage: dropped.get(stage, 0) for stage in RERANK_DROP_STAGES}
+    stages.update((stage, n) for stage, n in dropped.items() if n and stage not in stages)
+    return {
+        'input': input_count,
+        'output': output_count,
+        'dropped': stages,
+        'filter_reasons': dict(reasons.most_common()),
+        'comparisons': dict(comparisons),
+        'timings': timer.as_dict(),
+    }
+
+
+def rerank_results(results: List[SearchResult], query: str, min_score: float = 0.15,
+                   max_per_domain: int = 5, timings: Optional[Dict] = None,
+                   scorer: str = 'heuristic', top_k: Optional[int] = None,
+                   report: Optional[Dict] = None) -> List[SearchResult]:
     """
     增强版 rerank 算法 - 多维度重新排序和过滤
 
+    多样性得分由字符二元组向量的余弦相似度计算（见 diversity_scores），全部结果共用一个
+    向量之和，开销与结果数成正比；两两比较的 SequenceMatcher 只用于去重。指定 top_k 时
+    按综合得分从高到低逐个取出候选，只对取出的候选做域名限量和去重，选满 K 名后停止
+    （见 select_top_k），去重的比较次数只与 K 有关；结果与不指定时的前 K 条相同。
+
+    得分写入每条结果的 relevance_score / diversity_score / final_score 字段。
+
     Args:
-        results: 搜索结果列表
+        results: 搜索结果列表（字典会先转换为 SearchResult）
         query: 原始查询
         min_score: 最低相关性得分
         max_per_domain: 每个域名最多保留结果数
+        timings: 可选字典，传入时写入各阶段耗时（毫秒）
+        scorer: 相关性评分器名称（见 RELEVANCE_SCORERS）：heuristic 为关键词命中加分，
+            bm25 按查询词在历史搜索结果中的文档频率加权
+        top_k: 最多返回的结果数，为空时不限
+        report: 可选字典，传入时写入 rerank 报告（见 build_rerank_report）：各阶段丢弃的
+            结果数、质量过滤的原因分布、相似度比较次数和各阶段耗时
 
     Returns:
         重新排序和过滤后的结果列表
     """
+    if scorer not in RELEVANCE_SCORERS:
+        raise ValueError(f"未知的评分器: {scorer}（可选: {', '.join(RELEVANCE_SCORERS)}）")
+    timer = StageTimer()
+    dropped: Counter = Counter()
+    reasons: Counter = Counter()
+    comparisons: Counter = Counter()
     if not results:
+        if report is not None:
+            report.update(build_rerank_report(0, 0, dropped, reasons, comparisons, timer))
         return []
 
-    query_keywords = extract_query_keywords(query)
+    start = time.perf_counter()
+    results = [r if isinstance(r, SearchResult) else SearchResult.from_dict(r) for r in results]
+
+    with timer.stage('keywords'):
+        query_keywords = extract_query_keywords(query)
+
+    with timer.stage('scorer'):
+        score_relevance = RELEVANCE_SCORERS[scorer](query_keywords, results)
+
+    # 多样性与全部结果（含之后被过滤的）比较，一次算出
+    with timer.stage('diversity'):
+        diversity = diversity_scores(results)
+    comparisons['diversity'] += len(results)
 
     # 第一阶段：质量过滤和基础评分
     scored_results = []
-    for result in results:
+    candidates = []
+    for index, result in enumerate(results):
         # 质量检查
-        should_filter, reason = check_irrelevant_content(result, query_keywords)
+        with timer.stage('filter'):
+            should_filter, reason = check_irrelevant_content(result, query_keywords, timer)
         if should_filter:
+            dropped['filter'] += 1
+            reasons[reason] += 1
             continue
 
         # 计算相关性得分
-        relevance_score = calculate_relevance_score(result, query_keywords)
+        with timer.stage('relevance'):
+            relevance_score = score_relevance(result)
+
+        if top_k is not None:
+            candidates.append((relevance_score, index, result))
+            continue
 
-        # 计算多样性得分（避免同质化内容）
-        diversity_score = calculate_diversity_score(result, results)
+        # 多样性得分（避免同质化内容）
+        diversity_score = diversity[index]
 
         # 综合得分：相关性 70% + 多样性 30%
         final_score = relevance_score * 0.7 + diversity_score * 0.3
 
-        result['_relevance_score'] = round(relevance_score, 3)
-        result['_diversity_score'] = round(diversity_score, 3)
-        result['_final_score'] = round(final_score, 3)
+        result.set_scores(relevance_score, diversity_score, final_score)
 
         if final_score >= min_score:
             scored_results.append(result)
+        else:
+            dropped['min_score'] += 1
+
+    if top_k is not None:
+        deduplicated_results = select_top_k(candidates, diversity, min_score, max_per_domain, top_k, timer,
+                                            dropped=dropped, comparisons=comparisons)
+    else:
+        # 第二阶段：按综合得分排序
+        with timer.stage('sort'):
+            scored_results.sort(key=lambda x: x.final_score, reverse=True)
+
+        # 第三阶段：域名多样化（每个域名最多保留 max_per_domain 个结果）
+        with timer.stage('domain_cap'):
+            diversified_results = limit_per_domain(scored_results, max_per_domain)
+        dropped['domain_cap'] += len(scored_results) - len(diversified_results)
+
+        # 第四阶段：去除近似重复内容
+        with timer.stage('dedup'):
+            deduplicated_results = remove_near_duplicates(diversified_results, comparisons=comparisons)
+        dropped['dedup'] += len(diversified_results) - len(deduplicated_results)
+
+    timer.add('total', time.perf_counter() - start)
+    if timings is not None:
+        timings.update(timer.as_dict())
+    if report is not None:
+        report.update(build_rerank_report(len(results), len(deduplicated_results), dropped, reasons,
+                                          comparisons, timer))
+
+    return deduplicated_results
+
 
-    # 第二阶段：按综合得分排序
-    scored_results.sort(key=lambda x: x.get('_final_score', 0), reverse=True)
+def select_top_k(candidates: List[Tuple[float, int, SearchResult]], diversity: List[float],
+                 min_score: float, max_per_domain: int, top_k: int, timer: StageTimer,
+                 similarity_threshold: float = 0.85, dropped: Optional[Counter] = None,
+                 comparisons: Optional[Counter] = None) -> List[SearchResult]:
+    """
+    按综合得分选出前 K 名，只对取出的候选做域名限量和去重
+
+    综合得分 = 相关性 × 0.7 + 多样性 × 0.3。多样性已由 diversity_scores 一次算出，
+    这里对全部候选建堆（线性时间），按得分从高到低逐个取出，依次经过域名限量和去重检查；
+    选满 K 名、或下一名已低于 min_score 时停止。去重只与已选的结果比较，比较次数不超过
+    K × 取出的候选数，与结果总数无关。
 
-    # 第三阶段：域名多样化（每个域名最多保留 max_per_domain 个结果）
-    diversified_results = []
+    Args:
+        candidates: 通过质量过滤的 (相关性得分, 原始位置, 结果)
+        diversity: 全部结果的多样性得分，按原始位置索引
+        min_score: 最低综合得分
+        max_per_domain: 每个域名最多保留结果数
+        top_k: 选出的结果数
+        timer: 阶段计时器
+        similarity_threshold: 与已选结果的相似度达到该值时视为重复
+        dropped: 可选计数器，传入时累加各阶段丢弃的结果数；因选满 K 名而未取出的
+            结果计入 top_k
+        comparisons: 可选计数器，传入时累加去重（dedup）的比较次数
+
+    Returns:
+        按综合得分排序的前 K 名，与完整 rerank 结果的前 K 条相同
+    """
+    dropped = Counter() if dropped is None else dropped
+    comparisons = Counter() if comparisons is None else comparisons
+
+    # 堆中的键为 (-得分, 原始位置)，得分相同时保持原始顺序，与完整排序一致
+    with timer.stage('sort'):
+        scored = []
+        for relevance, index, result in candidates:
+            final_score = relevance * 0.7 + diversity[index] * 0.3
+            result.set_scores(relevance, diversity[index], final_score)
+            scored.append((-result.final_score, index, final_score, result))
+        heapq.heapify(scored)
+    selected: List[SearchResult] = []
+    selected_matchers: List[SequenceMatcher] = []
     domain_counts = defaultdict(int)
 
-    for result in scored_results:
+    while len(selected) < top_k and scored:
+        neg_rounded, _, final_score, result = heapq.heappop(scored)
+        if final_score < min_score:
+            dropped['min_score'] += 1
+            if -neg_rounded < min_score:
+                # 之后的结果得分都不会更高
+                dropped['min_score'] += len(scored)
+                scored = []
+                break
+            continue
+
+        with timer.stage('domain_cap'):
+            domain = extract_domain(result.url)
+            if domain_counts[domain] >= max_per_domain:
+                dropped['domain_cap'] += 1
+                continue
+            domain_counts[domain] += 1
+
+        with timer.stage('dedup'):
+            # quick_ratio 是 ratio 的上限，低于阈值时不必精确计算
+            text = f"{result.title} {result.snippet}".lower()
+            duplicate = False
+            for matcher in selected_matchers:
+                comparisons['dedup'] += 1
+                matcher.set_seq1(text)
+                if matcher.quick_ratio() >= similarity_threshold and matcher.ratio() >= similarity_threshold:
+                    duplicate = True
+                    break
+            if duplicate:
+                dropped['dedup'] += 1
+                continue
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(text)
+            selected_matchers.append(matcher)
+        selected.append(result)
+
+    # 选满 K 名后剩下的候选
+    dropped['top_k'] += len(scored)
+    return selected
+
+
+def limit_per_domain(results: List[SearchResult], max_per_domain: int) -> List[SearchResult]:
+    """按顺序保留结果，每个域名最多 max_per_domain 个"""
+    limited = []
+    domain_counts = defaultdict(int)
+    for result in results:
         domain = extract_domain(result.get('url', ''))
         if domain_counts[domain] < max_per_domain:
-            diversified_results.append(result)
+            limited.append(result)
             domain_counts[domain] += 1
-
-    # 第四阶段：去除近似重复内容
-    deduplicated_results = remove_near_duplicates(diversified_results)
-
-    return deduplicated_results
+    return limited
 
 
 def calculate_diversity_score(result: Dict, all_results: List[Dict]) -> float:
     """
     计算结果的多样性得分（奖励独特内容）
 
+    与 diversity_scores 相同：1 - 与其它结果的平均余弦相似度（字符二元组向量）。
+    需要对多个结果计算时直接调用 diversity_scores，全部结果只加总一次。
+
     Args:
         result: 当前结果
         all_results: 所有结果列表
@@ -332,39 +745,26 @@ def calculate_diversity_score(result: Dict, all_results: List[Dict]) -> float:
     Returns:
         多样性得分 (0.0 - 1.0)
     """
-    title = result.get('title', '').lower()
-    snippet = result.get('snippet', '').lower()
-    combined = f"{title} {snippet}"
-
-    # 与其他结果比较
-    similarities = []
+    total: Dict[str, float] = {}
+    count = 0
     for other in all_results:
-        if other is result:
-            continue
-        other_title = other.get('title', '').lower()
-        other_snippet = other.get('snippet', '').lower()
-        other_combined = f"{other_title} {other_snippet}"
-
-        sim = calculate_text_similarity(combined, other_combined)
-        similarities.append(sim)
-
-    if not similarities:
-        return 1.0
-
-    # 平均相似度越低，多样性得分越高
-    avg_similarity = sum(similarities) / len(similarities)
-    diversity_score = 1.0 - avg_similarity
-
-    return max(0.0, min(1.0, diversity_score))
+        if other is not result:
+            add_vector(total, result_vector(other))
+            count += 1
+    vector = result_vector(result)
+    add_vector(total, vector)
+    return vector_diversity(vector, total, count + 1)
 
 
-def remove_near_duplicates(results: List[Dict], similarity_threshold: float = 0.85) -> List[Dict]:
+def remove_near_duplicates(results: List[SearchResult], similarity_threshold: float = 0.85,
+                           comparisons: Optional[Counter] = None) -> List[SearchResult]:
     """
     移除近似重复的结果
 
     Args:
         results: 结果列表
         similarity_threshold: 相似度阈值，超过此值视为重复
+        comparisons: 可选计数器，传入时把比较次数累加到 dedup
 
     Returns:
         去重后的结果列表
@@ -378,15 +778,17 @@ def remove_near_duplicates(results: List[Dict], similarity_threshold: float = 0.
         is_duplicate = False
         result_text = f"{result.get('title', '')} {result.get('snippet', '')}"
 
-        for existing in unique_results:
+        for position, existing in enumerate(unique_results):
             existing_text = f"{existing.get('title', '')} {existing.get('snippet', '')}"
             similarity = calculate_text_similarity(result_text, existing_text)
+            if comparisons is not None:
+                comparisons['dedup'] += 1
 
             if similarity >= similarity_threshold:
                 is_duplicate = True
                 # 保留得分更高的结果
-                if result.get('_final_score', 0) > existing.get('_final_score', 0):
-                    unique_results.remove(existing)
+                if (result.get('_final_score') or 0) > (existing.get('_final_score') or 0):
+                    del unique_results[position]
                     unique_results.append(result)
                 break
 
@@ -396,7 +798,7 @@ def remove_near_duplicates(results: List[Dict], similarity_threshold: float = 0.
     return unique_results
 
 
-def filter_by_relevance(results: List[Dict], query: str, min_score: float = 0.15) -> List[Dict]:
+def filter_by_relevance(results: List[SearchResult], query: str, min_score: float = 0.15) -> List[SearchResult]:
     """
     兼容性接口 - 调用新的 rerank_results
 
@@ -410,6 +812,174 @@ def filter_by_relevance(results: List[Dict], query: str, min_score: float = 0.15
     """
     return rerank_results(results, query, min_score)
 
+
+class _Candidate:
+    """StreamingReranker 的候选结果：相关性得分和计算多样性用的 shingle 向量"""
+
+    __slots__ = ('result', 'relevance', 'vector', 'index')
+
+    def __init__(self, result: SearchResult, relevance: float, vector: Dict[str, float], index: int):
+        self.result = result
+        self.relevance = relevance
+        self.vector = vector
+        self.index = index
+
+
+class StreamingReranker:
+    """
+    增量 rerank：各搜索引擎的结果到达一批处理一批，随时给出当前的前 K 条
+
+    评分规则与 rerank_results 相同。多样性得分依赖与全部结果的平均相似度，
+    而平均相似度可以由全部结果的 shingle 向量之和算出（见 vector_diversity），因此每个
+    新结果只需把向量累加到总和上，排序时每个候选做一次点积；全部批次到齐后得分与对
+    全部结果调用 rerank_results 一致。
+
+    候选堆最多保留 capacity 个结果，超出时淘汰得分上限（相关性 × 0.7 + 0.3）最低的，
+    内存占用不随结果总数增长（已见结果只累加到一个向量之和中）。
+    使用 bm25 评分器时每批结果先计入 DF 统计再评分，先到的批次使用的 IDF 略旧。
+    """
+
+    def __init__(self, query: str, min_score: float = 0.15, max_per_domain: int = 5,
+                 top_k: int = 10, scorer: str = 'heuristic', capacity: Optional[int] = None):
+        """
+        Args:
+            query: 原始查询
+            min_score: 最低综合得分
+            max_per_domain: 每个域名最多保留结果数
+            top_k: top() 返回的结果数
+            scorer: 相关性评分器名称（见 RELEVANCE_SCORERS）
+            capacity: 候选堆容量，默认为 top_k 的 4 倍
+        """
+        if scorer not in RELEVANCE_SCORERS:
+            raise ValueError(f"未知的评分器: {scorer}（可选: {', '.join(RELEVANCE_SCORERS)}）")
+        self.min_score = min_score
+        self.max_per_domain = max_per_domain
+        self.top_k = top_k
+        self.scorer = scorer
+        self.capacity = capacity or top_k * 4
+        self.timer = StageTimer()
+        with self.timer.stage('keywords'):
+            self.query_keywords = extract_query_keywords(query)
+        self._seen = 0
+        self._total: Dict[str, float] = {}
+        self._heap: List[Tuple[float, int, _Candidate]] = []
+        self._candidates: Dict[int, _Candidate] = {}
+        self._ranked: List[SearchResult] = []
+        self._top_urls: List[str] = []
+        # 报告用的计数：过滤和淘汰是累计的，min_score / domain_cap / dedup 对应当前排名
+        self._dropped: Counter = Counter()
+        self._reasons: Counter = Counter()
+        self._comparisons: Counter = Counter()
+        self._rank_dropped: Counter = Counter()
+
+    def add(self, results: List[SearchResult]) -> bool:
+        """
+        加入一批结果并重新排序
+
+        Args:
+            results: 一个搜索引擎返回的结果（字典会先转换为 SearchResult）
+
+        Returns:
+            前 K 条（按 URL 和顺序）是否发生变化
+        """
+        if not results:
+            return False
+        timer = self.timer
+        results = [r if isinstance(r, SearchResult) else SearchResult.from_dict(r) for r in results]
+        with timer.stage('scorer'):
+            score_relevance = RELEVANCE_SCORERS[self.scorer](self.query_keywords, results)
+
+        for result in results:
+            # 每个结果（包括之后被过滤的）都计入多样性的比较对象
+            with timer.stage('diversity'):
+                vector = result_vector(result)
+                add_vector(self._total, vector)
+            self._comparisons['diversity'] += 1
+            index = self._seen
+            self._seen += 1
+
+            with timer.stage('filter'):
+                should_filter, reason = check_irrelevant_content(result, self.query_keywords, timer)
+            if should_filter:
+                self._dropped['filter'] += 1
+                self._reasons[reason] += 1
+                continue
+
+            with timer.stage('relevance'):
+                relevance = score_relevance(result)
+            upper_bound = relevance * 0.7 + 0.3
+            if upper_bound < self.min_score:
+                self._dropped['min_score'] += 1
+                continue
+
+            candidate = _Candidate(result, relevance, vector, index)
+            heapq.heappush(self._heap, (upper_bound, index, candidate))
+            self._candidates[index] = candidate
+            if len(self._heap) > self.capacity:
+                _, _, evicted = heapq.heappop(self._heap)
+                del self._candidates[evicted.index]
+                self._dropped['capacity'] += 1
+
+        with timer.stage('rank'):
+            self._ranked = self._rank()
+        top_urls = [r.url for r in self._ranked[:self.top_k]]
+        changed = top_urls != self._top_urls
+        self._top_urls = top_urls
+        return changed
+
+    def _rank(self) -> List[SearchResult]:
+        scored = []
+        for candidate in self._candidates.values():
+            diversity = vector_diversity(candidate.vector, self._total, self._seen)
+            final_score = candidate.relevance * 0.7 + diversity * 0.3
+            result = candidate.result
+            result.set_scores(candidate.relevance, diversity, final_score)
+            if final_score >= self.min_score:
+                scored.append(result)
+        scored.sort(key=lambda x: x.final_score, reverse=True)
+        limited = limit_per_domain(scored, self.max_per_domain)
+        ranked = remove_near_duplicates(limited, comparisons=self._comparisons)
+        self._rank_dropped = Counter({
+            'min_score': len(self._candidates) - len(scored),
+            'domain_cap': len(scored) - len(limited),
+            'dedup': len(limited) - len(ranked),
+        })
+        return ranked
+
+    def top(self) -> List[SearchResult]:
+        """当前的前 K 条结果"""
+        return self._ranked[:self.top_k]
+
+    def results(self) -> List[SearchResult]:
+        """当前全部通过过滤的结果（按综合得分排序，已按域名限量和去重）"""
+        return list(self._ranked)
+
+    @property
+    def seen(self) -> int:
+        """已处理的结果总数"""
+        return self._seen
+
+    def timings(self) -> Dict[str, float]:
+        """各阶段累计耗时（毫秒）"""
+        return self.timer.as_dict()
+
+    def report(self, returned: Optional[int] = None) -> Dict:
+        """
+        当前排名的 rerank 报告（格式见 build_rerank_report）
+
+        候选堆容量不足而淘汰的结果计入 capacity；比较次数和耗时为全部批次的累计值。
+
+        Args:
+            returned: 实际输出的结果数（只取 results() 的前若干条时），其余计入 top_k
+        """
+        dropped = self._dropped + self._rank_dropped
+        output = len(self._ranked)
+        if returned is not None and returned < output:
+            dropped['top_k'] += output - returned
+            output = returned
+        return build_rerank_report(self.seen, output, dropped, self._reasons, self._comparisons, self.timer)
+
+
 try:
     import requests
     from bs4 import BeautifulSoup
@@ -420,13 +990,216 @@ except ImportError:
     BS4_AVAILABLE = False
 
 
-def search_baidu(query: str, num_results: int = 10) -> List[Dict]:
+# 搜索引擎入口地址（基准测试时可指向本地替身服务器）
+BAIDU_SEARCH_URL = 'https://www.baidu.com/s'
+BING_SEARCH_URL = 'https://www.bing.com/search'
+
+# 搜索请求的 (连接, 读取) 超时、包含重试在内的总耗时上限（秒）和最多重试次数
+SEARCH_TIMEOUT = (3.05, 8)
+SEARCH_DEADLINE = 12.0
+SEARCH_RETRIES = 2
+
+
+class EngineHealth:
+    """
+    搜索引擎健康状态与熔断器
+
+    记录每个引擎最近的调用结果，并保存在缓存目录中，跨进程、跨调用共享。
+    时间窗口内调用次数达到 min_calls 且失败率达到 failure_threshold 时熔断（open），
+    熔断期间直接跳过该引擎；cooldown 秒后进入半开（half_open）状态，
+    放行一次探测请求，成功则恢复（closed），失败则重新熔断。
+    """
+
+    def __init__(self, path=None, window: float = 300.0, min_calls: int = 4,
+                 failure_threshold: float = 0.5, cooldown: float = 60.0, max_events: int = 20):
+        self.path = path
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_events = max_events
+
+    def _state(self):
+        if self.path is None:
+            self.path = get_cache_dir() / 'engine_health.json'
+        return locked_json(self.path)
+
+    def allow(self, engine: str) -> bool:
+        """判断当前是否应调用该引擎（熔断期间返回 False）"""
+        try:
+            with self._state() as state:
+                entry = state.setdefault(engine, {'state': 'closed', 'events': []})
+                if entry['state'] == 'closed':
+                    return True
+
+                now = time.time()
+                if entry['state'] == 'open':
+                    if now - entry.get('opened_at', 0) < self.cooldown:
+                        return False
+                    entry['state'] = 'half_open'
+                    entry['probe_at'] = now
+                    return True
+
+                # 半开状态下只放行一次探测；探测方异常退出时，冷却后允许新的探测
+                if now - entry.get('probe_at', 0) >= self.cooldown:
+                    entry['probe_at'] = now
+                    return True
+                return False
+        except OSError:
+            return True
+
+    def record(self, engine: str, ok: bool) -> None:
+        """记录一次调用结果，并按失败率更新熔断状态"""
+        try:
+            with self._state() as state:
+                entry = state.setdefault(engine, {'state': 'closed', 'events': []})
+                now = time.time()
+
+                if entry['state'] == 'half_open':
+                    if ok:
+                        entry.update(state='closed', events=[])
+                    else:
+                        entry.update(state='open', opened_at=now)
+                    return
+
+                events = [e for e in entry['events'] if now - e[0] <= self.window]
+                events.append([round(now, 3), ok])
+                entry['events'] = events[-self.max_events:]
+
+                failures = sum(1 for _, success in entry['events'] if not success)
+                if (len(entry['events']) >= self.min_calls
+                        and failures / len(entry['events']) >= self.failure_threshold):
+                    entry.update(state='open', opened_at=now)
+        except OSError:
+            pass
+
+    def state(self, engine: str) -> str:
+        """返回引擎的熔断状态：closed / open / half_open"""
+        try:
+            with self._state() as state:
+                return state.get(engine, {}).get('state', 'closed')
+        except OSError:
+            return 'closed'
+
+
+_engine_health = None
+
+
+def get_engine_health() -> EngineHealth:
+    """返回进程内共享的引擎健康状态"""
+    global _engine_health
+    if _engine_health is None:
+        _engine_health = EngineHealth()
+    return _engine_health
+
+
+def parse_baidu_results(html: str, num_results: int = 10) -> List[SearchResult]:
+    """
+    解析百度搜索结果页
+
+    Args:
+        html: 搜索结果页 HTML
+        num_results: 返回结果数量
+
+    Returns:
+        搜索结果列表
+    """
+    results = []
+
+    if BS4_AVAILABLE:
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # 百度搜索结果通常在 .result 容器中
+        for item in soup.select('.result')[:num_results]:
+            title_elem = item.select_one('h3 a')
+            snippet_elem = item.select_one('.c-abstract')
+            url_elem = item.select_one('h3 a')
+
+            if title_elem and url_elem:
+                title = title_elem.get_text(strip=True)
+                url = url_elem.get('href', '')
+                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
+
+                # 清理 URL（百度会跳转）
+                if url.startswith('/link?url='):
+                    # 尝试从跳转链接中提取真实 URL
+                    parsed = urllib.parse.urlparse(url)
+                    params = urllib.parse.parse_qs(parsed.query)
+                    real_url = params.get('url', [''])[0]
+                    if real_url:
+                        url = real_url
+
+                results.append(SearchResult(title, url, snippet, '百度'))
+    else:
+        # 无 BeautifulSoup 时的备用方案：使用正则表达式
+        # 提取标题和链接
+        pattern = r'<h3[^>]*>.*?<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>.*?</h3>'
+        for match in re.finditer(pattern, html, re.IGNORECASE | re.DOTALL):
+            url = match.group(1)
+            title = re.sub(r'<[^>]+>', '', match.group(2))
+            title = title.strip()
+
+            if url and title:
+                results.append(SearchResult(title, url, '', '百度'))
+
+            if len(results) >= num_results:
+                break
+
+    return results
+
+
+def parse_bing_results(html: str, num_results: int = 10) -> List[SearchResult]:
+    """
+    解析 Bing 搜索结果页
+
+    Args:
+        html: 搜索结果页 HTML
+        num_results: 返回结果数量
+
+    Returns:
+        搜索结果列表
+    """
+    results = []
+
+    if BS4_AVAILABLE:
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Bing 搜索结果通常在 .b_algo 容器中
+        for item in soup.select('.b_algo')[:num_results]:
+            title_elem = item.select_one('h2 a')
+            snippet_elem = item.select_one('.b_caption p')
+
+            if title_elem:
+                title = title_elem.get_text(strip=True)
+                url = title_elem.get('href', '')
+                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
+
+                results.append(SearchResult(title, url, snippet, 'Bing'))
+    else:
+        # 无 BeautifulSoup 时的备用方案
+        pattern = r'<h2[^>]*>.*?<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>.*?</h2>'
+        for match in re.finditer(pattern, html, re.IGNORECASE | re.DOTALL):
+            url = match.group(1)
+            title = re.sub(r'<[^>]+>', '', match.group(2))
+            title = title.strip()
+
+            if url and title:
+                results.append(SearchResult(title, url, '', 'Bing'))
+
+            if len(results) >= num_results:
+                break
+
+    return results
+
+
+def search_baidu(query: str, num_results: int = 10, timings: Optional[Dict] = None) -> List[SearchResult]:
     """
     使用百度搜索引擎
 
     Args:
         query: 搜索关键词
         num_results: 返回结果数量
+        timings: 可选字典，传入时写入请求和解析耗时（毫秒），以及传输统计（transfer）
 
     Returns:
         搜索结果列表
@@ -435,9 +1208,11 @@ def search_baidu(query: str, num_results: int = 10) -> List[Dict]:
         return []
 
     results = []
+    timer = StageTimer()
+    transfer = None
     try:
         # 构建百度搜索 URL
-        search_url = f"https://www.baidu.com/s?wd={urllib.parse.quote(query)}&rn={num_results}"
+        search_url = f"{BAIDU_SEARCH_URL}?wd={urllib.parse.quote(query)}&rn={num_results}"
 
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -446,72 +1221,37 @@ def search_baidu(query: str, num_results: int = 10) -> List[Dict]:
             'Referer': 'https://www.baidu.com/',
         }
 
-        response = requests.get(search_url, headers=headers, timeout=10)
+        with recording(timer), timer.stage('request'):
+            response = get_with_retry(search_url, retries=SEARCH_RETRIES, deadline=SEARCH_DEADLINE,
+                                      headers=headers, timeout=SEARCH_TIMEOUT)
         response.raise_for_status()
         response.encoding = 'utf-8'
 
-        if BS4_AVAILABLE:
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 百度搜索结果通常在 .result 容器中
-            for item in soup.select('.result')[:num_results]:
-                title_elem = item.select_one('h3 a')
-                snippet_elem = item.select_one('.c-abstract')
-                url_elem = item.select_one('h3 a')
-
-                if title_elem and url_elem:
-                    title = title_elem.get_text(strip=True)
-                    url = url_elem.get('href', '')
-                    snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
-
-                    # 清理 URL（百度会跳转）
-                    if url.startswith('/link?url='):
-                        # 尝试从跳转链接中提取真实 URL
-                        parsed = urllib.parse.urlparse(url)
-                        params = urllib.parse.parse_qs(parsed.query)
-                        real_url = params.get('url', [''])[0]
-                        if real_url:
-                            url = real_url
-
-                    results.append({
-                        'title': title,
-                        'url': url,
-                        'snippet': snippet,
-                        'source': '百度'
-                    })
-        else:
-            # 无 BeautifulSoup 时的备用方案：使用正则表达式
-            # 提取标题和链接
-            pattern = r'<h3[^>]*>.*?<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>.*?</h3>'
-            for match in re.finditer(pattern, response.text, re.IGNORECASE | re.DOTALL):
-                url = match.group(1)
-                title = re.sub(r'<[^>]+>', '', match.group(2))
-                title = title.strip()
-
-                if url and title:
-                    results.append({
-                        'title': title,
-                        'url': url,
-                        'snippet': '',
-                        'source': '百度'
-                    })
-
-                if len(results) >= num_results:
-                    break
+        with timer.stage('parse'):
+            results = parse_baidu_results(response.text, num_results)
+        transfer = transfer_stats(response)
+        get_engine_health().record('baidu', True)
 
     except Exception as e:
+        get_engine_health().record('baidu', False)
         print(f"百度搜索出错: {str(e)}", file=sys.stderr)
 
+    if timings is not None:
+        timings.update(timer.as_dict())
+        if transfer is not None:
+            timings['transfer'] = transfer
+
     return results
 
 
-def search_bing(query: str, num_results: int = 10) -> List[Dict]:
+def search_bing(query: str, num_results: int = 10, timings: Optional[Dict] = None) -> List[SearchResult]:
     """
     使用 Bing 搜索引擎
 
     Args:
         query: 搜索关键词
         num_results: 返回结果数量
+        timings: 可选字典，传入时写入请求和解析耗时（毫秒），以及传输统计（transfer）
 
     Returns:
         搜索结果列表
@@ -520,9 +1260,11 @@ def search_bing(query: str, num_results: int = 10) -> List[Dict]:
         return []
 
     results = []
+    timer = StageTimer()
+    transfer = None
     try:
         # 构建 Bing 搜索 URL（使用国际版，更稳定）
-        search_url = f"https://www.bing.com/search?q={urllib.parse.quote(query)}&count={num_results}"
+        search_url = f"{BING_SEARCH_URL}?q={urllib.parse.quote(query)}&count={num_results}"
 
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -530,83 +1272,133 @@ def search_bing(query: str, num_results: int = 10) -> List[Dict]:
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
         }
 
-        response = requests.get(search_url, headers=headers, timeout=10)
+        with recording(timer), timer.stage('request'):
+            response = get_with_retry(search_url, retries=SEARCH_RETRIES, deadline=SEARCH_DEADLINE,
+                                      headers=headers, timeout=SEARCH_TIMEOUT)
         response.raise_for_status()
         response.encoding = 'utf-8'
 
-        if BS4_AVAILABLE:
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Bing 搜索结果通常在 .b_algo 容器中
-            for item in soup.select('.b_algo')[:num_results]:
-                title_elem = item.select_one('h2 a')
-                snippet_elem = item.select_one('.b_caption p')
-
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                    url = title_elem.get('href', '')
-                    snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
-
-                    results.append({
-                        'title': title,
-                        'url': url,
-                        'snippet': snippet,
-                        'source': 'Bing'
-                    })
-        else:
-            # 无 BeautifulSoup 时的备用方案
-            pattern = r'<h2[^>]*>.*?<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>.*?</h2>'
-            for match in re.finditer(pattern, response.text, re.IGNORECASE | re.DOTALL):
-                url = match.group(1)
-                title = re.sub(r'<[^>]+>', '', match.group(2))
-                title = title.strip()
-
-                if url and title:
-                    results.append({
-                        'title': title,
-                        'url': url,
-                        'snippet': '',
-                        'source': 'Bing'
-                    })
-
-                if len(results) >= num_results:
-                    break
+        with timer.stage('parse'):
+            results = parse_bing_results(response.text, num_results)
+        transfer = transfer_stats(response)
+        get_engine_health().record('bing', True)
 
     except Exception as e:
+        get_engine_health().record('bing', False)
         print(f"Bing 搜索出错: {str(e)}", file=sys.stderr)
 
+    if timings is not None:
+        timings.update(timer.as_dict())
+        if transfer is not None:
+            timings['transfer'] = transfer
+
+    return results
+
+
+def markdown_to_snippet(text: str) -> str:
+    """去掉摘要中的 Markdown 标记（标题、强调、链接、图片），合并空白"""
+    text = re.sub(r'!\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'[#*_>`|]+', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def search_local(query: str, num_results: int = 10, timings: Optional[Dict] = None) -> List[SearchResult]:
+    """
+    使用本地页面库检索以前拉取过的页面（见 page_store.py），不发网络请求
+
+    命中任一查询词的页面都会返回，按 bm25 相关性排序。
+
+    Args:
+        query: 搜索关键词
+        num_results: 返回结果数量
+        timings: 可选字典，传入时写入检索耗时（毫秒）
+
+    Returns:
+        搜索结果列表，来源为"本地"
+    """
+    results = []
+    timer = StageTimer()
+    try:
+        with timer.stage('query'):
+            rows = get_page_store().search(query, num_results, match_all=False, highlight=False)
+        for row in rows:
+            results.append(SearchResult(row['title'] or row['url'], row['url'],
+                                        markdown_to_snippet(row['snippet'] or ''), '本地'))
+    except (sqlite3.Error, OSError) as e:
+        print(f"本地检索出错: {str(e)}", file=sys.stderr)
+
+    if timings is not None:
+        timings.update(timer.as_dict())
+
     return results
 
 
-def search_all(query: str, engines: List[str] = None, num_results: int = 10) -> List[Dict]:
+def search_all(query: str, engines: List[str] = None, num_results: int = 10,
+               on_engine_done: Optional[Callable[[str, List[SearchResult]], None]] = None,
+               timings: Optional[Dict] = None) -> List[SearchResult]:
     """
     使用指定的搜索引擎进行搜索
 
+    各引擎并发请求，总耗时取决于最慢的引擎而不是各引擎之和。
+
     Args:
         query: 搜索关键词
-        engines: 搜索引擎列表，默认 ['baidu', 'bing']
+        engines: 搜索引擎列表（baidu / bing / local），默认 ['baidu', 'bing']
         num_results: 每个搜索引擎返回的结果数量
+        on_engine_done: 可选回调，每个搜索引擎完成时按完成顺序、在调用线程中以
+            (引擎名, 该引擎结果) 调用，用于流式输出和增量 rerank（见 StreamingReranker）
+        timings: 可选字典，传入时写入每个引擎的耗时（engines）和总耗时（total，毫秒）
 
     Returns:
-        合并后的搜索结果列表
+        合并后的搜索结果列表（按 engines 中的顺序）
     """
     if engines is None:
         engines = ['baidu', 'bing']
 
+    searchers = {'baidu': search_baidu, 'bing': search_bing, 'local': search_local}
+    selected = []
+    for engine in engines:
+        engine = engine.lower()
+        if engine in searchers and engine not in selected:
+            selected.append(engine)
+
+    engine_timings = {engine: {} for engine in selected}
+    engine_results: Dict[str, List[SearchResult]] = {}
+    start = time.perf_counter()
+    if timings is not None:
+        # 提前放入，on_engine_done 回调中即可读到已完成引擎的耗时
+        timings['engines'] = engine_timings
+
+    def run(engine: str) -> List[SearchResult]:
+        # 熔断中的引擎直接跳过，避免每次搜索都等待超时
+        if engine in ('baidu', 'bing') and not get_engine_health().allow(engine):
+            print(f"{engine} 近期错误率过高，已熔断跳过", file=sys.stderr)
+            return []
+        return searchers[engine](query, num_results, timings=engine_timings[engine])
+
+    if selected:
+        with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+            futures = {executor.submit(run, engine): engine for engine in selected}
+            for future in as_completed(futures):
+                engine = futures[future]
+                engine_results[engine] = future.result()
+                if on_engine_done is not None:
+                    on_engine_done(engine, engine_results[engine])
+
     all_results = []
+    for engine in selected:
+        all_results.extend(engine_results[engine])
 
-    for engine in engines:
-        if engine.lower() == 'baidu':
-            all_results.extend(search_baidu(query, num_results))
-        elif engine.lower() == 'bing':
-            all_results.extend(search_bing(query, num_results))
+    if timings is not None:
+        timings['total'] = round((time.perf_counter() - start) * 1000, 3)
 
     return all_results
 
 
 # deduplicate_results 函数已被 rerank_results 替代
 # 保留为兼容性接口
-def deduplicate_results(results: List[Dict]) -> List[Dict]:
+def deduplicate_results(results: List[SearchResult]) -> List[SearchResult]:
     """
     兼容性接口 - 调用 rerank_results 进行去重
 
@@ -622,7 +1414,7 @@ def deduplicate_results(results: List[Dict]) -> List[Dict]:
     return rerank_results(results, "", min_score=0.0, max_per_domain=999)
 
 
-def format_results_markdown(results: List[Dict], query: str) -> str:
+def format_results_markdown(results: List[SearchResult], query: str) -> str:
     """
     将搜索结果格式化为 Markdown
 
@@ -652,77 +1444,218 @@ def format_results_markdown(results: List[Dict], query: str) -> str:
     return '\n'.join(lines)
 
 
+def format_rerank_report(report: Dict) -> List[str]:
+    """
+    将 rerank 报告格式化为文本行（输出到 stderr）
+
+    Args:
+        report: build_rerank_report 的返回值
+
+    Returns:
+        文本行列表
+    """
+    dropped = ', '.join(f'{stage} {n}' for stage, n in report['dropped'].items())
+    lines = [f"# [Rerank] 输入 {report['input']}，输出 {report['output']}；各阶段丢弃: {dropped}"]
+    if report['filter_reasons']:
+        reasons = ', '.join(f'{reason} ×{n}' for reason, n in report['filter_reasons'].items())
+        lines.append(f"# [Rerank] 过滤原因: {reasons}")
+    if report['comparisons']:
+        comparisons = ', '.join(f'{stage} {n}' for stage, n in report['comparisons'].items())
+        lines.append(f"# [Rerank] 相似度比较次数: {comparisons}")
+    stages = sorted(((name, ms) for name, ms in report['timings'].items() if name != 'total'),
+                    key=lambda item: item[1], reverse=True)
+    lines.append(f"# [Rerank] 阶段耗时 (ms，共 {report['timings'].get('total', 0)}): "
+                 + ', '.join(f'{name} {ms}' for name, ms in stages))
+    return lines
+
+
+def encode_compact(value, scores: bool = False) -> str:
+    """
+    编码为紧凑 JSON，其中的 SearchResult 直接由字段序列化（见 SearchResult.to_json）
+
+    Args:
+        value: 由字典、列表、SearchResult 和 JSON 基本类型组成的值
+        scores: SearchResult 是否包含得分
+    """
+    if isinstance(value, SearchResult):
+        return value.to_json(scores)
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{encode_basestring(str(k))}:{encode_compact(v, scores)}'
+                              for k, v in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(encode_compact(v, scores) for v in value) + ']'
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_ndjson(record, stream=None, scores: bool = False) -> None:
+    """
+    以紧凑 JSON 行写出一条记录并立即刷新（NDJSON 流式输出）
+
+    Args:
+        record: 记录字典；为 SearchResult 时写出 type 为 result 的结果记录
+        stream: 输出流，默认为标准输出
+        scores: 结果是否包含得分
+    """
+    stream = stream or sys.stdout
+    if isinstance(record, SearchResult):
+        line = record.to_json(scores, record_type='result')
+    else:
+        line = encode_compact(record, scores)
+    stream.write(line + '\n')
+    stream.flush()
+
+
 def main():
     parser = argparse.ArgumentParser(description='本地搜索引擎工具 - 支持 Rerank 算法的智能搜索结果过滤')
     parser.add_argument('query', help='搜索关键词')
     parser.add_argument('-e', '--engines', nargs='+', default=['baidu', 'bing'],
-                        choices=['baidu', 'bing'],
-                        help='搜索引擎（默认: baidu bing）')
+                        choices=['baidu', 'bing', 'local'],
+                        help='搜索引擎（默认: baidu bing；local 为本地页面库）')
     parser.add_argument('-n', '--num-results', type=int, default=10,
                         help='每个搜索引擎返回结果数量（默认: 10）')
     parser.add_argument('--no-filter', action='store_true',
                         help='禁用 Rerank 过滤（默认启用）')
     parser.add_argument('--min-score', type=float, default=0.15,
                         help='最低相关性得分阈值（默认: 0.15），范围 0.0-1.0')
+    parser.add_argument('--scorer', choices=sorted(RELEVANCE_SCORERS), default='heuristic',
+                        help='相关性评分器（默认: heuristic 关键词命中加分；bm25 按词的稀有程度加权）')
+    parser.add_argument('--top-k', type=int,
+                        help='Rerank 后最多保留的结果数（选满后停止计算多样性，只对前 K 名去重）')
     parser.add_argument('--max-per-domain', type=int, default=3,
                         help='每个域名最多保留结果数（默认: 3）')
     parser.add_argument('--show-scores', action='store_true',
                         help='显示详细评分信息（调试用）')
     parser.add_argument('-j', '--json', action='store_true',
                         help='以 JSON 格式输出')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='以 NDJSON 格式流式输出（引擎状态、排名变化和每条结果各一行紧凑 JSON）')
+    parser.add_argument('--timings', action='store_true',
+                        help='输出各阶段耗时（每个引擎的请求 / 解析耗时、Rerank 各阶段耗时）')
 
     args = parser.parse_args()
 
-    if not REQUESTS_AVAILABLE:
+    if not REQUESTS_AVAILABLE and set(args.engines) != {'local'}:
         print("错误: 需要安装 requests 库", file=sys.stderr)
         print("请运行: pip install requests", file=sys.stderr)
         sys.exit(1)
 
-    results = search_all(args.query, args.engines, args.num_results)
+    search_timings = {}
+    rerank_timings = {}
+    rerank_report = None
+
+    # 查询分词结果和耗时（首次调用包含词典加载）
+    keyword_info = None
+    if args.show_scores:
+        keyword_start = time.perf_counter()
+        query_keywords = extract_query_keywords(args.query)
+        keyword_info = {
+            'keywords': sorted(query_keywords),
+            'segment_ms': round((time.perf_counter() - keyword_start) * 1000, 3),
+            **get_segmenter().describe(),
+        }
+
+    def emit_engine_done(engine: str, engine_results: List[SearchResult]) -> None:
+        record = {'type': 'engine', 'engine': engine, 'count': len(engine_results),
+                  'circuit': get_engine_health().state(engine)}
+        if args.timings:
+            record['timings'] = search_timings.get('engines', {}).get(engine, {})
+        write_ndjson(record)
+        # 不做 Rerank 时，每个引擎的结果可以立即输出
+        if args.no_filter:
+            for r in engine_results:
+                write_ndjson(r)
+            return
+        # 增量 Rerank：前几名变化时立即输出当前排名，不必等最慢的引擎
+        if streaming.add(engine_results):
+            write_ndjson({'type': 'ranking', 'engine': engine, 'seen': streaming.seen, 'results': streaming.top()},
+                         scores=args.show_scores)
+
+    # NDJSON 输出时边收边排，其它格式在全部引擎完成后一次 Rerank
+    streaming = None
+    if args.ndjson and not args.no_filter:
+        streaming = StreamingReranker(args.query, min_score=args.min_score, max_per_domain=args.max_per_domain,
+                                      top_k=args.top_k or args.num_results * len(args.engines),
+                                      scorer=args.scorer)
+
+    results = search_all(args.query, args.engines, args.num_results,
+                         on_engine_done=emit_engine_done if args.ndjson else None,
+                         timings=search_timings)
     original_count = len(results)
 
     # 应用 Rerank 算法
-    if not args.no_filter:
+    if streaming is not None:
+        results = streaming.results()[:args.top_k] if args.top_k else streaming.results()
+        rerank_timings = streaming.timings()
+        rerank_report = streaming.report(returned=len(results))
+    elif not args.no_filter:
+        rerank_report = {}
         results = rerank_results(
             results,
             args.query,
             min_score=args.min_score,
-            max_per_domain=args.max_per_domain
+            max_per_domain=args.max_per_domain,
+            timings=rerank_timings,
+            scorer=args.scorer,
+            top_k=args.top_k,
+            report=rerank_report
         )
 
+    if not args.no_filter:
         filtered_count = original_count - len(results)
         print(f"# [Rerank] 原始结果: {original_count}, 过滤后: {len(results)}, 过滤掉: {filtered_count}", file=sys.stderr)
 
         # 统计域名分布
         domain_stats = {}
         for r in results:
-            domain = extract_domain(r.get('url', ''))
+            domain = extract_domain(r.url)
             domain_stats[domain] = domain_stats.get(domain, 0) + 1
         print(f"# [Rerank] 域名分布: {dict(sorted(domain_stats.items(), key=lambda x: x[1], reverse=True)[:5])}", file=sys.stderr)
         print("", file=sys.stderr)
 
-    if args.json:
-        # 移除内部评分字段（除非明确要求显示）
-        output_results = results
-        if not args.show_scores:
-            output_results = []
+    if args.ndjson:
+        if not args.no_filter:
             for r in results:
-                r_copy = {k: v for k, v in r.items() if not k.startswith('_')}
-                output_results.append(r_copy)
-
+                write_ndjson(r, scores=args.show_scores)
+        summary = {'type': 'summary', 'query': args.query, 'engines': args.engines,
+                   'total_results': len(results)}
+        if keyword_info is not None:
+            summary['query_keywords'] = keyword_info
+        if args.show_scores and rerank_report is not None:
+            summary['rerank_report'] = rerank_report
+        if args.timings:
+            summary['timings'] = {'search_all': search_timings, 'rerank': rerank_timings}
+        write_ndjson(summary)
+    elif args.json:
         output = {
             'query': args.query,
             'engines': args.engines,
             'total_results': len(results),
-            'results': output_results
+            'results': results
         }
-        print(json.dumps(output, ensure_ascii=False, indent=2))
+        if keyword_info is not None:
+            output['query_keywords'] = keyword_info
+        if args.show_scores and rerank_report is not None:
+            output['rerank_report'] = rerank_report
+        if args.timings:
+            output['timings'] = {'search_all': search_timings, 'rerank': rerank_timings}
+        # 评分字段只在明确要求时输出
+        print(json.dumps(output, ensure_ascii=False, indent=2,
+                         default=lambda r: r.to_dict(scores=args.show_scores)))
     else:
+        if args.timings:
+            print(f"# [Timings] search_all: {json.dumps(search_timings, ensure_ascii=False)}", file=sys.stderr)
+            print(f"# [Timings] rerank: {json.dumps(rerank_timings, ensure_ascii=False)}", file=sys.stderr)
         # 显示得分信息（如果请求）
         if args.show_scores:
+            print(f"# 查询关键词: {', '.join(keyword_info['keywords'])}"
+                  f"（分词 {keyword_info['segment_ms']} ms，其中词典加载 {keyword_info['load_ms']} ms；"
+                  f"词典: {keyword_info['dictionary']}）", file=sys.stderr)
+            if rerank_report is not None:
+                for line in format_rerank_report(rerank_report):
+                    print(line, file=sys.stderr)
             print(f"# 评分详情 (阈值: {args.min_score})\n", file=sys.stderr)
             for i, r in enumerate(results, 1):
-                print(f"{i}. [{r.get('_final_score', 0):.3f}] {r.get('title', '')[:50]}...", file=sys.stderr)
+                print(f"{i}. [{r.final_score or 0:.3f}] {r.title[:50]}...", file=sys.stderr)
             print("", file=sys.stderr)
 
         output = format_results_markdown(results, args.query)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于词典的中文分词
+
+对连续汉字构建所有词典词组成的有向无环图（DAG），再用动态规划选出词频乘积最大的
+切分路径，与 jieba 的精确模式思路相同。
+
+词典按 UTF-8 字节序排好后以内存映射方式打开，查词时在映射的字节上二分查找：
+找不到以当前片段为前缀的词条时即停止延长，效果等同于沿字典树（trie）向下走，
+但不需要在加载时为几十万个词条建立 Python 对象，首次使用的开销与词典大小无关。
+
+词典来源（按优先级）：
+    1. 环境变量 LOCAL_WEB_FETCH_DICT 指定的词典文件
+    2. 已安装 jieba 时使用它自带的 dict.txt（约 35 万词）
+    3. 随脚本附带的常用词词典 data/dict.txt（约 3.6 万词：jieba 0.42.1 词典（MIT 许可）中
+       词频不低于 100 的词条，加上补充的技术词汇）
+
+词典格式与 jieba 相同：每行"词 词频 [词性]"。首次使用时排序写入缓存目录，之后直接复用。
+
+使用方式：
+    python scripts/segmenter.py "人工智能最新进展"
+"""
+
+import sys
+import io
+import hashlib
+import importlib.util
+import math
+import mmap
+import os
+import re
+import threading
+import time
+import argparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from http_client import get_cache_dir
+
+# 设置标准输出为 UTF-8 编码（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+DICT_ENV = 'LOCAL_WEB_FETCH_DICT'
+BUNDLED_DICT = Path(__file__).resolve().parent / 'data' / 'dict.txt'
+
+# 词典词的最大长度（字符）；每个位置最多向后查找这么多字符
+MAX_WORD_CHARS = 8
+# 单次分词最多处理的汉字数，超出部分不再切分，保证每个查询的开销有上限
+MAX_SEGMENT_CHARS = 128
+
+CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+
+
+def dictionary_source() -> Path:
+    """按优先级确定使用的词典文件"""
+    path = os.environ.get(DICT_ENV)
+    if path:
+        return Path(path)
+    spec = importlib.util.find_spec('jieba')
+    if spec is not None and spec.submodule_search_locations:
+        jieba_dict = Path(list(spec.submodule_search_locations)[0]) / 'dict.txt'
+        if jieba_dict.exists():
+            return jieba_dict
+    return BUNDLED_DICT
+
+
+def compile_dictionary(source: Path) -> Path:
+    """
+    将词典按 UTF-8 字节序排序，写入缓存目录
+
+    输出第一行为"total<TAB>词频总和"，其后每行为"词<TAB>词频"。源文件不变时直接复用
+    已有的结果；先写临时文件再改名，多个进程同时编译也不会读到不完整的文件。
+
+    Args:
+        source: jieba 格式的词典文件
+
+    Returns:
+        排好序的词典文件路径
+    """
+    stat = source.stat()
+    digest = hashlib.sha1(f'{source.resolve()}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()
+    target = get_cache_dir() / f'dict-{digest[:12]}.txt'
+    if target.exists():
+        return target
+
+    freqs: Dict[bytes, int] = {}
+    with open(source, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            try:
+                freq = int(parts[1]) if len(parts) > 1 else 1
+            except ValueError:
+                continue
+            word = parts[0].encode('utf-8')
+            freqs[word] = max(freqs.get(word, 0), freq)
+
+    temp = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+    with open(temp, 'wb') as f:
+        f.write(b'total\t%d\n' % sum(freqs.values()))
+        for word in sorted(freqs):
+            f.write(b'%s\t%d\n' % (word, freqs[word]))
+    os.replace(temp, target)
+    return target
+
+
+class Segmenter:
+    """
+    中文分词器
+
+    词典以只读内存映射打开，可在线程间共享。
+    """
+
+    def __init__(self, source: Optional[Path] = None):
+        start = time.perf_counter()
+        self.source = Path(source) if source else dictionary_source()
+        self.path = compile_dictionary(self.source)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self._mm.find(b'\n') + 1
+        total = int(self._mm[:header_end].split(b'\t')[1])
+        self._start = header_end
+        self._log_total = math.log(max(total, 1))
+        self.load_seconds = time.perf_counter() - start
+        self._segment = lru_cache(maxsize=1024)(self._segment_run)
+
+    def close(self) -> None:
+        """释放内存映射"""
+        self._mm.close()
+
+    def _entry(self, key: bytes) -> tuple:
+        """
+        二分查找第一个不小于 key 的词条
+
+        Returns:
+            (词, 词频)；key 大于所有词条时返回 (b'', 0)
+        """
+        mm = self._mm
+        lo, hi = self._start, len(mm)
+        # lo 和 hi 始终是行首偏移
+        while lo < hi:
+            line_start = mm.rfind(b'\n', lo - 1, (lo + hi) // 2) + 1
+            tab = mm.find(b'\t', line_start)
+            if mm[line_start:tab] < key:
+                lo = mm.find(b'\n', tab) + 1
+            else:
+                hi = line_start
+        if lo >= len(mm):
+            return b'', 0
+        tab = mm.find(b'\t', lo)
+        return mm[lo:tab], int(mm[tab + 1:mm.find(b'\n', tab)])
+
+    def _dag(self, text: str) -> List[List[tuple]]:
+        """为每个位置列出从该位置开始的词典词：[(结束位置, 词频), ...]，单字始终可选"""
+        dag = []
+        for i in range(len(text)):
+            edges = []
+            for j in range(i + 1, min(len(text), i + MAX_WORD_CHARS) + 1):
+                key = text[i:j].encode('utf-8')
+                word, freq = self._entry(key)
+                if word == key:
+                    edges.append((j, freq))
+                elif not word.startswith(key):
+                    # 没有以该片段开头的词条，继续延长也不会命中
+                    break
+            if not edges or edges[0][0] != i + 1:
+                edges.insert(0, (i + 1, 1))
+            dag.append(edges)
+        return dag
+
+    def _segment_run(self, text: str) -> tuple:
+        dag = self._dag(text)
+        # route[i] = (从位置 i 到结尾的最大对数概率, 下一个切分点)
+        route = [(0.0, len(text))] * (len(text) + 1)
+        for i in range(len(text) - 1, -1, -1):
+            route[i] = max((math.log(freq) - self._log_total + route[j][0], j) for j, freq in dag[i])
+        words = []
+        i = 0
+        while i < len(text):
+            j = route[i][1]
+            words.append(text[i:j])
+            i = j
+        return tuple(words)
+
+    def cut(self, text: str) -> List[str]:
+        """
+        切分一段连续汉字
+
+        Args:
+            text: 连续汉字；超过 MAX_SEGMENT_CHARS 的部分作为一个整体返回
+
+        Returns:
+            词列表
+        """
+        if not text:
+            return []
+        words = list(self._segment(text[:MAX_SEGMENT_CHARS]))
+        if len(text) > MAX_SEGMENT_CHARS:
+            words.append(text[MAX_SEGMENT_CHARS:])
+        return words
+
+    def describe(self) -> Dict:
+        """返回词典来源、大小和加载耗时"""
+        return {
+            'dictionary': str(self.source),
+            'size_bytes': len(self._mm),
+            'load_ms': round(self.load_seconds * 1000, 3),
+        }
+
+
+_segmenter = None
+_segmenter_lock = threading.Lock()
+
+
+def get_segmenter() -> Segmenter:
+    """返回进程内共享的分词器，首次调用时加载词典"""
+    global _segmenter
+    if _segmenter is None:
+        with _segmenter_lock:
+            if _segmenter is None:
+                _segmenter = Segmenter()
+    return _segmenter
+
+
+def segment(text: str) -> List[str]:
+    """切分文本中的每段连续汉字，返回全部词（不含非汉字部分）"""
+    segmenter = get_segmenter()
+    words = []
+    for run in CJK_RUN_PATTERN.findall(text):
+        words.extend(segmenter.cut(run))
+    return words
+
+
+def keyword_terms(text: str) -> List[str]:
+    """
+    切分文本并返回可作为检索关键词的词
+
+    单字词（"的"、"和"等）不作为关键词；连续的单字通常是词典未收录的词，合并后保留。
+
+    Args:
+        text: 任意文本
+
+    Returns:
+        至少两个字的词列表
+    """
+    segmenter = get_segmenter()
+    terms = []
+    for run in CJK_RUN_PATTERN.findall(text):
+        pending = ''
+        for word in segmenter.cut(run) + ['']:
+            if len(word) == 1:
+                pending += word
+                continue
+            if len(pending) >= 2:
+                terms.append(pending)
+            pending = ''
+            if word:
+                terms.append(word)
+    return terms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基于词典的中文分词')
+    parser.add_argument('text', help='要切分的文本')
+    parser.add_argument('--dict', help=f'词典文件（默认: ${DICT_ENV}、jieba 词典或附带的常用词词典）')
+
+    args = parser.parse_args()
+
+    segmenter = Segmenter(args.dict) if args.dict else get_segmenter()
+    start = time.perf_counter()
+    words = [w for run in CJK_RUN_PATTERN.findall(args.text) for w in segmenter.cut(run)]
+    elapsed = time.perf_counter() - start
+
+    print(' / '.join(words))
+    info = segmenter.describe()
+    print(f"# 词典: {info['dictionary']}（{info['size_bytes']} 字节，加载 {info['load_ms']} ms），"
+          f"分词 {elapsed * 1000:.3f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
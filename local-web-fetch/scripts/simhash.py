@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SimHash 文档指纹
+
+为页面正文计算 64 位 SimHash，并提供按汉明距离查找近似重复文档的指纹索引，
+用于在批量拉取时识别同一文章在不同镜像站、转载站上的副本。
+"""
+
+import hashlib
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SIMHASH_BITS = 64
+# 汉明距离不超过该值视为近似重复（64 位指纹的常用阈值）
+DEFAULT_MAX_DISTANCE = 3
+# 特征为去掉空白和标点后的连续 4 字符片段
+SHINGLE_SIZE = 4
+# 参与计算的最大字符数，超长正文只取前部
+MAX_CHARS = 100000
+# 特征较多时按 crc32 低位抽样约 1/4 参与计算。抽样只取决于片段内容而与位置无关，
+# 近似重复的文档会抽中相同的片段
+SAMPLE_MIN_FEATURES = 1024
+SAMPLE_MASK = 3
+
+_NON_WORD_PATTERN = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Iterable[str]:
+    """将文本规范化（小写、去掉空白和标点）后切分为重叠的字符片段"""
+    normalized = _NON_WORD_PATTERN.sub('', text[:MAX_CHARS].lower())
+    if len(normalized) <= size:
+        return [normalized] if normalized else []
+    return (normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+
+def simhash(text: str) -> int:
+    """
+    计算文本的 64 位 SimHash
+
+    特征较多时先按内容抽样；每个特征的 8 字节哈希按字节位置分别计数，再由字节
+    取值的分布汇总出每一位的票数，避免在 Python 中对每个特征逐位循环。
+
+    Args:
+        text: 正文纯文本
+
+    Returns:
+        64 位无符号整数指纹；文本为空时返回 0
+    """
+    features = [s.encode('utf-8') for s in shingles(text)]
+    if len(features) > SAMPLE_MIN_FEATURES:
+        features = [f for f in features if not zlib.crc32(f) & SAMPLE_MASK]
+    digests = b''.join(hashlib.blake2b(f, digest_size=8).digest() for f in features)
+    total = len(digests) // 8
+    if not total:
+        return 0
+
+    fingerprint = 0
+    for position in range(8):
+        counts = Counter(digests[position::8])
+        for bit in range(8):
+            votes = sum(n for value, n in counts.items() if value >> bit & 1)
+            if votes * 2 > total:
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+def to_signed(fingerprint: int) -> int:
+    """转换为有符号 64 位整数（SQLite INTEGER 的取值范围）"""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    """将有符号 64 位整数还原为指纹"""
+    return value + (1 << 64) if value < 0 else value
+
+
+class FingerprintIndex:
+    """
+    近似重复指纹索引
+
+    将 64 位指纹分为 max_distance + 1 段，汉明距离不超过 max_distance 的两个指纹
+    至少有一段完全相同（抽屉原理），因此只需比较同段相同的候选。线程安全。
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._bands = max_distance + 1
+        self._band_bits = -(-SIMHASH_BITS // self._bands)
+        self._tables: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(self._bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len({url for table in self._tables for bucket in table.values() for _, url in bucket})
+
+    def _keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self._band_bits) - 1
+        return [fingerprint >> (i * self._band_bits) & mask for i in range(self._bands)]
+
+    def _find(self, fingerprint: int, exclude: Optional[str]) -> Optional[Tuple[str, int]]:
+        best = None
+        for table, key in zip(self._tables, self._keys(fingerprint)):
+            for candidate, url in table.get(key, ()):
+                if url == exclude:
+                    continue
+                distance = hamming_distance(fingerprint, candidate)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (url, distance)
+        return best
+
+    def _add(self, fingerprint: int, url: str) -> None:
+        for table, key in zip(self._tables, self._keys(fingerprint)):
+            table.setdefault(key, []).append((fingerprint, url))
+
+    def add(self, fingerprint: int, url: str) -> None:
+        """登记一个文档的指纹"""
+        with self._lock:
+            self._add(fingerprint, url)
+
+    def find(self, fingerprint: int, exclude: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """
+        查找近似重复的已登记文档
+
+        Args:
+            fingerprint: 待查指纹
+            exclude: 忽略该 URL（例如重新拉取同一页面时）
+
+        Returns:
+            (最接近的文档 URL, 汉明距离)，没有近似重复时返回 None
+        """
+        with self._lock:
+            return self._find(fingerprint, exclude)
+
+    def claim(self, fingerprint: int, url: str) -> Optional[Tuple[str, int]]:
+        """
+        查找并登记：已有近似重复文档时返回它，否则把当前文档登记为规范副本
+
+        查找和登记在同一把锁内完成，并发处理的多个镜像页面只有第一个会成为规范副本。
+
+        Returns:
+            (规范副本 URL, 汉明距离)，当前文档成为规范副本时返回 None
+        """
+        if not fingerprint:
+            return None
+        with self._lock:
+            match = self._find(fingerprint, url)
+            if match is None:
+                self._add(fingerprint, url)
+            return match
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共设置
+
+脚本和替身服务器不是安装的包，按 benchmarks/bench.py 的方式加入 sys.path。
+缓存目录（页面库、DNS 状态、词典缓存）指向临时目录，不读写用户的缓存。
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'scripts'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+os.environ['LOCAL_WEB_FETCH_CACHE'] = tempfile.mkdtemp(prefix='local-web-fetch-tests-')
+
+from fixture_server import start_server  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def base_url():
+    """本地替身服务器的基础 URL（整个测试会话共用一个服务器）"""
+    server, url = start_server()
+    yield url
+    server.shutdown()
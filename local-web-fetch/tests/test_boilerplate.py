@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""样板内容裁剪"""
+
+import pytest
+
+from boilerplate import Pruner, prune_html
+from fixture_server import load_fixture
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100, 4096])
+def test_chunked_feeding_matches_single_pass(chunk_size):
+    html = load_fixture('portal.html')
+    expected, report = prune_html(html)
+    pruner = Pruner()
+    parts = [pruner.feed(html[i:i + chunk_size]) for i in range(0, len(html), chunk_size)]
+    parts.append(pruner.feed('', final=True))
+    assert ''.join(parts) == expected
+    assert pruner.report() == report
+
+
+def test_self_closing_pruned_tag_keeps_following_content():
+    pruned, _ = prune_html('<p><svg class="icon"/>保留的正文</p><svg><path/></svg><p>后文</p>')
+    assert pruned == '<p>保留的正文</p><p>后文</p>'
+
+
+@pytest.mark.parametrize('attrs,removed', [
+    ('class="comments"', True),
+    ('id="disqus_thread"', True),
+    ('class="post no-comments-yet"', False),
+    ('class="commentary"', False),
+])
+def test_comment_widgets_match_whole_class_tokens(attrs, removed):
+    pruned, _ = prune_html(f'<div {attrs}><p>评论</p></div><p>正文</p>')
+    assert ('评论' not in pruned) == removed
+    assert '正文' in pruned
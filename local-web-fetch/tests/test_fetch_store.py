@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""本地页面库、大页面落盘和续读之间的交互"""
+
+import re
+
+import pytest
+
+import fetch_url as fetch_module
+from fetch_url import TRUNCATION_NOTE, fetch_url
+from page_store import PageStore
+
+# /article/3m 解码后超过 SPILL_THRESHOLD，走内存映射的流式转换；/article/200k 在内存中转换
+SPILLED = '/article/3m'
+IN_MEMORY = '/article/200k'
+
+
+@pytest.fixture
+def store(tmp_path):
+    page_store = PageStore(tmp_path / 'pages.db')
+    yield page_store
+    page_store.close()
+
+
+def without_note(markdown: str) -> str:
+    """去掉结尾的截断说明，只保留本段正文"""
+    return markdown[:markdown.rindex(TRUNCATION_NOTE[:-1])]
+
+
+def resume_chain(url: str, max_length: int, converter: str) -> tuple:
+    """按 continuation.offset 依次续读，返回 (拼接的正文, 请求次数)"""
+    parts, offset = [], 0
+    while True:
+        result = fetch_url(url, max_length=max_length, resume_offset=offset, converter=converter)
+        assert result['success'], result.get('error')
+        if 'continuation' not in result:
+            parts.append(result['markdown'])
+            return ''.join(parts), len(parts)
+        parts.append(without_note(result['markdown']))
+        assert result['continuation']['offset'] > offset
+        offset = result['continuation']['offset']
+
+
+@pytest.mark.parametrize('path', [SPILLED, IN_MEMORY])
+def test_paging_total_length_same_with_and_without_store(base_url, store, path):
+    url = base_url + path
+    stored = fetch_url(url, max_length=50000, page=1, store=store)
+    fresh = fetch_url(url, max_length=50000, page=1)
+    assert stored['success'] and fresh['success']
+    assert stored['paging']['total_length'] == fresh['paging']['total_length']
+    assert stored['paging']['total_pages'] == fresh['paging']['total_pages']
+    assert stored['markdown'] == fresh['markdown']
+
+    cached = fetch_url(url, max_length=50000, page=2, store=store)
+    assert cached['cached']
+    assert cached['paging']['total_length'] == fresh['paging']['total_length']
+
+
+@pytest.mark.parametrize('path', [SPILLED, IN_MEMORY])
+def test_truncated_fetch_is_not_stored_as_full_document(base_url, store, path):
+    url = base_url + path
+    truncated = fetch_url(url, max_length=5000, store=store)
+    assert truncated['success']
+    assert not store.get(url).get('full_content')
+
+    paged = fetch_url(url, max_length=50000, page=1, store=store)
+    assert not paged.get('cached')
+    assert paged['paging']['total_length'] == fetch_url(url, max_length=50000, page=1)['paging']['total_length']
+
+
+def test_spilled_fetch_reports_continuation(base_url):
+    result = fetch_url(base_url + SPILLED, max_length=20000)
+    assert result['spilled']
+    continuation = result['continuation']
+    assert 0 < continuation['offset'] < continuation['total']
+
+
+@pytest.mark.parametrize('path,max_length', [(SPILLED, 400000), (IN_MEMORY, 20000)])
+@pytest.mark.parametrize('converter', ['html2text', 'lxml'])
+def test_resume_chain_reproduces_document(base_url, path, max_length, converter):
+    if converter == 'lxml' and not fetch_module.LXML_AVAILABLE:
+        pytest.skip('未安装 lxml')
+    url = base_url + path
+    full = fetch_url(url, max_length=10 ** 8, converter=converter)['markdown']
+    joined, requests = resume_chain(url, max_length, converter)
+    assert requests > 1
+    # 每段单独转换，段与段之间的空白可能不同
+    assert re.sub(r'\s+', '', joined) == re.sub(r'\s+', '', full)
+
+
+@pytest.mark.parametrize('path', [SPILLED, IN_MEMORY])
+def test_resume_offset_out_of_range_is_an_error(base_url, path):
+    result = fetch_url(base_url + path, resume_offset=10 ** 9)
+    assert not result['success']
+    assert '续读偏移' in result['error']
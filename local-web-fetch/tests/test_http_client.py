@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""DNS 缓存与 HTTP/2 传输"""
+
+import pytest
+import requests
+
+import http_client
+from http_client import DNSCache
+
+
+def test_dns_cache_survives_unexpected_query_errors():
+    cache = DNSCache()
+    calls = []
+
+    def query(host):
+        calls.append(host)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        return ['192.0.2.1'], 60
+
+    cache._query = query
+    with pytest.raises(RuntimeError):
+        cache.resolve('example.com')
+    # 异常没有写入缓存，也没有留下进行中的解析，下一次重新查询
+    assert cache.resolve('example.com') == ['192.0.2.1']
+    assert cache.resolve('example.com') == ['192.0.2.1']
+    assert calls == ['example.com', 'example.com']
+
+
+def test_dns_cache_remembers_failures():
+    cache = DNSCache()
+    calls = []
+
+    def query(host):
+        calls.append(host)
+        raise OSError('no such host')
+
+    cache._query = query
+    for _ in range(2):
+        with pytest.raises(OSError):
+            cache.resolve('missing.example')
+    assert calls == ['missing.example']
+
+
+@pytest.fixture
+def http2_base_url():
+    if not http_client.HTTP2_AVAILABLE:
+        pytest.skip('未安装 httpx / h2')
+    from h2_server import start_server
+    loop, url = start_server()
+    previous = http_client._http2_client
+    http_client.set_http2_client(http_client.create_http2_client(http1=False))
+    yield url.replace('127.0.0.1', 'localhost')
+    http_client.get_http2_client().close()
+    http_client.set_http2_client(previous)
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_http2_download(http2_base_url):
+    response = http_client.fetch_bytes(f'{http2_base_url}/article', {}, 10, http2=True)
+    assert response.status_code == 200
+    assert response.transfer['http_version'] == 'HTTP/2'
+    assert b'</html>' in response.content
+
+
+def test_http2_errors_match_http1(http2_base_url):
+    with pytest.raises(requests.exceptions.HTTPError) as info:
+        http_client.fetch_bytes(f'{http2_base_url}/missing', {}, 10, http2=True)
+    assert isinstance(info.value.response, requests.Response)
+    assert info.value.response.status_code == 404
+    assert str(info.value).startswith('404 Client Error')
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""SearchResult 的映射协议与 rerank 的 Top-K / 流式结果"""
+
+import json
+
+import pytest
+
+import search_engines
+from bench import BENCH_QUERY, load_serp_results
+from search_engines import SearchResult, StreamingReranker, rerank_results
+
+
+def make_result(**fields) -> SearchResult:
+    data = {'title': '标题', 'url': 'https://example.com/a', 'snippet': '摘要', 'source': 'bing'}
+    data.update(fields)
+    return SearchResult.from_dict(data)
+
+
+def ranked(results):
+    return [(r.url, r.final_score) for r in results]
+
+
+@pytest.fixture(scope='module')
+def candidates():
+    """录制的结果页放大到 100 条，URL 和摘要各不相同"""
+    base = load_serp_results()
+    results = []
+    for i in range(100):
+        item = base[i % len(base)].copy()
+        item.url = f'{item.url}#{i}'
+        item.snippet += f' 变体 {i % 7} ' * (i % 3)
+        results.append(item)
+    return results
+
+
+def test_search_result_behaves_like_the_old_dict():
+    result = make_result()
+    expected = {'title': '标题', 'url': 'https://example.com/a', 'snippet': '摘要', 'source': 'bing'}
+    assert dict(result) == expected
+    assert {**result} == expected
+    assert list(result.items()) == list(expected.items())
+    assert result == expected
+    assert 'url' in result and '_final_score' not in result
+    with pytest.raises(KeyError):
+        result['missing']
+
+
+def test_scores_appear_as_keys_once_set():
+    result = make_result()
+    result['_final_score'] = 0.5
+    assert result['_final_score'] == 0.5 and result.final_score == 0.5
+    assert len(result) == 5 and '_final_score' in dict(result)
+    with pytest.raises(KeyError):
+        result['unknown'] = 1
+
+
+def test_search_result_serializes_through_to_dict():
+    result = make_result()
+    assert json.loads(json.dumps(result, default=SearchResult.to_dict)) == result.to_dict()
+    assert json.loads(result.to_json()) == result.to_dict()
+
+
+@pytest.mark.parametrize('top_k', [1, 5, 20])
+def test_top_k_matches_the_full_ranking(candidates, top_k):
+    full = rerank_results([r.copy() for r in candidates], BENCH_QUERY)
+    top = rerank_results([r.copy() for r in candidates], BENCH_QUERY, top_k=top_k)
+    assert ranked(top) == ranked(full[:top_k])
+
+
+def test_streaming_matches_batch(candidates):
+    full = rerank_results([r.copy() for r in candidates], BENCH_QUERY)
+    stream = StreamingReranker(BENCH_QUERY, top_k=10, capacity=len(candidates))
+    for i in range(0, len(candidates), 10):
+        stream.add([r.copy() for r in candidates[i:i + 10]])
+    assert ranked(stream.results())[:10] == ranked(full[:10])
+
+
+def test_diversity_scores_match_pairwise_definition(candidates):
+    results = [r.copy() for r in candidates[:20]]
+    vectors = [search_engines.result_vector(r) for r in results]
+    for i, score in enumerate(search_engines.diversity_scores(results)):
+        similarities = [sum(w * other.get(s, 0.0) for s, w in vectors[i].items())
+                        for j, other in enumerate(vectors) if j != i]
+        assert score == pytest.approx(max(0.0, 1.0 - sum(similarities) / len(similarities)))
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""附带词典的中文分词"""
+
+import pytest
+
+from segmenter import BUNDLED_DICT, Segmenter
+
+
+@pytest.fixture(scope='module')
+def segmenter():
+    seg = Segmenter(BUNDLED_DICT)
+    yield seg
+    seg.close()
+
+
+@pytest.mark.parametrize('text,words', [
+    ('人工智能最新进展', ['人工智能', '最新', '进展']),
+    ('深度学习训练技巧', ['深度学习', '训练', '技巧']),
+    ('如何提高模型训练速度', ['如何', '提高', '模型', '训练', '速度']),
+    ('北京今天天气怎么样', ['北京', '今天', '天气', '怎么样']),
+])
+def test_common_words_are_not_split_into_characters(segmenter, text, words):
+    assert segmenter.cut(text) == words